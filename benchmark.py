@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能基准测试
+
+用 generate_examples.generate_dataset 生成指定规模的数据集，在若干典型场景下运行 two_file_diff，
+记录总耗时、各阶段耗时（见 file_diff_profile）与内存峰值，核对比较结果与生成时预知的结果一致，
+并与保存的基线比较，耗时或内存峰值超出基线一定比例时视为性能回退。
+
+每个场景在单独的子进程中运行，内存峰值互不影响（并行比较时不含工作进程的内存）。
+生成的数据集缓存在 --data-dir 中，参数相同时直接复用。
+另外检查命令行入口（file_diff_cli）的启动耗时不超过 STARTUP_BUDGET_SECONDS，
+且启动时没有导入 pandas 等重型依赖。
+
+用法:
+    python benchmark.py                                # 10 万行，全部场景，与基线比较
+    python benchmark.py --rows 100000,1000000 --scenarios csv,csv_fingerprint
+    python benchmark.py --save-baseline                # 把本次结果写入基线
+
+退出码: 0 正常；1 存在性能回退或比较结果错误
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import pandas as pd
+
+from file_diff_cli import STARTUP_BUDGET_SECONDS
+from generate_examples import generate_dataset
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_DATA_DIR = os.path.join(BENCHMARK_DIR, "data")
+# 耗时或内存峰值超出基线的比例超过该值时视为回退
+DEFAULT_TOLERANCE = 0.25
+
+# 场景：数据集参数（传给 generate_dataset）、比较参数（传给 two_file_diff）、最大行数
+SCENARIOS = {
+    "csv": {"dataset": {}, "options": {}},
+    "csv_fingerprint": {"dataset": {}, "options": {"fingerprint": True}},
+    "csv_workers": {"dataset": {}, "options": {"workers": 2}},
+    "csv_streaming": {"dataset": {}, "options": {"streaming": True, "memory_limit_mb": 128}},
+    "csv_key_first": {"dataset": {}, "options": {"key_first": True}},
+    "csv_duplicates": {
+        "dataset": {"duplicate_rate": 0.01},
+        "options": {"duplicates": "occurrence"},
+    },
+    "csv_report": {"dataset": {}, "options": {"output_report": True}},
+    "txt": {"dataset": {"file_type": "txt"}, "options": {}},
+    # Excel 的生成与解析都很慢，只在较小的规模下运行
+    "excel": {"dataset": {"file_type": "excel"}, "options": {}, "max_rows": 200_000},
+}
+
+
+def _run_case(info, options):
+    """在子进程中运行一次比较，返回耗时、各阶段耗时、内存峰值与各类别数量"""
+    from file_diff import two_file_diff
+    from file_diff_log import QUIET
+
+    options = dict(options)
+    report_dir = None
+    if options.get("output_report"):
+        report_dir = tempfile.mkdtemp(prefix="file_diff_bench_")
+        options["report_path"] = os.path.join(report_dir, "report.csv")
+    try:
+        start = time.perf_counter()
+        result = two_file_diff(
+            info["file1"],
+            info["file2"],
+            key_column=info["key_column"],
+            file_type=info["file_type"],
+            delimiter=info["delimiter"],
+            profile=True,
+            verbosity=QUIET,
+            **options,
+        )
+        seconds = time.perf_counter() - start
+    finally:
+        if report_dir is not None:
+            shutil.rmtree(report_dir, ignore_errors=True)
+
+    phases = {}
+    for record in result.meta["profile"]:
+        phases[record["phase"]] = phases.get(record["phase"], 0.0) + record["seconds"]
+    # 各记录中进程累计的内存峰值，其最大值即为整个比较的峰值
+    peaks = [
+        r["process_peak_mb"] for r in result.meta["profile"] if r["process_peak_mb"] is not None
+    ]
+    return {
+        "seconds": seconds,
+        "peak_mb": max(peaks) if peaks else None,
+        "phases": phases,
+        "counts": result.counts,
+    }
+
+
+def measure_startup(repeat=5):
+    """
+    测量命令行入口的启动耗时（运行 --help，取最快的一次），
+    返回 (秒数, 启动时被导入的重型依赖列表)
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(root, "file_diff_cli.py"), "--help"]
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        seconds.append(time.perf_counter() - start)
+    probe = (
+        "import sys, file_diff_cli; file_diff_cli.build_parser(); "
+        "print(','.join(m for m in ('numpy', 'pandas', 'openpyxl', 'PyQt6') if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe], check=True, cwd=root, capture_output=True, text=True
+    ).stdout.strip()
+    return min(seconds), [name for name in output.split(",") if name]
+
+
+def expected_counts(info, options):
+    """数据集在该场景的比较参数下应得到的各类别数量"""
+    expected = dict(info["expected"])
+    if options.get("duplicates", "first") != "first":
+        expected["extra_in_file1"] = info["duplicate_rows"]
+    return expected
+
+
+def run_scenario(name, rows, columns, data_dir, repeat=1):
+    """运行一个场景 repeat 次，返回耗时最短的一次的记录"""
+    scenario = SCENARIOS[name]
+    info = generate_dataset(data_dir, rows=rows, columns=columns, **scenario["dataset"])
+    runs = []
+    for _ in range(repeat):
+        # 每次在新的子进程中运行，内存峰值只反映这一次比较
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            runs.append(pool.submit(_run_case, info, scenario["options"]).result())
+    best = min(runs, key=lambda run: run["seconds"])
+    best["correct"] = best["counts"] == expected_counts(info, scenario["options"])
+    return best
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {"machine": None, "cases": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    """把本次结果合并写入基线文件（同名用例被覆盖）"""
+    baseline = load_baseline(path)
+    baseline["machine"] = machine_info()
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for case, run in results.items():
+        baseline["cases"][case] = {
+            "seconds": round(run["seconds"], 4),
+            "peak_mb": None if run["peak_mb"] is None else round(run["peak_mb"], 1),
+            "phases": {phase: round(s, 4) for phase, s in run["phases"].items()},
+            "recorded": timestamp,
+        }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+
+
+def compare_with_baseline(run, base, tolerance):
+    """返回 (描述文本, 是否回退)"""
+    if base is None:
+        return "无基线", False
+    parts = []
+    regressed = False
+    change = run["seconds"] / base["seconds"] - 1 if base["seconds"] else 0.0
+    parts.append(f"耗时 {change:+.0%}")
+    regressed |= change > tolerance
+    if run["peak_mb"] is not None and base.get("peak_mb"):
+        change = run["peak_mb"] / base["peak_mb"] - 1
+        parts.append(f"内存 {change:+.0%}")
+        regressed |= change > tolerance
+    return "与基线相比: " + ", ".join(parts), regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="file_diff 性能基准测试")
+    parser.add_argument("--rows", default="100000", help="数据规模，逗号分隔（如 100000,1000000）")
+    parser.add_argument("--columns", type=int, default=10, help="数据列数")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help=f"场景，逗号分隔: {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="每个场景运行的次数（取最快的一次）")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="数据集缓存目录")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE, help="允许超出基线的比例"
+    )
+    parser.add_argument("--output", help="把本次结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    sizes = [int(value) for value in args.rows.split(",") if value]
+    names = [value for value in args.scenarios.split(",") if value]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}")
+
+    baseline = load_baseline(args.baseline)
+    if baseline["machine"] and baseline["machine"] != machine_info():
+        print(f"⚠️ 基线记录于另一环境（{baseline['machine']['platform']}），比较结果仅供参考")
+
+    startup, heavy = measure_startup()
+    slow = startup > STARTUP_BUDGET_SECONDS
+    icon = "❌" if slow or heavy else "✅"
+    print(f"{icon} 命令行启动: {startup:.3f} 秒（预算 {STARTUP_BUDGET_SECONDS} 秒）")
+    if heavy:
+        print(f"    启动时导入了重型依赖: {', '.join(heavy)}")
+    failed = slow or bool(heavy)
+
+    results = {}
+    for rows in sizes:
+        for name in names:
+            case = f"{name}@{rows}"
+            max_rows = SCENARIOS[name].get("max_rows")
+            if max_rows is not None and rows > max_rows:
+                print(f"⏭️ {case}: 超出该场景的最大行数 {max_rows}，跳过")
+                continue
+            print(f"⏳ {case} ...")
+            run = run_scenario(name, rows, args.columns, args.data_dir, args.repeat)
+            results[case] = run
+            peak = "未知" if run["peak_mb"] is None else f"{run['peak_mb']:.0f} MB"
+            note, regressed = compare_with_baseline(
+                run, baseline["cases"].get(case), args.tolerance
+            )
+            icon = "❌" if regressed or not run["correct"] else "✅"
+            print(f"{icon} {case}: {run['seconds']:.2f} 秒，内存峰值 {peak}，{note}")
+            for phase, seconds in run["phases"].items():
+                print(f"    {phase}: {seconds:.3f} 秒")
+            if not run["correct"]:
+                print(f"    比较结果与预期不一致: {run['counts']}")
+            failed |= regressed or not run["correct"]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "cases": results}, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"📝 基线已保存至: {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
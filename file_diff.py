@@ -1,44 +1,992 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Union
+from typing import Callable, Dict, List, Tuple, Union
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
+from file_diff_cancel import CancelToken, check_cancelled, gather
+from file_diff_columnar import COLUMNAR_FILE_TYPES, list_tables, read_columnar, read_columnar_header
+from file_diff_log import NORMAL, QUIET, DiffLog, as_log
+from file_diff_profile import DiffProfiler, phase
+from file_diff_result import DiffResult
+
+# 支持的文件类型；流式、两遍读取、有序归并与分块校验只支持文本格式
+FILE_TYPES = ("excel", "csv", "txt") + COLUMNAR_FILE_TYPES
+TEXT_FILE_TYPES = ("csv", "txt")
+
+# 重复关键值的处理方式，见 diff_frames
+DUPLICATE_MODES = ("first", "occurrence", "content")
+
+# 同时保持打开的工作簿数量上限
+MAX_OPEN_WORKBOOKS = 4
+_WORKBOOKS: "OrderedDict[Tuple[str, int, int], pd.ExcelFile]" = OrderedDict()
+_WORKBOOK_LOCK = threading.Lock()
+
+
+def _nullable_int(s: pd.Series) -> bool:
+    """是否为含空值的可空整数列（Int64 等）"""
+    return s.dtype.kind in "iu" and s.hasnans
+
+
+def _aligned_values(s1: pd.Series, s2: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """取出两列的底层数组；类型不兼容时统一转为 object 以保证逐元素比较"""
+    if _nullable_int(s1) or _nullable_int(s2):
+        # 含空值的可空整数转为 numpy 数组时变为 float64，大整数会失去精度
+        return s1.to_numpy(dtype=object), s2.to_numpy(dtype=object)
+    a = s1.to_numpy()
+    b = s2.to_numpy()
+    if a.dtype.kind in "biuf" and b.dtype.kind in "biuf":
+        return a, b
+    if a.dtype == b.dtype and a.dtype.kind in "cmM":
+        return a, b
+    return s1.to_numpy(dtype=object), s2.to_numpy(dtype=object)
+
+
+def compare_aligned(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    columns: List[str],
+    cancel: CancelToken = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    向量化比较两个已按关键列对齐（行数、行顺序一致）的数据框
+
+    两边同时为空值（NaN/None/NaT）视为相等。每比较完一列检查一次 cancel。
+
+    返回:
+        (rows, col_ids, old_values, new_values) 四个等长数组，按行号、列顺序排列：
+        - rows: 不一致单元格所在的行位置
+        - col_ids: 不一致单元格所在列在 columns 中的下标
+        - old_values: 数据源1 中的值
+        - new_values: 数据源2 中的值
+    """
+    rows_parts, col_parts, old_parts, new_parts = [], [], [], []
+    for col_id, col in enumerate(columns):
+        check_cancelled(cancel)
+        a, b = _aligned_values(df1[col], df2[col])
+        na1 = pd.isna(a)
+        na2 = pd.isna(b)
+        diff = na1 != na2
+        both = ~(na1 | na2)
+        diff[both] = a[both] != b[both]
+        positions = np.flatnonzero(diff)
+        if len(positions) == 0:
+            continue
+        rows_parts.append(positions)
+        col_parts.append(np.full(len(positions), col_id, dtype=np.intp))
+        old_parts.append(a[positions].astype(object))
+        new_parts.append(b[positions].astype(object))
+
+    if not rows_parts:
+        empty = np.empty(0, dtype=object)
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), empty, empty
+
+    rows = np.concatenate(rows_parts)
+    # 稳定排序：同一行内保持列顺序
+    order = np.argsort(rows, kind="stable")
+    return (
+        rows[order],
+        np.concatenate(col_parts)[order],
+        np.concatenate(old_parts)[order],
+        np.concatenate(new_parts)[order],
+    )
+
+
+def _parse_sheet(
+    excel_file: pd.ExcelFile, sheet_name: str = None, **kwargs
+) -> Tuple[pd.DataFrame, str]:
+    """解析工作簿中的一个 sheet（None 表示第一个），返回 (数据, sheet 名)"""
+    sheet_name = sheet_name or excel_file.sheet_names[0]
+    return excel_file.parse(sheet_name, **kwargs), sheet_name
+
+
+def read_header(
+    file_path: str,
+    file_type: str = "csv",
+    sheet_name: str = None,
+    delimiter: str = ",",
+    excel_file: pd.ExcelFile = None,
+) -> List[str]:
+    """只读取表头，返回列名列表（Excel 可传入已打开的 ExcelFile 避免重复解析）"""
+    try:
+        if file_type in COLUMNAR_FILE_TYPES:
+            return read_columnar_header(file_path, file_type, sheet_name)
+        if file_type == "excel":
+            if excel_file is None:
+                with pd.ExcelFile(file_path) as excel_file:
+                    return _parse_sheet(excel_file, sheet_name, nrows=0)[0].columns.tolist()
+            return _parse_sheet(excel_file, sheet_name, nrows=0)[0].columns.tolist()
+        return pd.read_csv(file_path, delimiter=delimiter, nrows=0).columns.tolist()
+    except Exception as e:
+        raise FileNotFoundError(f"无法读取文件 {file_path}, 错误: {e}")
+
+
+def read_source(
+    file_path: str,
+    file_type: str = "excel",
+    sheet_name: str = None,
+    delimiter: str = ",",
+    usecols: List[str] = None,
+    excel_file: pd.ExcelFile = None,
+) -> Tuple[pd.DataFrame, str]:
+    """
+    读取一个数据源，返回 (数据, 类型描述)
+
+    usecols 指定只解析的列（None 表示全部列）；sheet_name 为 None 时读取第一个 sheet。
+    Parquet / Feather / SQLite 见 file_diff_columnar，SQLite 的 sheet_name 是表名或查询语句。
+    """
+    try:
+        if file_type in COLUMNAR_FILE_TYPES:
+            return read_columnar(file_path, file_type, sheet_name, usecols)
+        if file_type == "excel":
+            if excel_file is None:
+                with pd.ExcelFile(file_path) as excel_file:
+                    return _parse_sheet(excel_file, sheet_name, usecols=usecols)
+            return _parse_sheet(excel_file, sheet_name, usecols=usecols)
+        data = pd.read_csv(file_path, delimiter=delimiter, usecols=usecols)
+        return data, f"{file_type.upper()}文件"
+    except Exception as e:
+        raise FileNotFoundError(f"无法读取文件 {file_path}, 错误: {e}")
+
+
+def as_key_columns(key_column: Union[str, List[str]]) -> List[str]:
+    """把单个关键列名或关键列名列表统一为列表"""
+    if isinstance(key_column, str):
+        return [key_column]
+    return list(key_column)
+
+
+def key_label(key_column: Union[str, List[str]]) -> str:
+    """关键列的显示文本，组合关键列以 ' + ' 连接"""
+    return " + ".join(str(col) for col in as_key_columns(key_column))
+
+
+def resolve_common_columns(
+    columns1, columns2, key_column: Union[str, List[str]]
+) -> List[str]:
+    """检查关键列是否存在，并返回两个数据源的共同列（保持数据源1的列顺序）"""
+    for col in as_key_columns(key_column):
+        if col not in columns1:
+            raise ValueError(
+                f"数据源1 中不存在关键列: {col}，可用列: {list(columns1)}"
+            )
+        if col not in columns2:
+            raise ValueError(
+                f"数据源2 中不存在关键列: {col}，可用列: {list(columns2)}"
+            )
+
+    common_columns = pd.Index(columns1).intersection(pd.Index(columns2)).tolist()
+    if not common_columns:
+        raise ValueError("两个数据源没有共同列，无法比较")
+    return common_columns
+
+
+def _keep_column(col, key_columns: List[str], include, ignore) -> bool:
+    """关键列始终保留；其余列需在 include 中（include 为 None 表示全部）且不在 ignore 中"""
+    return col in key_columns or ((include is None or col in include) and col not in ignore)
+
+
+def _side_columns(
+    header: List[str],
+    key_column: Union[str, List[str]],
+    columns: List[str] = None,
+    ignore_columns: List[str] = None,
+) -> List[str]:
+    """
+    单个数据源需要读取的列：在不知道另一个数据源表头的情况下，
+    先按列筛选条件读取，随后再由 select_columns 取两边的共同列
+    """
+    include = None if columns is None else set(as_key_columns(columns))
+    ignore = set(as_key_columns(ignore_columns)) if ignore_columns else set()
+    return [
+        col for col in header if _keep_column(col, as_key_columns(key_column), include, ignore)
+    ]
+
+
+def select_columns(
+    columns1,
+    columns2,
+    key_column: Union[str, List[str]],
+    columns: List[str] = None,
+    ignore_columns: List[str] = None,
+) -> Tuple[List[str], List[str]]:
+    """
+    根据两个数据源的表头确定需要读取并比较的列
+
+    参数:
+        columns1 / columns2: 两个数据源的列名
+        key_column: 关键列（始终参与比较）
+        columns: 只比较这些列（None 表示所有共同列）
+        ignore_columns: 不比较的列
+
+    返回:
+        (compared_columns, skipped_columns)：参与比较的列（含关键列，保持数据源1的列顺序），
+        以及两个数据源中未参与比较的列
+    """
+    common_columns = resolve_common_columns(columns1, columns2, key_column)
+    key_columns = as_key_columns(key_column)
+    ignore = set(as_key_columns(ignore_columns)) if ignore_columns else set()
+
+    ignored_keys = [col for col in key_columns if col in ignore]
+    if ignored_keys:
+        raise ValueError(f"关键列不能被忽略: {ignored_keys}")
+
+    include = None
+    if columns is not None:
+        include = set(as_key_columns(columns))
+        unknown = [col for col in as_key_columns(columns) if col not in common_columns]
+        if unknown:
+            raise ValueError(f"指定比较的列不是两个数据源的共同列: {unknown}")
+
+    compared_columns = [
+        col for col in common_columns if _keep_column(col, key_columns, include, ignore)
+    ]
+    all_columns = list(dict.fromkeys(list(columns1) + list(columns2)))
+    skipped_columns = [col for col in all_columns if col not in compared_columns]
+    return compared_columns, skipped_columns
+
+
+def factorize_keys(
+    keys1: pd.DataFrame, keys2: pd.DataFrame
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把两边的（组合）关键值编码为同一套 int64 整数编码
+
+    每个关键列先在两边合并后因子化，再按混合进制合成一个整数；
+    因子化按值排序，因此编码的大小顺序与关键值的字典序一致（值无法排序时退化为出现顺序）。
+    空值也作为一个独立的关键值参与编码。
+    """
+    n1 = len(keys1)
+    combined, size = None, 1
+    for col in keys1.columns:
+        values = pd.concat([keys1[col], keys2[col]], ignore_index=True)
+        try:
+            codes, uniques = pd.factorize(values, sort=True)
+        except TypeError:
+            codes, uniques = pd.factorize(values)
+        # 空值的编码为 -1，整体平移后作为最小的编码
+        codes = codes.astype(np.int64) + 1
+        n = len(uniques) + 1
+        if combined is None:
+            combined, size = codes, n
+            continue
+        if size * n >= 2 ** 63:
+            # 防止溢出：先把已合成的编码重新压缩为连续整数（保持大小顺序）
+            combined, compressed = pd.factorize(combined, sort=True)
+            combined = combined.astype(np.int64)
+            size = len(compressed)
+        combined = combined * n + codes
+        size *= n
+    return combined[:n1], combined[n1:]
+
+
+def _key_values(df: pd.DataFrame, key_columns: List[str], rows: np.ndarray) -> pd.Index:
+    """取出指定行的关键值：单关键列返回 Index，组合关键列返回 MultiIndex"""
+    if len(key_columns) == 1:
+        return pd.Index(df[key_columns[0]].iloc[rows].array)
+    return pd.MultiIndex.from_arrays(
+        [df[col].iloc[rows].array for col in key_columns], names=key_columns
+    )
+
+
+def _hash_values(s1: pd.Series, s2: pd.Series):
+    """
+    返回两列用于计算行指纹的规范化数组；两边类型无法保证“值相等则哈希相等”时返回 None
+
+    整数按原值哈希，整数与浮点混合时统一转为 float64（与 compare_aligned 的比较语义一致；
+    含空值的可空整数转为 float64 会失去大整数的精度，逐值比较），
+    字符串统一转为 object，空值（NaN/None/NA）哈希结果相同。
+    """
+    kind1, kind2 = s1.dtype.kind, s2.dtype.kind
+    if kind1 in "biu" and kind2 in "biu" and not (s1.hasnans or s2.hasnans):
+        return s1.to_numpy(dtype="int64"), s2.to_numpy(dtype="int64")
+    if kind1 in "biuf" and kind2 in "biuf":
+        if _nullable_int(s1) or _nullable_int(s2):
+            return None
+        return (
+            s1.to_numpy(dtype="float64", na_value=np.nan),
+            s2.to_numpy(dtype="float64", na_value=np.nan),
+        )
+    if kind1 in "mM" or kind2 in "mM":
+        if s1.dtype == s2.dtype:
+            return s1.to_numpy(), s2.to_numpy()
+        return None
+    string_like = ("string", "empty")
+    if (
+        pd.api.types.infer_dtype(s1, skipna=True) in string_like
+        and pd.api.types.infer_dtype(s2, skipna=True) in string_like
+    ):
+        return s1.to_numpy(dtype=object), s2.to_numpy(dtype=object)
+    return None
+
+
+def _row_fingerprints(df1: pd.DataFrame, df2: pd.DataFrame, columns: List[str]):
+    """
+    计算两个已对齐数据框的行指纹
+
+    返回:
+        (hashed_columns, h1, h2)：参与哈希的列，以及两边每行的 64 位指纹；
+        无法安全哈希的列（如混合类型）不在 hashed_columns 中，需要逐值比较
+    """
+    hashed_columns, values1, values2 = [], {}, {}
+    for col in columns:
+        pair = _hash_values(df1[col], df2[col])
+        if pair is None:
+            continue
+        hashed_columns.append(col)
+        values1[col], values2[col] = pair
+
+    if not hashed_columns:
+        return hashed_columns, None, None
+    h1 = pd.util.hash_pandas_object(pd.DataFrame(values1), index=False).to_numpy()
+    h2 = pd.util.hash_pandas_object(pd.DataFrame(values2), index=False).to_numpy()
+    return hashed_columns, h1, h2
+
+
+def _fingerprint_compare(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    columns: List[str],
+    verify: bool = False,
+    cancel: CancelToken = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    先比较行指纹，只对指纹不同的行逐列比较；返回值与 compare_aligned 相同
+
+    verify 为 True 时对指纹相同的行也逐值复核，排除哈希碰撞。
+    """
+    hashed_columns, h1, h2 = _row_fingerprints(df1, df2, columns)
+    column_ids = {col: i for i, col in enumerate(columns)}
+    parts = []
+
+    if hashed_columns:
+        candidates = np.arange(len(df1)) if verify else np.flatnonzero(h1 != h2)
+        check_cancelled(cancel)
+        rows, col_ids, old_values, new_values = compare_aligned(
+            df1.iloc[candidates], df2.iloc[candidates], hashed_columns, cancel
+        )
+        hashed_ids = np.array([column_ids[col] for col in hashed_columns], dtype=np.intp)
+        parts.append((candidates[rows], hashed_ids[col_ids], old_values, new_values))
+
+    # 无法安全哈希的列对所有行逐值比较
+    hashed_set = set(hashed_columns)
+    other_columns = [col for col in columns if col not in hashed_set]
+    if other_columns:
+        rows, col_ids, old_values, new_values = compare_aligned(
+            df1, df2, other_columns, cancel
+        )
+        other_ids = np.array([column_ids[col] for col in other_columns], dtype=np.intp)
+        parts.append((rows, other_ids[col_ids], old_values, new_values))
+
+    if len(parts) == 1:
+        return parts[0]
+    rows, col_ids, old_values, new_values = (np.concatenate(p) for p in zip(*parts))
+    order = np.lexsort((col_ids, rows))
+    return rows[order], col_ids[order], old_values[order], new_values[order]
+
+
+def _occurrence(codes: np.ndarray) -> np.ndarray:
+    """每个编码是第几次出现（从 0 开始）"""
+    return pd.Series(codes).groupby(codes, sort=False).cumcount().to_numpy()
+
+
+def _duplicate_match_codes(
+    codes1: np.ndarray,
+    codes2: np.ndarray,
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    compare_columns: List[str],
+    mode: str,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    为重复关键值的每一行生成两边通用、每行唯一的匹配编码（全部向量化）
+
+    编码相同的两行即为配对；编码按 (关键值, 配对序号) 的顺序排列，
+    因此按编码排序时同一关键值的行仍然相邻。
+    """
+    n1 = len(codes1)
+    if mode == "occurrence":
+        parts1 = {"key": codes1, "occurrence": _occurrence(codes1)}
+        parts2 = {"key": codes2, "occurrence": _occurrence(codes2)}
+        return factorize_keys(pd.DataFrame(parts1), pd.DataFrame(parts2))
+
+    # content：先在 (关键值, 行指纹) 分组内按出现顺序配对内容相同的行
+    _, h1, h2 = _row_fingerprints(df1, df2, compare_columns)
+    if h1 is None:
+        h1, h2 = np.zeros(n1, dtype=np.uint64), np.zeros(len(codes2), dtype=np.uint64)
+    content1, content2 = factorize_keys(
+        pd.DataFrame({"key": codes1, "hash": h1}), pd.DataFrame({"key": codes2, "hash": h2})
+    )
+    exact1, exact2 = factorize_keys(
+        pd.DataFrame({"content": content1, "occurrence": _occurrence(content1)}),
+        pd.DataFrame({"content": content2, "occurrence": _occurrence(content2)}),
+    )
+    matched1 = pd.Index(exact1).isin(exact2)
+    matched2 = pd.Index(exact2).isin(exact1)
+
+    # 其余行在关键值分组内按出现顺序配对；两轮配对以 stage 区分，保证编码不冲突
+    def stage_codes(codes, exact, matched):
+        sub = exact.copy()
+        rest = np.flatnonzero(~matched)
+        sub[rest] = _occurrence(codes[rest])
+        return pd.DataFrame({"key": codes, "stage": (~matched).astype(np.int64), "sub": sub})
+
+    return factorize_keys(
+        stage_codes(codes1, exact1, matched1), stage_codes(codes2, exact2, matched2)
+    )
+
+
+def diff_frames(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    key_column: Union[str, List[str]],
+    common_columns: List[str],
+    fingerprint: bool = False,
+    verify: bool = False,
+    duplicates: str = "first",
+    profiler: DiffProfiler = None,
+    cancel: CancelToken = None,
+) -> Dict:
+    """
+    基于关键列比较两个数据框，返回中间结果
+
+    数据框的行索引被视为行在原文件中的位置，用于在分区比较后恢复原始顺序。
+    key_column 可以是单个列名或列名列表（组合关键列）。关键值重复时按 duplicates 处理：
+    - "first": 每边只保留第一个出现的行
+    - "occurrence": 同一关键值的第 k 次出现与另一边的第 k 次出现配对
+    - "content": 同一关键值内先配对内容完全相同的行，其余行再按出现顺序配对
+    后两种模式下没有配对的重复行归为 extra_in_file1 / extra_in_file2。
+    profiler 不为 None 时记录关键值编码、重复值处理、对齐与逐值比较各阶段（见 file_diff_profile）；
+    cancel 在各阶段之间及逐值比较的每一列之间检查（见 file_diff_cancel）。
+    fingerprint 为 True 时先比较行指纹，只对指纹不同的行逐列比较（verify 同 _fingerprint_compare）。
+
+    返回:
+        字典，包含：
+        - 'duplicates1' / 'duplicates2': 数据源1/2 的关键列是否存在重复值
+        - 'not_in_file1' / 'not_in_file2': 仅在数据源2/1 中存在的关键值（已排序，
+          组合关键列为 MultiIndex）
+        - 'extra_in_file1' / 'extra_in_file2': 关键值两边都存在，但数据源1/2 中重复次数更多、
+          没有配对的行的关键值（已排序；duplicates="first" 时为空）
+        - 'common_keys' / 'common_pos': 共同关键值及其在数据源1中的行位置（数据源1顺序）
+        - 'common_pos2': 共同关键值在数据源2中的行位置（与 common_keys 一一对应）
+        - 'compare_columns': 参与比较的非关键列
+        - 'rows' / 'col_ids' / 'old_values' / 'new_values': compare_aligned 的单元格差异
+    """
+    if duplicates not in DUPLICATE_MODES:
+        raise ValueError(f"duplicates 必须是 {DUPLICATE_MODES} 之一")
+    key_columns = as_key_columns(key_column)
+    compare_columns = [col for col in common_columns if col not in key_columns]
+
+    total_rows = len(df1) + len(df2)
+    # 关键值编码为整数后再对齐，组合关键列与单关键列同样走整数哈希
+    check_cancelled(cancel)
+    with phase(profiler, "关键值编码", total_rows):
+        codes1, codes2 = factorize_keys(df1[key_columns], df2[key_columns])
+
+    # 只扫描一次关键列：重复标记同时用于告警和去重
+    check_cancelled(cancel)
+    with phase(profiler, "重复值处理", total_rows):
+        dup1 = pd.Index(codes1).duplicated()
+        dup2 = pd.Index(codes2).duplicated()
+        has_dup1, has_dup2 = bool(dup1.any()), bool(dup2.any())
+        paired = duplicates != "first" and (has_dup1 or has_dup2)
+        if not paired:
+            df1_unique = df1[~dup1] if has_dup1 else df1
+            df2_unique = df2[~dup2] if has_dup2 else df2
+            keys1 = pd.Index(codes1[~dup1] if has_dup1 else codes1)
+            keys2 = pd.Index(codes2[~dup2] if has_dup2 else codes2)
+        else:
+            # 重复关键值逐行配对：匹配编码对每一行唯一，之后与无重复时的流程相同
+            df1_unique, df2_unique = df1, df2
+            match1, match2 = _duplicate_match_codes(
+                codes1, codes2, df1, df2, compare_columns, duplicates
+            )
+            keys1, keys2 = pd.Index(match1), pd.Index(match2)
+
+    check_cancelled(cancel)
+    with phase(profiler, "关键值对齐", total_rows):
+        # 共同关键值按数据源1的顺序排列
+        in_file2 = keys1.isin(keys2)
+        common_rows = np.flatnonzero(in_file2)
+        positions2 = keys2.get_indexer(keys1[in_file2])
+
+        # 仅单边存在的关键值按编码（即关键值）排序
+        only_rows1 = np.flatnonzero(~in_file2)
+        only_rows1 = only_rows1[np.argsort(keys1[only_rows1], kind="stable")]
+        only_rows2 = np.flatnonzero(~keys2.isin(keys1))
+        only_rows2 = only_rows2[np.argsort(keys2[only_rows2], kind="stable")]
+
+        # 关键值在另一边存在、只是重复次数更多的行单独归为“多出的重复行”
+        extra_rows1 = extra_rows2 = np.empty(0, dtype=np.intp)
+        if paired:
+            key_in2 = pd.Index(codes1).isin(codes2)[only_rows1]
+            extra_rows1, only_rows1 = only_rows1[key_in2], only_rows1[~key_in2]
+            key_in1 = pd.Index(codes2).isin(codes1)[only_rows2]
+            extra_rows2, only_rows2 = only_rows2[key_in1], only_rows2[~key_in1]
+
+        df1_compare = df1_unique.iloc[common_rows]
+        df2_compare = df2_unique.iloc[positions2]
+
+    check_cancelled(cancel)
+    with phase(profiler, "逐值比较", len(common_rows)):
+        if fingerprint:
+            rows, col_ids, old_values, new_values = _fingerprint_compare(
+                df1_compare, df2_compare, compare_columns, verify, cancel
+            )
+        else:
+            rows, col_ids, old_values, new_values = compare_aligned(
+                df1_compare, df2_compare, compare_columns, cancel
+            )
+
+    return {
+        "duplicates1": has_dup1,
+        "duplicates2": has_dup2,
+        "not_in_file1": _key_values(df2_unique, key_columns, only_rows2),
+        "not_in_file2": _key_values(df1_unique, key_columns, only_rows1),
+        "extra_in_file1": _key_values(df1_unique, key_columns, extra_rows1),
+        "extra_in_file2": _key_values(df2_unique, key_columns, extra_rows2),
+        "common_keys": _key_values(df1_unique, key_columns, common_rows),
+        "common_pos": df1_compare.index.to_numpy(),
+        "common_pos2": df2_compare.index.to_numpy(),
+        "compare_columns": compare_columns,
+        "rows": rows,
+        "col_ids": col_ids,
+        "old_values": old_values,
+        "new_values": new_values,
+    }
+
+
+def partition_ids(keys: Union[pd.Series, pd.DataFrame], partitions: int) -> np.ndarray:
+    """
+    按关键值的哈希计算所属分区（0 ~ partitions-1），组合关键列传入 DataFrame
+
+    可解析为数值的关键值按数值哈希，保证 1、1.0、'1' 这类可能被视为相等的关键值落在同一分区；
+    空关键值无论列类型如何都落在同一分区。
+    """
+    columns = [keys[col] for col in keys.columns] if isinstance(keys, pd.DataFrame) else [keys]
+    combined = np.zeros(len(keys), dtype=np.uint64)
+    for series in columns:
+        numeric = pd.to_numeric(series, errors="coerce")
+        hashed = pd.util.hash_pandas_object(series, index=False).to_numpy()
+        numeric_hashed = pd.util.hash_pandas_object(
+            pd.Series(numeric, dtype="float64"), index=False
+        ).to_numpy()
+        hashed = np.where(pd.notna(numeric), numeric_hashed, hashed)
+        # 空值的哈希随列类型不同（float64 与 object 列中的 NaN 不同），统一为固定值
+        hashed[pd.isna(series).to_numpy()] = 0
+        combined = combined * np.uint64(1000003) ^ hashed
+    return (combined % np.uint64(partitions)).astype(np.intp)
+
+
+def _split_by_key(
+    df: pd.DataFrame, key_column: Union[str, List[str]], shards: int
+) -> List[pd.DataFrame]:
+    """按关键值哈希把数据框拆分为若干分片，分片内保持原有行顺序"""
+    ids = partition_ids(df[as_key_columns(key_column)], shards)
+    order = np.argsort(ids, kind="stable")
+    bounds = np.searchsorted(ids[order], np.arange(shards + 1))
+    return [df.iloc[order[bounds[i]:bounds[i + 1]]] for i in range(shards)]
+
+
+def parallel_diff_frames(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    key_column: Union[str, List[str]],
+    common_columns: List[str],
+    workers: int,
+    cancel: CancelToken = None,
+    **options,
+) -> Dict:
+    """
+    多进程版本的 diff_frames，options 原样传给 diff_frames
+
+    按关键值哈希把两边数据拆分为 workers 个分片，在进程池中分别比较后合并，
+    合并结果与单进程 diff_frames 完全一致（同一关键值必然落在同一分片）。
+    等待期间 cancel 被触发时直接终止工作进程。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    shards1 = _split_by_key(df1[common_columns], key_column, workers)
+    shards2 = _split_by_key(df2[common_columns], key_column, workers)
+    check_cancelled(cancel)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    futures = [
+        pool.submit(diff_frames, shard1, shard2, key_column, common_columns, **options)
+        for shard1, shard2 in zip(shards1, shards2)
+    ]
+    del shards1, shards2
+    return merge_diffs(gather(pool, futures, cancel))
+
+
+def _sorted_index(keys) -> pd.Index:
+    """与 Index.difference 一致：尽量排序，无法排序时保持原顺序"""
+    index = pd.Index(keys)
+    try:
+        return index.sort_values()
+    except TypeError:
+        return index
+
+
+def merge_diffs(diffs: List[Dict]) -> Dict:
+    """
+    合并多个分区的 diff_frames 中间结果
+
+    共同行按数据源1中的行位置恢复顺序，仅单边存在的关键值重新排序，
+    使合并结果与对完整数据调用 diff_frames 的结果一致。
+    """
+    if len(diffs) == 1:
+        return diffs[0]
+
+    def append_keys(name):
+        parts = [d[name] for d in diffs if len(d[name])] or [diffs[0][name]]
+        return parts[0].append(parts[1:])
+
+    common_pos = np.concatenate([d["common_pos"] for d in diffs])
+
+    # 单元格差异的行号需要加上各分区的偏移量
+    offsets = np.cumsum([0] + [len(d["common_pos"]) for d in diffs[:-1]])
+    rows = np.concatenate([d["rows"] + offset for d, offset in zip(diffs, offsets)])
+
+    order = np.argsort(common_pos, kind="stable")
+    new_row = np.empty(len(order), dtype=np.intp)
+    new_row[order] = np.arange(len(order))
+    rows = new_row[rows]
+    cell_order = np.argsort(rows, kind="stable")
+
+    return {
+        "duplicates1": any(d["duplicates1"] for d in diffs),
+        "duplicates2": any(d["duplicates2"] for d in diffs),
+        "not_in_file1": _sorted_index(append_keys("not_in_file1")),
+        "not_in_file2": _sorted_index(append_keys("not_in_file2")),
+        "extra_in_file1": _sorted_index(append_keys("extra_in_file1")),
+        "extra_in_file2": _sorted_index(append_keys("extra_in_file2")),
+        "common_keys": append_keys("common_keys").take(order),
+        "common_pos": common_pos[order],
+        "common_pos2": np.concatenate([d["common_pos2"] for d in diffs])[order],
+        "compare_columns": diffs[0]["compare_columns"],
+        "rows": rows[cell_order],
+        "col_ids": np.concatenate([d["col_ids"] for d in diffs])[cell_order],
+        "old_values": np.concatenate([d["old_values"] for d in diffs])[cell_order],
+        "new_values": np.concatenate([d["new_values"] for d in diffs])[cell_order],
+    }
+
+
+def _file_identity(file_path: str) -> Tuple[str, int, int]:
+    stat = os.stat(file_path)
+    return os.path.normcase(os.path.abspath(file_path)), stat.st_size, stat.st_mtime_ns
+
+
+def open_workbook(file_path: str) -> pd.ExcelFile:
+    """
+    打开（或复用已打开的）工作簿
+
+    解析工作簿时最耗时的共享字符串、样式只在打开时解析一次，之后 sheet 列表、
+    各 sheet 的表头与数据都复用同一个句柄。文件被修改后会重新打开。
+    句柄会占用文件，用完后调用 close_workbooks 释放。
+    """
+    identity = _file_identity(file_path)
+    with _WORKBOOK_LOCK:
+        excel_file = _WORKBOOKS.get(identity)
+        if excel_file is not None:
+            _WORKBOOKS.move_to_end(identity)
+            return excel_file
+
+        # 同一路径的旧版本句柄已失效
+        for stale in [key for key in _WORKBOOKS if key[0] == identity[0]]:
+            _WORKBOOKS.pop(stale).close()
+        try:
+            excel_file = pd.ExcelFile(file_path)
+        except Exception as e:
+            raise FileNotFoundError(f"无法读取文件 {file_path}, 错误: {e}")
+        _WORKBOOKS[identity] = excel_file
+        while len(_WORKBOOKS) > MAX_OPEN_WORKBOOKS:
+            _WORKBOOKS.popitem(last=False)[1].close()
+        return excel_file
+
+
+def list_sheets(file_path: str, file_type: str = "excel") -> List[str]:
+    """
+    返回工作簿的 sheet 名列表，句柄保留供随后的读取复用；
+    file_type 为 "sqlite" 时返回数据库中的表名
+    """
+    if file_type == "sqlite":
+        try:
+            return list_tables(file_path)
+        except Exception as e:
+            raise FileNotFoundError(f"无法读取文件 {file_path}, 错误: {e}")
+    return open_workbook(file_path).sheet_names
+
+
+def close_workbooks(file_paths: Union[str, List[str]] = None):
+    """关闭已打开的工作簿句柄（None 表示全部）"""
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    paths = None
+    if file_paths is not None:
+        paths = {os.path.normcase(os.path.abspath(path)) for path in file_paths}
+    with _WORKBOOK_LOCK:
+        for key in list(_WORKBOOKS):
+            if paths is None or key[0] in paths:
+                _WORKBOOKS.pop(key).close()
+
+
+def _read_workbook_source(
+    file_path: str, file_type: str, sheet_name: str = None, delimiter: str = ",", usecols=None
+) -> Tuple[pd.DataFrame, str]:
+    """与 read_source 相同，Excel 文件通过 open_workbook 复用已打开的句柄"""
+    excel_file = open_workbook(file_path) if file_type == "excel" else None
+    return read_source(file_path, file_type, sheet_name, delimiter, usecols, excel_file)
+
+
+def _load_side(
+    file_path: str,
+    file_type: str,
+    sheet_name: str,
+    delimiter: str,
+    key_column: Union[str, List[str]],
+    columns: List[str],
+    ignore_columns: List[str],
+    use_cache: bool,
+    log: DiffLog = None,
+) -> Tuple[pd.DataFrame, str, List[str], float]:
+    """读取一个数据源，返回 (数据, 类型描述, 表头, 耗时秒数)"""
+    start = time.perf_counter()
+    if use_cache:
+        # 缓存的是全部列（未命中时解析全部列并写入缓存），加载后再只保留需要的列：
+        # 首次读取比只解析需要的列慢，换来之后任意列筛选都能命中同一条目
+        from file_diff_cache import read_cached
+
+        data, display = read_cached(
+            _read_workbook_source, file_path, file_type, sheet_name, delimiter, log=log
+        )
+        header = data.columns.tolist()
+        data = data[_side_columns(header, key_column, columns, ignore_columns)]
+    else:
+        excel_file = open_workbook(file_path) if file_type == "excel" else None
+        header = read_header(file_path, file_type, sheet_name, delimiter, excel_file)
+        usecols = _side_columns(header, key_column, columns, ignore_columns)
+        data, display = read_source(
+            file_path, file_type, sheet_name, delimiter, usecols, excel_file
+        )
+    return data, display, header, time.perf_counter() - start
+
+
+def _load_side_in_process(*args) -> Tuple[pd.DataFrame, str, List[str], float]:
+    """在子进程中读取一个数据源，完成后释放子进程中打开的工作簿"""
+    try:
+        return _load_side(*args)
+    finally:
+        close_workbooks()
+
+
+def _load_sides(
+    sides: List[Tuple], load_mode: str, cancel: CancelToken = None, log: DiffLog = None
+) -> List[Tuple]:
+    """
+    按 load_mode 读取两个数据源；同一个工作簿的两个 sheet 共用句柄，依次读取
+
+    并发读取时 cancel 被触发即不再等待：子进程被终止，线程中的解析在后台结束后被丢弃。
+    """
+    log = as_log(log)
+    if load_mode == "process":
+        # 事件处理函数无法传入子进程：有处理函数时子进程不输出，否则按相同级别打印
+        child_log = DiffLog(QUIET if log.handler is not None else log.verbosity)
+        sides = [(*side, child_log) for side in sides]
+    else:
+        sides = [(*side, log) for side in sides]
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    (path1, file_type, *_), (path2, *_) = sides
+    same_workbook = file_type == "excel" and os.path.abspath(path1) == os.path.abspath(path2)
+    if load_mode == "serial" or same_workbook:
+        loaded = []
+        for side in sides:
+            check_cancelled(cancel)
+            loaded.append(_load_side(*side))
+        return loaded
+    if load_mode == "process":
+        pool = ProcessPoolExecutor(max_workers=2)
+        futures = [pool.submit(_load_side_in_process, *side) for side in sides]
+    else:
+        pool = ThreadPoolExecutor(max_workers=2)
+        futures = [pool.submit(_load_side, *side) for side in sides]
+    return gather(pool, futures, cancel)
+
+
+def _print_columns(compared_columns: List[str], skipped_columns: List[str], log: DiffLog):
+    log.emit("columns", lambda: f"🔍 比较列: {compared_columns}", columns=compared_columns)
+    if skipped_columns:
+        log.emit("columns", lambda: f"⏭️ 跳过列: {skipped_columns}", skipped=skipped_columns)
+
+
+def _build_results(
+    diff: Dict,
+    key_column: Union[str, List[str]],
+    meta: Dict = None,
+    profiler: DiffProfiler = None,
+    cancel: CancelToken = None,
+    log: DiffLog = None,
+) -> DiffResult:
+    """输出比较过程信息（按 log 的级别截断或不输出）并生成结构化结果"""
+    log = as_log(log)
+    handling = {
+        "first": "将保留第一个",
+        "occurrence": "将按出现顺序逐行配对",
+        "content": "将先配对内容相同的行，其余按出现顺序配对",
+    }[(meta or {}).get("duplicates", "first")]
+    for side in (1, 2):
+        if diff[f"duplicates{side}"]:
+            log.emit(
+                "warning",
+                lambda: f"⚠️  Warning: 数据源{side} 的 '{key_label(key_column)}' 存在重复值，{handling}",
+                side=side,
+            )
+
+    for name, text in (
+        ("not_in_file1", "🟡 数据源2 有 {} 行在 数据源1 中不存在"),
+        ("not_in_file2", "🟡 数据源1 有 {} 行在 数据源2 中不存在"),
+        ("extra_in_file1", "🟠 数据源1 有 {} 行重复关键值多于 数据源2，没有配对"),
+        ("extra_in_file2", "🟠 数据源2 有 {} 行重复关键值多于 数据源1，没有配对"),
+    ):
+        keys = diff[name]
+        if len(keys):
+            log.keys(name, text.format(len(keys)), keys)
+
+    results = DiffResult.from_diff(diff, key_column, meta)
+    if diff["common_keys"].empty:
+        log.emit("summary", "❌ 无共同行可用于比较")
+    elif results.mismatch_count == 0:
+        log.emit("summary", "✅ 所有匹配行在共同列上完全一致！")
+    elif log.enabled():
+        log.emit("summary", f"✅ {len(results.identical_keys)} 行完全一致")
+        log.emit("summary", "❌ 发现不一致的数据：")
+        log.emit("summary", "\n详细差异：")
+        with phase(profiler, "生成差异文本", results.mismatch_count):
+
+            def mismatch_lines():
+                for i, msg in enumerate(results.iter_mismatch_text()):
+                    if i % 10000 == 0:
+                        check_cancelled(cancel)
+                    yield msg
+
+            log.lines("mismatch", mismatch_lines(), results.mismatch_count, prefix="  ❌ ")
+
+    return results
+
 
 def two_file_diff(
     file1_path: str,
     file2_path: Union[str, None] = None,
-    key_column: str = None,
+    key_column: Union[str, List[str]] = None,
     sheet1: str = None,  # 可选：指定 sheet 名
     sheet2: str = None,
     output_report: bool = False,
     report_path: str = None,
+    report_format: str = None,  # 报告格式："csv"、"jsonl"、"parquet" 或 "xlsx"（默认按扩展名推断）
     compare_mode: str = "file",  # 新增参数：比较模式，"file" 或 "sheet"
     file_path_for_sheet: str = None,  # 当比较模式为"sheet"时，指定文件路径
-    file_type: str = "excel",  # 新增参数：文件类型，"excel"、"csv" 或 "txt"
+    file_type: str = "excel",  # 文件类型："excel"、"csv"、"txt"、"parquet"、"feather" 或 "sqlite"
     delimiter: str = ",",  # 新增参数：CSV/TXT文件的分隔符，默认为逗号
-) -> Dict[str, List[str]]:
+    streaming: bool = False,  # 流式分区比较（仅CSV/TXT），用于超出内存的大文件
+    memory_limit_mb: int = 512,  # 流式比较的内存预算（MB）
+    key_first: bool = False,  # 两遍读取：先只读关键列，再只读取关键值两边都存在的行（仅CSV/TXT）
+    sorted_input: bool = False,  # 两个文件已按关键列升序排列时按块同步归并比较（仅CSV/TXT）
+    block_checksums: bool = False,  # 分块校验：只读取摘要不同的块（仅已排序的CSV/TXT）
+    workers: int = 1,  # 并行比较的进程数
+    columns: List[str] = None,  # 只比较这些列（默认所有共同列）
+    ignore_columns: List[str] = None,  # 不比较的列
+    use_cache: bool = False,  # 使用磁盘上的解析结果缓存
+    load_mode: str = "thread",  # 两个数据源的读取方式："thread"、"process" 或 "serial"
+    snapshot: str = None,  # 快照文件路径，用于与上一次的数据源2增量比较
+    duplicates: str = "first",  # 重复关键值的处理方式："first"、"occurrence" 或 "content"
+    fingerprint: bool = False,  # 先比较行指纹，只逐列比较指纹不同的行
+    verify_fingerprint: bool = False,  # 对指纹相同的行逐值复核，排除哈希碰撞
+    profile: Union[bool, Callable[[Dict], None]] = False,  # 记录各阶段耗时与内存
+    cancel: CancelToken = None,  # 取消标记，用于中途取消比较
+    verbosity: int = NORMAL,  # 输出级别：0 不输出，1 截断的摘要，2 完整明细
+    on_event: Callable[[Dict], None] = None,  # 接收输出事件的函数（代替打印）
+) -> DiffResult:
     """
-    比较两个 Excel/CSV/TXT 文件或同一文件中的两个 Sheet 中基于关键列的共同列数据是否一致
+    比较两个 Excel/CSV/TXT/Parquet/Feather/SQLite 数据源或同一文件中的两个 Sheet 中基于关键列的共同列数据是否一致
 
     参数:
         file1_path: 第一个文件路径（通常是"全量数据"）
         file2_path: 第二个文件路径（待核对数据），当比较模式为"sheet"时可为None
-        key_column: 用于匹配行的关键列名（如 '订单号'）
-        sheet1: 第一个文件的 sheet 名（None 表示默认第一个 sheet，仅Excel文件有效）
-        sheet2: 第二个文件的 sheet 名（None 表示默认第一个 sheet，仅Excel文件有效）
+        key_column: 用于匹配行的关键列名（如 '订单号'），
+            或组合关键列的列名列表（如 ['订单号', '行号', '仓库']）
+        sheet1: 第一个文件的 sheet 名（None 表示默认第一个 sheet，仅Excel文件有效）；
+            SQLite 数据库中为表名或 SELECT / WITH 查询语句（None 表示第一个表）
+        sheet2: 第二个文件的 sheet 名，含义同 sheet1
         output_report: 是否生成差异报告
-        report_path: 报告保存路径（默认为自动生成的路径）
+        report_path: 报告保存路径（默认为自动生成的路径）；实际写出的路径记录在结果的 meta["report_path"] 中
+        report_format: 报告格式（见 file_diff_report），"csv"、"jsonl"、"parquet" 或 "xlsx"；
+            None 表示按 report_path 的扩展名推断，无法识别时为 csv。
+            报告按块流式写出，每个差异单元格一行（差异类型、关键列、列、两边的值）
         compare_mode: 比较模式，"file"表示比较两个文件，"sheet"表示比较同一文件中的两个sheet
         file_path_for_sheet: 当比较模式为"sheet"时，指定包含两个sheet的文件路径
-        file_type: 文件类型，"excel"表示Excel文件，"csv"表示CSV文件，"txt"表示TXT文件
+        file_type: 文件类型，"excel"表示Excel文件，"csv"表示CSV文件，"txt"表示TXT文件，
+            "parquet"、"feather"（Arrow IPC）与 "sqlite" 见 file_diff_columnar：只读取比较列、
+            保留列类型，几乎没有解析开销（Parquet / Feather 需要 pyarrow）
         delimiter: CSV/TXT文件的分隔符，默认为逗号
+        streaming: 是否按块读取并按关键列哈希分区到磁盘后逐个分区比较（仅CSV/TXT），
+            结果与一次性读取完全一致
+        memory_limit_mb: 流式比较的内存预算（MB），决定分区数量与每块读取的行数
+        key_first: 是否两遍读取（仅CSV/TXT，见 file_diff_stream.key_first_diff）。第一遍只读取关键列，
+            得到仅单边存在的关键值；第二遍按块读取其余列，只保留关键值两边都存在的行。
+            适合两边大部分关键值不同的文件，内存占用随共同行数增长，结果与一次性读取完全一致；
+            两遍读取时不使用解析缓存和快照
+        sorted_input: 两个文件是否已按关键列升序排列（仅CSV/TXT，见 file_diff_stream.merge_join_diff）。
+            为 True 时两个文件按块同步读取、逐段比较，内存占用与文件大小无关；
+            发现输入没有排序时输出警告并改用流式分区比较（streaming），结果不受影响。
+            不使用解析缓存、快照和 workers
+        block_checksums: 是否分块校验比较（仅已按关键列升序排列的CSV/TXT，见 file_diff_checksum）。
+            每个文件按关键值切分为块并计算摘要树，保存在文件旁的 <文件名>.fdsum 中，
+            只读取并逐值比较摘要不同的块；两个文件几乎相同时远快于完整比较，
+            再次比较未修改的文件时直接复用校验文件。输入没有排序时与 sorted_input 一样改用流式分区比较
+        workers: 并行比较的进程数，大于1时按关键列哈希分片后在进程池中比较，
+            结果与单进程比较完全一致
+        columns: 只比较这些列（关键列始终参与比较），None 表示比较所有共同列
+        ignore_columns: 不参与比较的列；未参与比较的列在读取时即被跳过，不会被解析
+        use_cache: 是否使用解析结果缓存（见 file_diff_cache），同一文件未修改时直接加载
+            上次解析的数据而不再重新解析，适合同一个全量文件反复与多个文件比较；
+            缓存的是全部列（未命中时解析全部列，加载后只保留比较列），流式模式下不使用
+        load_mode: 两个数据源的读取方式，"thread" 在两个线程中并发读取，"process" 在两个
+            子进程中读取（Excel 解析主要受 GIL 限制时更快），"serial" 依次读取；
+            Sheet比较模式下两个 sheet 共用同一个工作簿句柄，始终依次读取。
+            各数据源的读取耗时记录在结果的 meta["load_seconds"] 中
+        snapshot: 快照文件路径（见 file_diff_snapshot）。每次比较后把数据源2的关键值、
+            行指纹和行数据写入快照；下一次比较时若数据源1正是该文件，则不再解析数据源1，
+            只哈希数据源2并加载指纹不同的行，结果与行指纹模式的完整比较一致。
+            快照与本次的比较列或列类型不一致时自动改为完整比较；流式模式下不使用
+        duplicates: 重复关键值的处理方式。"first" 每边只保留第一个出现的行；
+            "occurrence" 同一关键值的第 k 次出现与另一边的第 k 次出现配对比较；
+            "content" 同一关键值内先配对内容完全相同的行，其余行再按出现顺序配对。
+            后两种模式下多出的、没有配对的重复行单独归为 extra_in_file1 / extra_in_file2
+        fingerprint: 是否先对共同列计算行指纹（哈希），指纹相同的行直接判定为一致，
+            只对指纹不同的行逐列比较；适合绝大多数行一致的数据
+        verify_fingerprint: 指纹模式下是否对指纹相同的行逐值复核以排除哈希碰撞
+        profile: 为 True 时记录各阶段（读取、关键值编码、对齐、逐值比较、生成文本、写报告等）的
+            耗时、行数与内存，保存在结果的 meta["profile"] 中（见 file_diff_profile）；
+            传入函数时每个阶段开始和结束时都以记录字典调用它，可用于显示实时进度
+        cancel: 取消标记（file_diff_cancel.CancelToken）。在其他线程中调用 cancel.cancel() 后，
+            比较在下一个检查点（各阶段之间、每一列、流式比较的每一块和每个分区）抛出
+            DiffCancelled，已读取的数据与流式比较的临时文件随之释放
+        verbosity: 输出级别（见 file_diff_log）。0 不输出也不格式化任何文本，适合批量或无界面调用；
+            1 输出过程信息，关键值列表与差异明细只显示前若干条；2 输出完整列表与每一处差异
+        on_event: 接收输出事件的函数，每个事件是包含 kind、level、message 及结构化字段的字典；
+            指定后不再打印到控制台
 
     返回:
-        字典，包含：
+        DiffResult，以列式数组保存结果，同时可按旧版字典方式访问：
         - 'identical': 完全一致的行
-        - 'mismatch': 值不一致的行及列
+        - 'mismatch': 值不一致的行及列（访问时才生成描述文本）
         - 'not_in_file1': 在 file2 但不在 file1 的行
         - 'not_in_file2': 在 file1 但不在 file2 的行
+        - 'extra_in_file1' / 'extra_in_file2': 关键值两边都存在，但 file1/file2 中
+          重复次数更多、没有配对的行（duplicates 为 "occurrence" 或 "content" 时）
     """
 
     # 验证参数
@@ -48,21 +996,48 @@ def two_file_diff(
     if compare_mode == "sheet" and not file_path_for_sheet:
         raise ValueError("当比较模式为 'sheet' 时，必须提供 file_path_for_sheet 参数")
 
-    if file_type not in ["excel", "csv", "txt"]:
-        raise ValueError("file_type 必须是 'excel'、'csv' 或 'txt'")
+    if file_type not in FILE_TYPES:
+        raise ValueError(f"file_type 必须是 {FILE_TYPES} 之一")
 
     if not key_column:
         raise ValueError("必须提供 key_column 参数")
 
+    if streaming and file_type not in TEXT_FILE_TYPES:
+        raise ValueError("流式比较仅支持CSV/TXT文件")
+
+    if key_first and file_type not in TEXT_FILE_TYPES:
+        raise ValueError("两遍读取仅支持CSV/TXT文件")
+
+    if sorted_input and file_type not in TEXT_FILE_TYPES:
+        raise ValueError("有序归并比较仅支持CSV/TXT文件")
+
+    if block_checksums and file_type not in TEXT_FILE_TYPES:
+        raise ValueError("分块校验比较仅支持CSV/TXT文件")
+
+    if sum([streaming, key_first, sorted_input, block_checksums]) > 1:
+        raise ValueError("streaming、key_first、sorted_input 与 block_checksums 只能使用其中一种")
+
+    if duplicates not in DUPLICATE_MODES:
+        raise ValueError(f"duplicates 必须是 {DUPLICATE_MODES} 之一")
+
+    if load_mode not in ["thread", "process", "serial"]:
+        raise ValueError("load_mode 必须是 'thread'、'process' 或 'serial'")
+
+    if report_format is not None:
+        from file_diff_report import REPORT_FORMATS
+
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"report_format 必须是 {REPORT_FORMATS} 之一")
+
     # 根据比较模式设置文件路径和sheet名称
     if compare_mode == "sheet":
-        # Sheet比较模式：比较同一文件中的两个sheet（仅支持Excel文件）
+        # Sheet比较模式：比较同一文件中的两个sheet（Excel），或同一数据库中的两个表（SQLite）
         file1_path = file_path_for_sheet
         file2_path = file_path_for_sheet
         if not sheet1 or not sheet2:
             raise ValueError("当比较模式为 'sheet' 时，必须提供 sheet1 和 sheet2 参数")
-        if file_type != "excel":
-            raise ValueError("Sheet比较模式仅支持Excel文件")
+        if file_type not in ("excel", "sqlite"):
+            raise ValueError("Sheet比较模式仅支持Excel与SQLite文件")
         comparison_description = f"同一文件 '{os.path.basename(file1_path)}' 中的 Sheet '{sheet1}' 与 Sheet '{sheet2}'"
     else:
         # 文件比较模式：比较两个不同文件
@@ -70,159 +1045,237 @@ def two_file_diff(
             raise ValueError("当比较模式为 'file' 时，必须提供 file2_path 参数")
         comparison_description = f"文件 '{os.path.basename(file1_path)}' 与 文件 '{os.path.basename(file2_path)}'"
 
-    print(f"🔍 开始比较: {comparison_description}")
-    print(f"📋 使用关键列: '{key_column}'")
-    print(f"📄 文件类型: {file_type}")
+    log = DiffLog(verbosity, on_event)
+    log.emit("start", lambda: f"🔍 开始比较: {comparison_description}")
+    log.emit("start", lambda: f"📋 使用关键列: '{key_label(key_column)}'")
+    log.emit("start", lambda: f"📄 文件类型: {file_type}")
 
-    # 根据文件类型选择读取方法
-    def read_file(file_path, sheet_name=None):
-        try:
-            if file_type == "excel":
-                data = pd.read_excel(file_path, sheet_name=sheet_name)
-                # 处理可能的字典返回值（当Excel有多个sheet且未指定sheet名时）
-                if isinstance(data, dict):
-                    # 如果是字典，取第一个sheet
-                    first_sheet = list(data.keys())[0]
-                    return data[first_sheet], first_sheet
-                else:
-                    return data, sheet_name or "默认sheet"
-            elif file_type == "csv":
-                return pd.read_csv(file_path, delimiter=delimiter), "CSV文件"
-            elif file_type == "txt":
-                return pd.read_csv(file_path, delimiter=delimiter), "TXT文件"
-        except Exception as e:
-            raise FileNotFoundError(f"无法读取文件 {file_path}, 错误: {e}")
+    profiler = None
+    if profile:
+        profiler = DiffProfiler(profile if callable(profile) else None)
 
-    # 1. 读取两个文件
-    df1, sheet1_display = read_file(file1_path, sheet1)
-    print(f"✅ 已加载数据源1: {os.path.basename(file1_path)}, 类型: {sheet1_display}")
+    compare_options = {
+        "fingerprint": fingerprint,
+        "verify": verify_fingerprint,
+        "duplicates": duplicates,
+    }
+    try:
+        if streaming or key_first or sorted_input or block_checksums:
+            # 流式 / 两遍读取 / 有序归并 / 分块校验：只读取表头确定比较列，数据按块读取
+            from file_diff_stream import (
+                UnsortedInputError,
+                key_first_diff,
+                merge_join_diff,
+                stream_diff,
+            )
 
-    df2, sheet2_display = read_file(file2_path, sheet2)
-    print(f"✅ 已加载数据源2: {os.path.basename(file2_path)}, 类型: {sheet2_display}")
+            compared_columns, skipped_columns = select_columns(
+                read_header(file1_path, file_type, None, delimiter),
+                read_header(file2_path, file_type, None, delimiter),
+                key_column,
+                columns,
+                ignore_columns,
+            )
+            _print_columns(compared_columns, skipped_columns, log)
+            sheet1_display = sheet2_display = f"{file_type.upper()}文件"
+            load_seconds = None
+            if sorted_input or block_checksums:
+                try:
+                    if block_checksums:
+                        from file_diff_checksum import checksum_diff
 
-    # 2. 检查关键列是否存在
-    if key_column not in df1.columns:
-        raise ValueError(
-            f"数据源1 中不存在关键列: {key_column}，可用列: {list(df1.columns)}"
-        )
-    if key_column not in df2.columns:
-        raise ValueError(
-            f"数据源2 中不存在关键列: {key_column}，可用列: {list(df2.columns)}"
-        )
-
-    # 3. 找出共同列
-    common_columns = df1.columns.intersection(df2.columns).tolist()
-    if not common_columns:
-        raise ValueError("两个数据源没有共同列，无法比较")
+                        diff = checksum_diff(
+                            file1_path,
+                            file2_path,
+                            key_column,
+                            compared_columns,
+                            delimiter=delimiter,
+                            memory_limit_mb=memory_limit_mb,
+                            compare_options=compare_options,
+                            profiler=profiler,
+                            cancel=cancel,
+                            log=log,
+                        )
+                    else:
+                        with phase(profiler, "有序归并比较"):
+                            diff = merge_join_diff(
+                                file1_path,
+                                file2_path,
+                                key_column,
+                                compared_columns,
+                                delimiter=delimiter,
+                                memory_limit_mb=memory_limit_mb,
+                                compare_options=compare_options,
+                                cancel=cancel,
+                                log=log,
+                            )
+                except UnsortedInputError as e:
+                    log.emit("warning", f"⚠️ {e}，改用流式分区比较")
+                    streaming = True
+            if streaming:
+                with phase(profiler, "流式比较"):
+                    diff = stream_diff(
+                        file1_path,
+                        file2_path,
+                        key_column,
+                        compared_columns,
+                        delimiter=delimiter,
+                        memory_limit_mb=memory_limit_mb,
+                        workers=workers,
+                        compare_options=compare_options,
+                        cancel=cancel,
+                        log=log,
+                    )
+            elif key_first:
+                diff = key_first_diff(
+                    file1_path,
+                    file2_path,
+                    key_column,
+                    compared_columns,
+                    delimiter=delimiter,
+                    memory_limit_mb=memory_limit_mb,
+                    workers=workers,
+                    compare_options=compare_options,
+                    profiler=profiler,
+                    cancel=cancel,
+                    log=log,
+                )
+        else:
+            # 1. 读取两个数据源（默认并发），未参与比较的列不会被解析
+            options = (key_column, columns, ignore_columns, use_cache)
+            sides = [
+                (file1_path, file_type, sheet1, delimiter, *options),
+                (file2_path, file_type, sheet2, delimiter, *options),
+            ]
+            snap = None
+            if snapshot:
+                from file_diff_snapshot import open_snapshot, write_snapshot
 
-    print(f"🔍 共同列: {common_columns}")
-
-    # 4. 提取共同列数据
-    df1_common = df1[common_columns].copy()
-    df2_common = df2[common_columns].copy()
-
-    # 5. 检查 key_column 是否有重复值
-    if df1_common[key_column].duplicated().any():
-        print(f"⚠️  Warning: 数据源1 的 '{key_column}' 存在重复值，将保留第一个")
-        df1_common = df1_common.drop_duplicates(subset=[key_column], keep="first")
-    if df2_common[key_column].duplicated().any():
-        print(f"⚠️  Warning: 数据源2 的 '{key_column}' 存在重复值，将保留第一个")
-        df2_common = df2_common.drop_duplicates(subset=[key_column], keep="first")
-
-    # 6. 设置索引
-    df1_indexed = df1_common.set_index(key_column)
-    df2_indexed = df2_common.set_index(key_column)
-
-    # 7. 找出差异行
-    only_in_file2 = df2_indexed.index.difference(df1_indexed.index)
-    only_in_file1 = df1_indexed.index.difference(df2_indexed.index)
-
-    results = {
-        "identical": [],
-        "mismatch": [],
-        "not_in_file1": list(only_in_file2),
-        "not_in_file2": list(only_in_file1),
-    }
+                snap = open_snapshot(
+                    snapshot,
+                    file1_path,
+                    key_column,
+                    {"file_type": file_type, "sheet_name": sheet1, "delimiter": delimiter},
+                )
+            if snap is not None:
+                # 快照模式：数据源1的关键值与行指纹来自快照，只读取数据源2
+                log.emit("snapshot", lambda: f"📸 使用快照: {snapshot}")
+                side1 = (None, snap.display, snap.header, 0.0)
+                side2 = _load_side(*sides[1], log)
+            else:
+                side1, side2 = _load_sides(sides, load_mode, cancel, log)
+            df1, sheet1_display, columns1, seconds1 = side1
+            df2, sheet2_display, columns2, seconds2 = side2
+            load_seconds = (seconds1, seconds2)
+            if profiler is not None:
+                # 两个数据源在线程池或子进程中读取，各自的耗时由 _load_side 计时
+                if df1 is not None:
+                    profiler.add("读取数据源1", seconds1, rows=len(df1))
+                profiler.add("读取数据源2", seconds2, rows=len(df2))
+            log.emit("loaded", lambda: f"✅ 已加载数据源1: {os.path.basename(file1_path)}, 类型: {sheet1_display}, 耗时 {seconds1:.2f} 秒")
+            log.emit("loaded", lambda: f"✅ 已加载数据源2: {os.path.basename(file2_path)}, 类型: {sheet2_display}, 耗时 {seconds2:.2f} 秒")
 
-    if only_in_file2.any():
-        print(
-            f"🟡 数据源2 有 {len(only_in_file2)} 行在 数据源1 中不存在: {list(only_in_file2)}"
-        )
+            check_cancelled(cancel)
 
-    if only_in_file1.any():
-        print(
-            f"🟡 数据源1 有 {len(only_in_file1)} 行在 数据源2 中不存在: {list(only_in_file1)}"
-        )
+            # 2. 确定两边共同参与比较的列
+            compared_columns, skipped_columns = select_columns(
+                columns1, columns2, key_column, columns, ignore_columns
+            )
+            _print_columns(compared_columns, skipped_columns, log)
 
-    # 8. 取交集部分进行比较
-    common_index = df1_indexed.index.intersection(df2_indexed.index)
-    if common_index.empty:
-        print("❌ 无共同行可用于比较")
-        return results
+            diff = None
+            if snap is not None:
+                try:
+                    with phase(profiler, "快照比较", len(df2)):
+                        diff = snap.diff(
+                            df2, key_column, compared_columns, duplicates, cancel
+                        )
+                finally:
+                    snap.close()
+                if diff is None:
+                    log.emit("warning", "⚠️ 快照的比较列或列类型与本次不一致，改为完整比较")
+                    check_cancelled(cancel)
+                    with phase(profiler, "读取数据源1") as record:
+                        df1 = _load_side(*sides[0], log)[0]
+                        record["rows"] = len(df1)
 
-    df1_compare = df1_indexed.loc[common_index]
-    df2_compare = df2_indexed.loc[common_index]
+            # 3. 基于关键列比较
+            if diff is None:
+                frame1, frame2 = df1[compared_columns], df2[compared_columns]
+                if workers > 1:
+                    log.emit("parallel", lambda: f"⚙️ 使用 {workers} 个进程并行比较")
+                    with phase(profiler, "并行比较", len(frame1) + len(frame2)):
+                        diff = parallel_diff_frames(
+                            frame1,
+                            frame2,
+                            key_column,
+                            compared_columns,
+                            workers,
+                            cancel=cancel,
+                            **compare_options,
+                        )
+                else:
+                    diff = diff_frames(
+                        frame1,
+                        frame2,
+                        key_column,
+                        compared_columns,
+                        profiler=profiler,
+                        cancel=cancel,
+                        **compare_options,
+                    )
+                del frame1, frame2
 
-    # 方法 1：尝试使用 compare()（pandas >= 1.1）
-    try:
-        diff = df2_compare.compare(df1_compare, align_axis=1)
-        if diff.empty:
-            print("✅ 所有匹配行在共同列上完全一致！")
-            results["identical"] = list(common_index)
-        else:
-            print("❌ 发现不一致的数据：")
-            print("\n详细差异：")
-            for idx in diff.index:
-                mismatch_cols = []
-                for col in diff.columns.levels[0]:
-                    val2 = diff.loc[idx, (col, "self")]  # self = df2
-                    val1 = diff.loc[idx, (col, "other")]  # other = df1
-                    if pd.notna(val2) or pd.notna(val1):
-                        mismatch_cols.append(f"{col}: '{val1}' vs '{val2}'")
-                if mismatch_cols:
-                    msg = f"【{key_column}={idx}】 " + "; ".join(mismatch_cols)
-                    results["mismatch"].append(msg)
-                    print(f"  ❌ {msg}")
-
-    except AttributeError:
-        # 兼容老版本 pandas
-        print("⚠️ 当前 pandas 版本不支持 .compare()，使用手动比较")
-        mismatches = []
-        identicals = []
-
-        for idx in common_index:
-            row1 = df1_compare.loc[idx]
-            row2 = df2_compare.loc[idx]
-            is_match = True
-            mismatch_cols = []
-
-            for col in common_columns:
-                if col == key_column:
-                    continue
-                v1, v2 = row1[col], row2[col]
-                if pd.isna(v1) and pd.isna(v2):
-                    continue
-                if v1 != v2:
-                    is_match = False
-                    mismatch_cols.append(f"{col}: '{v2}' vs '{v1}'")
-
-            if is_match:
-                identicals.append(idx)
-            else:
-                msg = f"【{key_column}={idx}】 " + "; ".join(mismatch_cols)
-                mismatches.append(msg)
-                print(f"  ❌ {msg}")
+            if snapshot:
+                check_cancelled(cancel)
+                # 保存数据源2的快照，供下一次以它作为数据源1时使用
+                with phase(profiler, "写入快照", len(df2)):
+                    write_snapshot(
+                        snapshot,
+                        file2_path,
+                        df2,
+                        columns2,
+                        key_column,
+                        {
+                            "file_type": file_type,
+                            "sheet_name": sheet2,
+                            "delimiter": delimiter,
+                            "display": sheet2_display,
+                        },
+                    )
+            del df1, df2
+    finally:
+        if file_type == "excel":
+            close_workbooks([file1_path, file2_path])
 
-        if identicals:
-            print(f"✅ {len(identicals)} 行完全一致")
-            results["identical"] = identicals
-        if mismatches:
-            results["mismatch"] = mismatches
+    results = _build_results(
+        diff,
+        key_column,
+        meta={
+            "description": comparison_description,
+            "compared_columns": compared_columns,
+            "skipped_columns": skipped_columns,
+            "source1": sheet1_display,
+            "source2": sheet2_display,
+            "load_seconds": load_seconds,
+            "duplicates": duplicates,
+            # 与 profiler.records 是同一个列表，之后的阶段（写报告）也会出现在结果中
+            "profile": profiler.records if profiler is not None else None,
+        },
+        profiler=profiler,
+        cancel=cancel,
+        log=log,
+    )
+    if diff["common_keys"].empty:
+        return results
 
     # 9. 生成报告（可选）
     if output_report:
+        check_cancelled(cancel)
+        report_start = time.perf_counter()
         # 生成默认报告路径
         if not report_path:
+            report_ext = report_format or "csv"
             if compare_mode == "sheet":
                 base_name = (
                     os.path.basename(file1_path)
@@ -231,7 +1284,7 @@ def two_file_diff(
                 )
                 default_report_path = os.path.join(
                     os.path.dirname(file1_path),
-                    f"{base_name}_{sheet1}_vs_{sheet2}_diff_report.csv",
+                    f"{base_name}_{sheet1}_vs_{sheet2}_diff_report.{report_ext}",
                 )
             else:
                 file1_base = (
@@ -250,7 +1303,7 @@ def two_file_diff(
                 )
                 default_report_path = os.path.join(
                     os.path.dirname(file1_path),
-                    f"{file1_base}_vs_{file2_base}_diff_report.csv",
+                    f"{file1_base}_vs_{file2_base}_diff_report.{report_ext}",
                 )
             report_file = default_report_path
         else:
@@ -258,52 +1311,40 @@ def two_file_diff(
 
         # 创建报告头部注释
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        counts = results.counts
         header_comments = [
             f"# Excel差异对比报告",
             f"# 生成时间: {timestamp}",
             f"# 比较对象: {comparison_description}",
-            f"# 关键列: {key_column}",
-            f"# 共同列({len(common_columns)}个): {'; '.join(common_columns)}",
+            f"# 关键列: {key_label(key_column)}",
+            f"# 比较列({len(compared_columns)}个): {'; '.join(map(str, compared_columns))}",
+            f"# 跳过列({len(skipped_columns)}个): {'; '.join(map(str, skipped_columns))}",
             f"# 数据源1: {os.path.basename(file1_path)} (类型: {sheet1_display})",
             f"# 数据源2: {os.path.basename(file2_path)} (类型: {sheet2_display})",
             f"# 统计信息:",
-            f"# 完全一致的行数: {len(results['identical'])}",
-            f"# 有差异的行数: {len(results['mismatch'])}",
-            f"# 仅在数据源1中存在的行数: {len(results['not_in_file1'])}",
-            f"# 仅在数据源2中存在的行数: {len(results['not_in_file2'])}",
-            "",
+            f"# 完全一致的行数: {counts['identical']}",
+            f"# 有差异的行数: {counts['mismatch']}",
+            f"# 仅在数据源1中存在的行数: {counts['not_in_file2']}",
+            f"# 仅在数据源2中存在的行数: {counts['not_in_file1']}",
         ]
+        if duplicates != "first":
+            header_comments += [
+                f"# 数据源1中多出的重复行数: {counts['extra_in_file1']}",
+                f"# 数据源2中多出的重复行数: {counts['extra_in_file2']}",
+            ]
+        header_comments.append("")
 
-        # 创建差异数据的DataFrame，格式与test.py一致
-        diff_data = []
-        
-        for item in results["not_in_file1"]:
-            diff_data.append({"差异类型": "仅在文件2中", "详情": item})
+        # 按块由结构化结果生成报告行并立即写出，不生成完整的差异文本
+        from file_diff_report import write_report
 
-        for item in results["not_in_file2"]:
-            diff_data.append({"差异类型": "仅在文件1中", "详情": item})
-
-        for item in results["mismatch"]:
-            diff_data.append({"差异类型": "不匹配", "详情": item})
-
-        
-
-        # 如果没有差异，添加一条说明
-        if not diff_data:
-            diff_data.append({"差异类型": "无差异", "详情": "没有发现差异"})
-
-        diff_df = pd.DataFrame(diff_data)
-
-        # 保存报告 - 先写入头部注释，再写入CSV数据
-        with open(report_file, "w", encoding="utf-8-sig") as f:
-            # 写入头部注释
-            for line in header_comments:
-                f.write(line + "\n")
-
-            # 写入CSV数据，使用lineterminator参数避免额外空行
-            diff_df.to_csv(f, index=False, encoding="utf-8-sig", lineterminator="\n")
+        report_rows = write_report(
+            results, report_file, report_format, header_comments, cancel=cancel
+        )
 
-        print(f"📝 差异报告已保存至: {report_file}")
+        results.meta["report_path"] = report_file
+        log.emit("report", lambda: f"📝 差异报告已保存至: {report_file}", path=report_file)
+        if profiler is not None:
+            profiler.add("写入报告", time.perf_counter() - report_start, rows=report_rows)
 
     return results
 
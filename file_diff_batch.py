@@ -0,0 +1,294 @@
+"""
+批量比较
+
+一次比较成百上千对文件：文件对来自清单文件（CSV），或按文件名匹配两个目录中的文件。
+所有文件对在进程池中并发比较，每个工作进程只导入一次依赖；
+同一文件出现在多个文件对中时先解析一次并写入解析缓存（file_diff_cache），之后各文件对直接加载。
+单个文件对失败不会中断整个批次，结果汇总为一张表（可保存为 CSV）。
+
+清单文件格式（CSV，第一行为表头，只有 file1、file2 为必填列，其余列为空时使用统一参数）:
+    file1,file2,key_column,sheet1,sheet2,file_type,delimiter,report_path
+    master.xlsx,supplier_a.xlsx,订单号,,,,,
+    master.xlsx,supplier_b.xlsx,"订单号,行号",,,,,
+相对路径相对于清单文件所在目录。
+"""
+
+import fnmatch
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import pandas as pd
+
+from file_diff_cancel import (
+    CancelToken,
+    DiffCancelled,
+    abandon_pool,
+    check_cancelled,
+    iter_completed,
+)
+from file_diff_log import NORMAL, QUIET, DiffLog
+
+# 清单文件中可为每个文件对单独指定的参数
+MANIFEST_COLUMNS = [
+    "file1",
+    "file2",
+    "key_column",
+    "sheet1",
+    "sheet2",
+    "file_type",
+    "delimiter",
+    "report_path",
+]
+
+# 汇总表的列
+SUMMARY_COLUMNS = [
+    "file1",
+    "file2",
+    "status",
+    "identical",
+    "mismatch",
+    "not_in_file1",
+    "not_in_file2",
+    "extra_in_file1",
+    "extra_in_file2",
+    "has_differences",
+    "seconds",
+    "error",
+]
+
+_EXTENSION_TYPES = {
+    ".xlsx": "excel",
+    ".xls": "excel",
+    ".csv": "csv",
+    ".txt": "txt",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+}
+
+
+def infer_file_type(file_path: str) -> str:
+    """根据扩展名推断文件类型，无法识别时按 CSV 处理"""
+    return _EXTENSION_TYPES.get(os.path.splitext(file_path)[1].lower(), "csv")
+
+
+def _split_columns(text: str):
+    names = [name.strip() for name in str(text).replace("，", ",").split(",") if name.strip()]
+    return names[0] if len(names) == 1 else names
+
+
+def load_manifest(manifest_path: str) -> List[Dict]:
+    """读取清单文件，返回文件对列表（每项为传给 two_file_diff 的参数）"""
+    manifest = pd.read_csv(manifest_path, dtype=str, keep_default_na=False)
+    missing = [col for col in ("file1", "file2") if col not in manifest.columns]
+    if missing:
+        raise ValueError(f"清单文件缺少必填列: {missing}")
+    unknown = [col for col in manifest.columns if col not in MANIFEST_COLUMNS]
+    if unknown:
+        raise ValueError(f"清单文件包含无法识别的列: {unknown}，可用列: {MANIFEST_COLUMNS}")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    pairs = []
+    for record in manifest.to_dict("records"):
+        pair = {name: value.strip() for name, value in record.items() if value.strip()}
+        for name in ("file1", "file2", "report_path"):
+            if name in pair:
+                pair[name] = os.path.normpath(os.path.join(base_dir, pair[name]))
+        if "key_column" in pair:
+            pair["key_column"] = _split_columns(pair["key_column"])
+        pairs.append(pair)
+    return pairs
+
+
+def match_directories(dir1: str, dir2: str, pattern: str = "*") -> List[Dict]:
+    """
+    按文件名匹配两个目录中的文件
+
+    dir1 中匹配 pattern 的每个文件与 dir2 中的同名文件组成一对；
+    dir2 中没有同名文件时该项的 file2 为 None，比较时记为失败。
+    """
+    names = sorted(
+        name
+        for name in os.listdir(dir1)
+        if fnmatch.fnmatch(name, pattern) and os.path.isfile(os.path.join(dir1, name))
+    )
+    pairs = []
+    for name in names:
+        file2 = os.path.join(dir2, name)
+        if not os.path.isfile(file2):
+            file2 = None
+        pairs.append({"file1": os.path.join(dir1, name), "file2": file2})
+    return pairs
+
+
+def _source_key(file_path: str, file_type: str, sheet_name, delimiter: str):
+    return os.path.abspath(file_path), file_type, sheet_name, delimiter
+
+
+def _pair_sources(pair: Dict, options: Dict):
+    """文件对两侧的数据源：(路径, 文件类型, sheet, 分隔符)"""
+    file_type = (
+        pair.get("file_type") or options.get("file_type") or infer_file_type(pair["file1"])
+    )
+    delimiter = pair.get("delimiter") or options.get("delimiter", ",")
+    return [
+        (pair["file1"], file_type, pair.get("sheet1"), delimiter),
+        (pair["file2"], file_type, pair.get("sheet2"), delimiter),
+    ]
+
+
+def _warm_up(source) -> None:
+    """预先解析一个数据源并写入解析缓存；失败时忽略，由对应的文件对报告错误"""
+    from file_diff import read_source
+    from file_diff_cache import read_cached
+
+    try:
+        read_cached(read_source, *source, log=DiffLog(QUIET))
+    except Exception:
+        pass
+
+
+def _run_pair(index: int, pair: Dict, options: Dict, cancel: CancelToken = None) -> Dict:
+    """比较一对文件，捕获除取消以外的所有异常，返回汇总表中的一行"""
+    from file_diff import two_file_diff
+
+    row = {"index": index, "file1": pair.get("file1"), "file2": pair.get("file2")}
+    start = time.perf_counter()
+    try:
+        if not row["file1"] or not row["file2"]:
+            raise FileNotFoundError("缺少数据源文件（目录模式下为数据源2中不存在同名文件）")
+        params = dict(options)
+        params.update(
+            {name: value for name, value in pair.items() if name not in ("file1", "file2")}
+        )
+        params.setdefault("file_type", infer_file_type(pair["file1"]))
+        if params.get("report_path"):
+            params["output_report"] = True
+        if not params.get("key_column"):
+            raise ValueError("未指定关键列")
+
+        # 各文件对不输出过程信息（也不格式化），避免多个进程的输出交错
+        params["verbosity"] = QUIET
+        result = two_file_diff(pair["file1"], pair["file2"], cancel=cancel, **params)
+        row.update(status="成功", **result.counts)
+        row["has_differences"] = result.has_differences
+    except DiffCancelled:
+        raise
+    except Exception as e:
+        row.update(status="失败", error=f"{type(e).__name__}: {e}")
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def batch_diff(
+    pairs: List[Dict],
+    key_column=None,
+    concurrency: int = None,
+    summary_path: str = None,
+    cancel: CancelToken = None,
+    verbosity: int = NORMAL,
+    on_event=None,
+    **options,
+) -> pd.DataFrame:
+    """
+    批量比较多个文件对
+
+    参数:
+        pairs: 文件对列表（load_manifest / match_directories 的返回值），
+            每项至少包含 file1、file2，其余键覆盖统一参数
+        key_column: 统一的关键列（文件对未单独指定时使用）
+        concurrency: 同时比较的文件对数量（进程数），默认 CPU 核数；为 1 时在当前进程中依次比较
+        summary_path: 汇总表 CSV 保存路径（None 表示不保存）
+        cancel: 取消标记（见 file_diff_cancel），取消后不再开始新的文件对，
+            进程池中正在比较的文件对被直接终止，抛出 DiffCancelled
+        verbosity / on_event: 批次本身的输出级别与事件处理函数（见 file_diff_log），
+            各文件对的比较过程始终不输出
+        **options: 传给 two_file_diff 的其他统一参数（如 output_report、columns、fingerprint）
+
+    返回:
+        汇总表 DataFrame，每个文件对一行：文件路径、状态（成功/失败）、各类别数量、耗时与错误信息
+    """
+    concurrency = max(1, concurrency or os.cpu_count() or 1)
+    options = dict(options, key_column=key_column)
+    log = DiffLog(verbosity, on_event)
+    log.emit("start", lambda: f"📦 批量比较: {len(pairs)} 对文件，并发数 {concurrency}")
+
+    # 出现在多个文件对中的数据源先解析一次并写入缓存，之后各文件对直接加载
+    usage = Counter(
+        _source_key(*source)
+        for pair in pairs
+        # 缺少任一文件的文件对在比较时单独报告失败，不参与统计
+        if pair.get("file1") and pair.get("file2")
+        for source in _pair_sources(pair, options)
+    )
+    shared = [key for key, count in usage.items() if count > 1 and os.path.isfile(key[0])]
+    # 未指定 use_cache 时，存在共用数据源即启用解析缓存
+    if options.get("use_cache") is None:
+        options["use_cache"] = bool(shared)
+    warm_sources = shared if options["use_cache"] else []
+    if warm_sources:
+        log.emit("cache", lambda: f"⚡ 预先解析 {len(warm_sources)} 个被多个文件对共用的数据源")
+
+    rows = []
+    start = time.perf_counter()
+    if concurrency == 1:
+        for source in warm_sources:
+            check_cancelled(cancel)
+            _warm_up(source)
+        for index, pair in enumerate(pairs):
+            check_cancelled(cancel)
+            rows.append(_run_pair(index, pair, options, cancel))
+            _print_progress(log, rows[-1], len(rows), len(pairs))
+    else:
+        pool = ProcessPoolExecutor(max_workers=concurrency)
+        try:
+            warm_futures = [pool.submit(_warm_up, source) for source in warm_sources]
+            for _ in iter_completed(warm_futures, cancel):
+                pass
+            futures = [
+                pool.submit(_run_pair, index, pair, options) for index, pair in enumerate(pairs)
+            ]
+            for future in iter_completed(futures, cancel):
+                rows.append(future.result())
+                _print_progress(log, rows[-1], len(rows), len(pairs))
+        except BaseException:
+            abandon_pool(pool)
+            raise
+        pool.shutdown()
+
+    summary = pd.DataFrame(rows, columns=["index"] + SUMMARY_COLUMNS)
+    summary = summary.sort_values("index").drop(columns="index").reset_index(drop=True)
+    counts = SUMMARY_COLUMNS[SUMMARY_COLUMNS.index("identical") : SUMMARY_COLUMNS.index("has_differences")]
+    summary[counts] = summary[counts].astype("Int64")
+
+    failed = int((summary["status"] == "失败").sum())
+    seconds = time.perf_counter() - start
+    log.emit(
+        "summary",
+        lambda: f"✅ 批量比较完成: 成功 {len(summary) - failed} 对，失败 {failed} 对，"
+        f"总耗时 {seconds:.2f} 秒",
+    )
+    if summary_path:
+        summary.to_csv(summary_path, index=False, encoding="utf-8-sig")
+        log.emit("report", lambda: f"📄 汇总报告已保存至: {summary_path}", path=summary_path)
+    return summary
+
+
+def _print_progress(log: DiffLog, row: Dict, done: int, total: int):
+    if not log.enabled():
+        return
+    name = f"{os.path.basename(row['file1'] or '-')} vs {os.path.basename(row['file2'] or '-')}"
+    if row["status"] == "成功":
+        state = "有差异" if row["has_differences"] else "一致"
+        text = f"  [{done}/{total}] {name}: {state} ({row['seconds']:.2f} 秒)"
+    else:
+        text = f"  [{done}/{total}] ❌ {name}: {row['error']}"
+    log.emit("progress", text, done=done, total=total, row=row)
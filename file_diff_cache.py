@@ -0,0 +1,199 @@
+"""
+解析结果磁盘缓存
+
+同一个“全量数据”文件常常要和很多文件反复比较，而解析 Excel（openpyxl）是最耗时的一步。
+本模块把解析后的 DataFrame 以二进制形式保存到缓存目录，下次读取同一文件时直接加载。
+
+- 缓存按 (绝对路径, sheet, 分隔符, 文件类型) 区分条目，文件大小或修改时间变化后条目自动失效
+- 缓存的是整个 sheet / 文件的全部列，任意列筛选都能命中同一条目；代价是未命中时解析全部列，
+  首次读取宽表比只读取比较列（usecols）慢，适合同一文件反复比较的场景
+- 缓存目录总大小超过上限时按最近使用时间淘汰（LRU）
+- 使用 `python file_diff_cache.py clear [文件路径]` 或 clear_cache() 手动清空
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+from typing import Tuple, Union
+
+import pandas as pd
+
+from file_diff_log import DiffLog, as_log
+
+# 缓存目录，可通过环境变量 FILE_DIFF_CACHE_DIR 指定
+CACHE_DIR = os.environ.get(
+    "FILE_DIFF_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".file_diff_cache")
+)
+# 缓存目录总大小上限（MB），可通过环境变量 FILE_DIFF_CACHE_MB 指定
+MAX_CACHE_MB = int(os.environ.get("FILE_DIFF_CACHE_MB", "2048"))
+
+_SUFFIX = ".pkl"
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _entry_prefix(file_path: str, file_type: str, sheet_name, delimiter: str) -> str:
+    """同一数据源的所有条目共享的文件名前缀（不含文件版本信息）"""
+    path_part = _digest(os.path.normcase(os.path.abspath(file_path)))
+    source_part = _digest(file_type, sheet_name, delimiter if file_type != "excel" else None)
+    return f"{path_part}_{source_part}_"
+
+
+def _entry_path(
+    file_path: str, file_type: str, sheet_name, delimiter: str, cache_dir: str
+) -> str:
+    stat = os.stat(file_path)
+    version = _digest(stat.st_size, stat.st_mtime_ns)
+    name = _entry_prefix(file_path, file_type, sheet_name, delimiter) + version + _SUFFIX
+    return os.path.join(cache_dir, name)
+
+
+def _entries(cache_dir: str, prefix: str = ""):
+    if not os.path.isdir(cache_dir):
+        return []
+    return [
+        os.path.join(cache_dir, name)
+        for name in os.listdir(cache_dir)
+        if name.startswith(prefix) and name.endswith(_SUFFIX)
+    ]
+
+
+def load_cached(
+    file_path: str,
+    file_type: str,
+    sheet_name=None,
+    delimiter: str = ",",
+    cache_dir: str = None,
+) -> Union[Tuple[pd.DataFrame, str], None]:
+    """读取缓存的 (数据, 类型描述)，未命中或缓存损坏时返回 None"""
+    path = _entry_path(file_path, file_type, sheet_name, delimiter, cache_dir or CACHE_DIR)
+    try:
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # 缓存文件损坏（如写入中断）时丢弃该条目并重新解析
+        _remove(path)
+        return None
+    # 更新访问时间，供 LRU 淘汰使用
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry
+
+
+def store_cached(
+    file_path: str,
+    file_type: str,
+    sheet_name,
+    delimiter: str,
+    data: pd.DataFrame,
+    display: str,
+    cache_dir: str = None,
+    max_mb: int = None,
+):
+    """保存解析结果，同一数据源的旧版本条目会被替换，随后按 LRU 淘汰超出上限的条目"""
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(file_path, file_type, sheet_name, delimiter, cache_dir)
+    prefix = _entry_prefix(file_path, file_type, sheet_name, delimiter)
+    for stale in _entries(cache_dir, prefix):
+        if stale != path:
+            _remove(stale)
+
+    # 先写临时文件再替换，避免并发读取到写了一半的条目
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((data, display), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    finally:
+        _remove(tmp_path)
+    _evict(cache_dir, (MAX_CACHE_MB if max_mb is None else max_mb) * 1024 * 1024)
+
+
+def read_cached(
+    read_func,
+    file_path: str,
+    file_type: str,
+    sheet_name=None,
+    delimiter: str = ",",
+    cache_dir: str = None,
+    log: DiffLog = None,
+) -> Tuple[pd.DataFrame, str]:
+    """
+    带缓存地读取一个数据源
+
+    read_func 为未命中时调用的解析函数，签名与 file_diff.read_source 相同，返回 (数据, 类型描述)。
+    log 为输出事件的 DiffLog（默认打印到控制台）。
+    """
+    log = as_log(log)
+    entry = load_cached(file_path, file_type, sheet_name, delimiter, cache_dir)
+    if entry is not None:
+        log.emit("cache", lambda: f"⚡ 命中解析缓存: {os.path.basename(file_path)}")
+        return entry
+    data, display = read_func(file_path, file_type, sheet_name, delimiter)
+    try:
+        store_cached(file_path, file_type, sheet_name, delimiter, data, display, cache_dir)
+    except OSError as e:
+        # 缓存只是加速手段，写入失败不影响比较
+        log.emit("warning", f"⚠️ 无法写入解析缓存: {e}")
+    return data, display
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _evict(cache_dir: str, max_bytes: int):
+    """按最近使用时间从旧到新删除条目，直到缓存目录总大小不超过上限"""
+    entries = []
+    for path in _entries(cache_dir):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+
+def cache_size(cache_dir: str = None) -> Tuple[int, int]:
+    """返回 (条目数, 总字节数)"""
+    paths = _entries(cache_dir or CACHE_DIR)
+    return len(paths), sum(os.path.getsize(path) for path in paths)
+
+
+def clear_cache(file_path: str = None, cache_dir: str = None) -> int:
+    """清空缓存；指定 file_path 时只清除该文件的条目。返回删除的条目数"""
+    prefix = ""
+    if file_path:
+        prefix = _digest(os.path.normcase(os.path.abspath(file_path))) + "_"
+    paths = _entries(cache_dir or CACHE_DIR, prefix)
+    for path in paths:
+        _remove(path)
+    return len(paths)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("clear", "info"):
+        print("用法: python file_diff_cache.py clear [文件路径] | info")
+        sys.exit(2)
+    if sys.argv[1] == "clear":
+        removed = clear_cache(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"🧹 已删除 {removed} 个缓存条目")
+    else:
+        count, size = cache_size()
+        print(f"📦 缓存目录: {CACHE_DIR}，{count} 个条目，共 {size / 1024 / 1024:.1f} MB")
@@ -0,0 +1,100 @@
+"""
+比较过程的协作式取消
+
+GUI 或调用方持有一个 CancelToken，把它传给 two_file_diff(cancel=...) / batch_diff(cancel=...)。
+比较引擎在各阶段之间、逐列比较的每一列之间、流式读取的每一块和每个分区之间检查它，
+被取消时抛出 DiffCancelled；已读取的数据随异常释放，流式比较的临时分区文件由 finally 删除。
+
+等待线程池 / 进程池时定期检查取消状态：进程池的工作进程会被直接终止，
+线程中正在进行的单次解析（如 openpyxl 读取整个 sheet）无法中断，它在后台结束后结果被丢弃。
+"""
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+from typing import Iterable, Iterator, List
+
+# 等待线程池 / 进程池时检查取消状态的间隔（秒）
+POLL_SECONDS = 0.1
+
+
+class DiffCancelled(Exception):
+    """比较已被取消"""
+
+
+class CancelToken:
+    """取消标记，可在任意线程中调用 cancel()"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """已取消时抛出 DiffCancelled"""
+        if self._event.is_set():
+            raise DiffCancelled("比较已取消")
+
+
+def check_cancelled(cancel: CancelToken = None):
+    """cancel 为 None 时不做任何检查，便于在比较函数中无条件使用"""
+    if cancel is not None:
+        cancel.check()
+
+
+def iter_completed(futures: Iterable, cancel: CancelToken = None) -> Iterator:
+    """按完成顺序返回 futures，等待期间每隔 POLL_SECONDS 检查一次取消状态"""
+    if cancel is None:
+        yield from as_completed(futures)
+        return
+    pending = set(futures)
+    while pending:
+        cancel.check()
+        done, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+        yield from done
+
+
+def abandon_pool(pool):
+    """
+    立即关闭执行器：取消尚未开始的任务，终止进程池的工作进程，不等待正在运行的线程
+
+    _processes / _result_queue 是 ProcessPoolExecutor 的内部属性，
+    各 Python 版本与平台的实现不同，缺失时跳过对应的清理步骤，只做普通的 shutdown。
+    """
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    writer = getattr(getattr(pool, "_result_queue", None), "_writer", None)
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        try:
+            if process.is_alive():
+                process.terminate()
+        except (AttributeError, OSError, ValueError):
+            # 进程已被执行器回收（已关闭的 Process 对象会抛出 ValueError）
+            pass
+    if writer is not None:
+        # 工作进程可能在写出结果的中途被终止，执行器的管理线程会一直等待这条不完整的结果，
+        # 使解释器退出时卡住。关闭本进程持有的写端后，工作进程全部退出时管理线程读到 EOF 并结束
+        try:
+            writer.close()
+        except (AttributeError, OSError):
+            pass
+
+
+def gather(pool, futures: List, cancel: CancelToken = None) -> List:
+    """
+    等待全部 futures 完成后关闭 pool，按提交顺序返回结果
+
+    任一任务出错或比较被取消时不再等待其余任务，直接放弃 pool 并抛出异常。
+    """
+    try:
+        for future in iter_completed(futures, cancel):
+            future.result()
+    except BaseException:
+        abandon_pool(pool)
+        raise
+    pool.shutdown()
+    return [future.result() for future in futures]
@@ -0,0 +1,629 @@
+"""
+分块校验比较（适合两个几乎相同、已按关键列排序的超大 CSV/TXT 文件）
+
+每个文件按关键值切分为若干块，对每块的原始字节计算摘要，相邻的块再逐层合并为上一层的摘要，
+组成一棵摘要树。比较时从顶层开始逐层对比摘要，摘要相同的范围内容完全相同，直接记为一致；
+只有摘要不同的块才按字节偏移读取并解析，与另一边不同的块一起调用 file_diff.diff_frames 比较。
+
+- 块的边界由关键值的哈希决定（内容定义分块）：关键值变化且哈希值满足条件处开始新块，
+  插入或删除几行只影响所在的块，其余块两边仍然对齐；同一关键值的各行总在同一块中
+- 摘要树与每块的关键值保存在文件旁的校验文件（<文件名>.fdsum，SQLite）中，
+  文件大小或修改时间、关键列、分隔符变化后自动重新计算；两边的校验文件都可用时，
+  再次比较只需读取不同的块
+- 摘要按原始字节计算，内容相同但写法不同的行（如 1 与 1.0）所在的块视为不同，
+  由逐值比较得出正确结果；两个文件的表头不同时摘要不可比，改为有序归并比较
+- 计算摘要时记录各列的整列类型（整数、浮点数、布尔值或文本），差异块按整列类型解析，
+  不受读取了哪些块的影响；某列在两个文件中的类型不同（如一边为数值、另一边含文本）时，
+  写法相同的值按类型比较并不相等，摘要同样不可比，改为有序归并比较
+
+输入需要按关键列升序排列（见 file_diff_stream.merge_join_diff），
+没有排序时抛出 UnsortedInputError。引号内的换行按 CSV 规则处理（引号字符为 "）。
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import sqlite3
+import tempfile
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from file_diff import as_key_columns, diff_frames, merge_diffs
+from file_diff_cancel import CancelToken, check_cancelled
+from file_diff_log import DiffLog, as_log
+from file_diff_profile import DiffProfiler, phase
+from file_diff_stream import (
+    check_sorted,
+    key_at,
+    merge_join_diff,
+    value_kind,
+)
+
+CHECKSUM_VERSION = 2
+CHECKSUM_SUFFIX = ".fdsum"
+# 平均每块的行数：关键值哈希能被该值整除时开始新块
+LEAF_ROWS = 4096
+# 上一层平均合并的块数
+FANOUT = 64
+# 每次从文件读取的字节数
+READ_BYTES = 32 * 1024 * 1024
+# SQLite 单条语句的参数数量有限，按批查询
+_QUERY_BATCH = 500
+
+_NEWLINE = 10
+_QUOTE = 34
+# 读取差异块时各类型类别的解析类型；布尔列与全空的列由解析器推断，结果与整列读取相同
+_PARSE_DTYPES = {"int": "int64", "float": "float64", "text": str}
+
+
+def checksum_path(file_path: str) -> str:
+    """文件对应的校验文件路径"""
+    return file_path + CHECKSUM_SUFFIX
+
+
+def _file_identity(file_path: str) -> Dict:
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _dumps(obj) -> bytes:
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _iter_records(f, read_bytes: int = READ_BYTES):
+    """
+    从文件当前位置起按批读取完整的记录（引号内的换行不算记录结束）
+
+    逐批返回 (批的起始偏移, 批数据, 各记录在批内的结束位置)，结束位置包含换行符
+    """
+    offset = f.tell()
+    carry = b""
+    while True:
+        data = f.read(read_bytes)
+        buffer = carry + data
+        if not buffer:
+            return
+        array = np.frombuffer(buffer, dtype=np.uint8)
+        newlines = np.flatnonzero(array == _NEWLINE)
+        if len(newlines) and b'"' in buffer:
+            # 换行前引号个数为偶数时才是记录结束（"" 转义的引号不改变奇偶）
+            parity = np.cumsum(array == _QUOTE, dtype=np.uint8) & 1
+            newlines = newlines[parity[newlines] == 0]
+        ends = newlines + 1
+        if not data and (len(ends) == 0 or ends[-1] != len(buffer)):
+            # 文件末尾没有换行的最后一条记录
+            ends = np.append(ends, len(buffer))
+        if len(ends):
+            used = int(ends[-1])
+            yield offset, buffer[:used], ends
+            carry = buffer[used:]
+            offset += used
+        else:
+            carry = buffer
+        if not data:
+            return
+
+
+def _merge_kind(kind1: Union[str, None], kind2: Union[str, None]) -> Union[str, None]:
+    """
+    合并同一列在两批数据中的类型类别，得到整列一次性读取时的类别：
+    整数与浮点数合并为浮点数，含文本时整列按文本读取，布尔值与数值混合记为 "mixed"
+    """
+    if kind1 is None or kind1 == kind2:
+        return kind2
+    if kind2 is None:
+        return kind1
+    kinds = {kind1, kind2}
+    if kinds == {"int", "float"}:
+        return "float"
+    if "text" in kinds and "mixed" not in kinds:
+        return "text"
+    return "mixed"
+
+
+def _blank_records(array: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """空行（只有换行符）的掩码，pandas 读取时跳过空行"""
+    lengths = ends - starts
+    newline = (lengths > 0) & (array[np.maximum(ends - 1, 0)] == _NEWLINE)
+    content = lengths - newline
+    carriage = (content > 0) & (array[np.maximum(ends - 1 - newline, 0)] == 13)
+    return content - carriage == 0
+
+
+class ChecksumTree:
+    """
+    一个文件的摘要树，保存在 SQLite 校验文件中
+
+    属性:
+        meta: 文件标识、关键列、分隔符、表头等
+        leaves: 各块的 row_start、row_count（不含空行）、byte_start、byte_end 数组
+        levels: 各层的摘要（levels[0] 为块本身），每层包含 digest、first_hash、
+            leaf_start、leaf_count（该节点覆盖的连续块范围）与 child_start、child_count
+    """
+
+    def __init__(self, path: str, temporary: bool = False):
+        self.path = path
+        self.temporary = temporary
+        self.conn = sqlite3.connect(path)
+        self.meta = self._load("meta")
+        self.leaves = self._load("leaves")
+        self.levels = self._load("levels")
+
+    def _load(self, name: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return pickle.loads(row[0])
+
+    def matches(self, file_path: str, key_columns: List[str], delimiter: str) -> bool:
+        meta = self.meta
+        return (
+            meta["version"] == CHECKSUM_VERSION
+            and meta["pandas_version"] == pd.__version__
+            and meta["identity"] == _file_identity(file_path)
+            and meta["key_columns"] == key_columns
+            and meta["delimiter"] == delimiter
+            and meta["leaf_rows"] == LEAF_ROWS
+            and meta["fanout"] == FANOUT
+        )
+
+    @property
+    def header(self) -> bytes:
+        return self.meta["header"]
+
+    def leaf_keys(self, leaf_ids: np.ndarray) -> List[pd.DataFrame]:
+        """按块编号加载各块的关键值（行索引为行在文件中的位置），按块编号顺序返回"""
+        ids = [int(i) for i in leaf_ids]
+        frames = {}
+        for start in range(0, len(ids), _QUERY_BATCH):
+            batch = ids[start : start + _QUERY_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            cursor = self.conn.execute(
+                f"SELECT leaf_id, data FROM leaf_keys WHERE leaf_id IN ({placeholders})", batch
+            )
+            frames.update((leaf_id, pickle.loads(data)) for leaf_id, data in cursor)
+        return [frames[i] for i in ids]
+
+    def close(self):
+        self.conn.close()
+        if self.temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _build_levels(digests: List[bytes], first_hash: np.ndarray) -> List[Dict]:
+    """由各块的摘要逐层合并出摘要树，顶层不超过 FANOUT 个节点"""
+    count = len(digests)
+    levels = [
+        {
+            "digest": digests,
+            "first_hash": first_hash,
+            "leaf_start": np.arange(count, dtype=np.int64),
+            "leaf_count": np.ones(count, dtype=np.int64),
+            "child_start": np.arange(count, dtype=np.int64),
+            "child_count": np.zeros(count, dtype=np.int64),
+        }
+    ]
+    while len(levels[-1]["digest"]) > FANOUT:
+        lower = levels[-1]
+        # 与块的切分条件使用哈希值的不同位，节点边界同样由内容决定
+        starts = np.flatnonzero((lower["first_hash"] >> np.uint64(32)) % np.uint64(FANOUT) == 0)
+        starts = np.union1d([0], starts).astype(np.int64)
+        if len(starts) == len(lower["digest"]):
+            break
+        bounds = np.append(starts, len(lower["digest"]))
+        levels.append(
+            {
+                "digest": [
+                    hashlib.blake2b(
+                        b"".join(lower["digest"][bounds[i] : bounds[i + 1]]), digest_size=16
+                    ).digest()
+                    for i in range(len(starts))
+                ],
+                "first_hash": lower["first_hash"][starts],
+                "leaf_start": lower["leaf_start"][starts],
+                "leaf_count": np.add.reduceat(lower["leaf_count"], starts),
+                "child_start": starts,
+                "child_count": np.diff(bounds),
+            }
+        )
+    return levels
+
+
+def build_checksums(
+    file_path: str,
+    key_column: Union[str, List[str]],
+    delimiter: str = ",",
+    tree_path: str = None,
+    cancel: CancelToken = None,
+) -> Tuple[str, int]:
+    """
+    读取文件并把摘要树写入 tree_path（默认为文件旁的校验文件），返回 (校验文件路径, 数据行数)
+
+    解析全部列以记录各列的整列类型；关键值没有升序排列时抛出 UnsortedInputError，不写入校验文件。
+    """
+    key_columns = as_key_columns(key_column)
+    tree_path = tree_path or checksum_path(file_path)
+    identity = _file_identity(file_path)
+    tmp_path = f"{tree_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value BLOB)")
+        conn.execute("CREATE TABLE leaf_keys (leaf_id INTEGER PRIMARY KEY, data BLOB)")
+
+        header = None
+        rows = 0
+        column_kinds = {}
+        previous_key = previous_hash = None
+        leaves = {"row_start": [], "byte_start": [], "first_hash": [], "digest": []}
+        leaf_hasher = None
+        leaf_keys = []
+
+        def close_leaf():
+            leaves["digest"].append(leaf_hasher.digest())
+            frame = pd.concat(leaf_keys) if len(leaf_keys) > 1 else leaf_keys[0]
+            conn.execute(
+                "INSERT INTO leaf_keys VALUES (?, ?)", (len(leaves["digest"]) - 1, _dumps(frame))
+            )
+            leaf_keys.clear()
+
+        with open(file_path, "rb") as f:
+            for offset, buffer, ends in _iter_records(f):
+                check_cancelled(cancel)
+                array = np.frombuffer(buffer, dtype=np.uint8)
+                starts = np.concatenate([[0], ends[:-1]])
+                if header is None:
+                    header = buffer[: ends[0]]
+                    if not header.endswith(b"\n"):
+                        header += b"\n"
+                    starts, ends = starts[1:], ends[1:]
+                    if not len(starts):
+                        continue
+                keep = ~_blank_records(array, starts, ends)
+                record_starts = starts[keep]
+                if not len(record_starts):
+                    continue
+                body = buffer[starts[0] :]
+                # 解析全部列以记录整列的类型类别，读取差异块时按整列类型解析
+                batch = pd.read_csv(io.BytesIO(header + body), delimiter=delimiter)
+                for col in batch.columns:
+                    column_kinds[col] = _merge_kind(column_kinds.get(col), value_kind(batch[col]))
+                keys = batch[key_columns]
+                del batch
+                if len(keys) != len(record_starts):
+                    raise ValueError(f"{os.path.basename(file_path)} 的行无法按 CSV 规则切分")
+                keys.index = pd.RangeIndex(rows, rows + len(keys))
+                check_sorted(keys, key_columns, previous_key, file_path)
+
+                hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+                first = hashes[0] if previous_hash is None else previous_hash
+                previous = np.concatenate([[first], hashes[:-1]])
+                cuts = np.flatnonzero((hashes != previous) & (hashes % np.uint64(LEAF_ROWS) == 0))
+                if leaf_hasher is None:
+                    # 第一块从第一条数据记录开始
+                    cuts = np.union1d([0], cuts)
+
+                cursor, key_start = int(starts[0]), 0
+                for cut in list(cuts) + [len(keys)]:
+                    cut = int(cut)
+                    end = int(record_starts[cut]) if cut < len(keys) else len(buffer)
+                    if leaf_hasher is not None and end > cursor:
+                        leaf_hasher.update(buffer[cursor:end])
+                    if cut > key_start:
+                        leaf_keys.append(keys.iloc[key_start:cut])
+                    if cut < len(keys):
+                        if leaf_hasher is not None:
+                            close_leaf()
+                        leaf_hasher = hashlib.blake2b(digest_size=16)
+                        leaves["row_start"].append(rows + cut)
+                        leaves["byte_start"].append(offset + end)
+                        leaves["first_hash"].append(hashes[cut])
+                    cursor, key_start = end, cut
+
+                rows += len(keys)
+                previous_key = key_at(keys, key_columns, len(keys) - 1)
+                previous_hash = hashes[-1]
+        if leaf_hasher is not None:
+            close_leaf()
+
+        row_start = np.array(leaves["row_start"], dtype=np.int64)
+        byte_start = np.array(leaves["byte_start"], dtype=np.int64)
+        meta = {
+            "version": CHECKSUM_VERSION,
+            "pandas_version": pd.__version__,
+            "identity": identity,
+            "key_columns": key_columns,
+            "delimiter": delimiter,
+            "header": header or b"",
+            "column_kinds": column_kinds,
+            "rows": rows,
+            "leaf_rows": LEAF_ROWS,
+            "fanout": FANOUT,
+        }
+        leaf_table = {
+            "row_start": row_start,
+            "row_count": np.diff(np.append(row_start, rows)),
+            "byte_start": byte_start,
+            "byte_end": np.append(byte_start[1:], identity["size"]),
+        }
+        levels = _build_levels(leaves["digest"], np.array(leaves["first_hash"], dtype=np.uint64))
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("meta", _dumps(meta)), ("leaves", _dumps(leaf_table)), ("levels", _dumps(levels))],
+        )
+        conn.commit()
+    except BaseException:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, tree_path)
+    return tree_path, rows
+
+
+def load_checksums(
+    file_path: str,
+    key_column: Union[str, List[str]],
+    delimiter: str = ",",
+    profiler: DiffProfiler = None,
+    cancel: CancelToken = None,
+    log: DiffLog = None,
+) -> Tuple[ChecksumTree, bool]:
+    """
+    打开文件旁的校验文件，不存在或已过期时重新计算并保存，返回 (摘要树, 是否复用了已有的校验文件)
+
+    文件所在目录不可写时校验文件保存在临时目录，比较结束后（close）删除。
+    """
+    key_columns = as_key_columns(key_column)
+    path = checksum_path(file_path)
+    if os.path.exists(path):
+        try:
+            tree = ChecksumTree(path)
+        except Exception:
+            tree = None
+        if tree is not None:
+            if tree.matches(file_path, key_columns, delimiter):
+                return tree, True
+            tree.close()
+
+    temporary = False
+    with phase(profiler, "计算分块校验") as record:
+        try:
+            path, record["rows"] = build_checksums(file_path, key_column, delimiter, path, cancel)
+        except (OSError, sqlite3.Error):
+            as_log(log).emit(
+                "warning", f"⚠️ 无法在 {os.path.dirname(os.path.abspath(path))} 保存校验文件，本次使用临时文件"
+            )
+            fd, tmp = tempfile.mkstemp(prefix="file_diff_", suffix=CHECKSUM_SUFFIX)
+            os.close(fd)
+            os.remove(tmp)
+            path, record["rows"] = build_checksums(file_path, key_column, delimiter, tmp, cancel)
+            temporary = True
+    return ChecksumTree(path, temporary), False
+
+
+def _node_leaves(level: Dict, nodes: List[int]) -> np.ndarray:
+    """一层中若干节点覆盖的全部块编号（按顺序）"""
+    if not nodes:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(
+        [
+            np.arange(level["leaf_start"][i], level["leaf_start"][i] + level["leaf_count"][i])
+            for i in nodes
+        ]
+    )
+
+
+def _node_children(level: Dict, nodes: List[int]) -> List[int]:
+    children = []
+    for i in nodes:
+        start = int(level["child_start"][i])
+        children.extend(range(start, start + int(level["child_count"][i])))
+    return children
+
+
+def match_trees(
+    tree1: ChecksumTree, tree2: ChecksumTree
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    从顶层开始逐层对比摘要，只在摘要不同的节点下继续向下比较
+
+    返回:
+        (pairs1, pairs2, unmatched1, unmatched2)：摘要相同的块两两配对的块编号，
+        以及两边摘要不同的块编号
+    """
+    height = min(len(tree1.levels), len(tree2.levels))
+    nodes1 = list(range(len(tree1.levels[height - 1]["digest"])))
+    nodes2 = list(range(len(tree2.levels[height - 1]["digest"])))
+    pairs1, pairs2 = [], []
+    for depth in range(height - 1, -1, -1):
+        level1, level2 = tree1.levels[depth], tree2.levels[depth]
+        available = {}
+        for j in nodes2:
+            available.setdefault(level2["digest"][j], []).append(j)
+        matched2 = set()
+        unmatched1 = []
+        for i in nodes1:
+            candidates = available.get(level1["digest"][i])
+            if candidates and level1["leaf_count"][i] == level2["leaf_count"][candidates[0]]:
+                j = candidates.pop(0)
+                matched2.add(j)
+                pairs1.append(_node_leaves(level1, [i]))
+                pairs2.append(_node_leaves(level2, [j]))
+            else:
+                unmatched1.append(i)
+        unmatched2 = [j for j in nodes2 if j not in matched2]
+        if depth == 0:
+            nodes1, nodes2 = unmatched1, unmatched2
+        else:
+            nodes1 = _node_children(level1, unmatched1)
+            nodes2 = _node_children(level2, unmatched2)
+
+    def ids(parts):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    unmatched1 = np.array(nodes1, dtype=np.int64)
+    unmatched2 = np.array(nodes2, dtype=np.int64)
+    return ids(pairs1), ids(pairs2), unmatched1, unmatched2
+
+
+def read_leaves(
+    file_path: str,
+    tree: ChecksumTree,
+    leaf_ids: np.ndarray,
+    columns: List[str],
+    cancel: CancelToken = None,
+) -> pd.DataFrame:
+    """
+    按字节偏移只读取并解析指定的块，返回的行索引为行在文件中的位置
+
+    各列按校验文件中记录的整列类型解析（而不是由读取的块推断），与一次性读取整个文件的类型一致。
+    """
+    kinds = tree.meta["column_kinds"]
+    dtypes = {col: _PARSE_DTYPES[kinds[col]] for col in columns if kinds.get(col) in _PARSE_DTYPES}
+    leaves = tree.leaves
+    leaf_ids = np.sort(leaf_ids)
+    parts = [tree.header]
+    with open(file_path, "rb") as f:
+        # 连续的块合并为一次读取
+        breaks = np.flatnonzero(np.diff(leaf_ids) != 1) + 1
+        for run in np.split(leaf_ids, breaks):
+            if not len(run):
+                continue
+            check_cancelled(cancel)
+            start, end = leaves["byte_start"][run[0]], leaves["byte_end"][run[-1]]
+            f.seek(start)
+            data = f.read(end - start)
+            parts.append(data if data.endswith(b"\n") else data + b"\n")
+    frame = pd.read_csv(
+        io.BytesIO(b"".join(parts)), delimiter=tree.meta["delimiter"], usecols=columns, dtype=dtypes
+    )[columns]
+    positions = [
+        np.arange(leaves["row_start"][i], leaves["row_start"][i] + leaves["row_count"][i])
+        for i in leaf_ids
+    ]
+    frame.index = np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+    return frame
+
+
+def _incomparable_reason(
+    tree1: ChecksumTree, tree2: ChecksumTree, columns: List[str]
+) -> Union[str, None]:
+    """
+    两个文件中摘要相同的块不一定内容一致时返回原因：表头不同，或某列在两个文件中的整列类型不同
+    （如一边为数值、另一边含文本时，同样写法的值按类型比较并不相等）
+    """
+    if tree1.header.rstrip(b"\r\n") != tree2.header.rstrip(b"\r\n"):
+        return "两个文件的表头不同"
+    for col in columns:
+        kind1 = tree1.meta["column_kinds"].get(col)
+        kind2 = tree2.meta["column_kinds"].get(col)
+        if "mixed" in (kind1, kind2):
+            return f"列 {col!r} 同时含有不同类型的值"
+        if None in (kind1, kind2) or kind1 == kind2 or {kind1, kind2} == {"int", "float"}:
+            continue
+        return f"列 {col!r} 在两个文件中的类型不同"
+    return None
+
+
+def checksum_diff(
+    file1_path: str,
+    file2_path: str,
+    key_column: Union[str, List[str]],
+    common_columns: List[str],
+    delimiter: str = ",",
+    memory_limit_mb: int = 512,
+    compare_options: Dict = None,
+    profiler: DiffProfiler = None,
+    cancel: CancelToken = None,
+    log: DiffLog = None,
+) -> Dict:
+    """
+    分块校验比较两个已按关键列升序排列的 CSV/TXT 文件，返回与 file_diff.diff_frames 相同结构的中间结果
+
+    摘要相同的块中的行直接记为一致（关键值来自校验文件），摘要不同的块读取后逐值比较，
+    结果与一次性读取一致。内存占用随摘要不同的块的行数增长（比较结果本身仍随关键值数量增长）。
+    两个文件的表头不同、或某列在两个文件中的整列类型不同时改为有序归并比较（memory_limit_mb 决定其每块行数）。
+    """
+    compare_options = compare_options or {}
+    key_columns = as_key_columns(key_column)
+    log = as_log(log)
+
+    trees, reused = [], []
+    try:
+        for path in (file1_path, file2_path):
+            check_cancelled(cancel)
+            tree, cached = load_checksums(path, key_column, delimiter, profiler, cancel, log)
+            trees.append(tree)
+            reused.append(cached)
+        tree1, tree2 = trees
+
+        reason = _incomparable_reason(tree1, tree2, common_columns)
+        if reason:
+            log.emit("warning", f"⚠️ {reason}，分块校验不可比，改用有序归并比较")
+            return merge_join_diff(
+                file1_path,
+                file2_path,
+                key_column,
+                common_columns,
+                delimiter=delimiter,
+                memory_limit_mb=memory_limit_mb,
+                compare_options=compare_options,
+                cancel=cancel,
+                log=log,
+            )
+
+        leaves1, leaves2 = len(tree1.levels[0]["digest"]), len(tree2.levels[0]["digest"])
+        with phase(profiler, "比较分块校验", leaves1 + leaves2):
+            pairs1, pairs2, unmatched1, unmatched2 = match_trees(tree1, tree2)
+        different_rows = int(
+            tree1.leaves["row_count"][unmatched1].sum()
+            + tree2.leaves["row_count"][unmatched2].sum()
+        )
+        sources = ["复用校验文件" if cached else "新计算" for cached in reused]
+        log.emit(
+            "checksum",
+            lambda: f"🧮 分块校验: 数据源1 {leaves1} 块（{sources[0]}），数据源2 {leaves2} 块"
+            f"（{sources[1]}），{len(unmatched1)} / {len(unmatched2)} 块不同，需读取 {different_rows} 行",
+            leaves1=leaves1,
+            leaves2=leaves2,
+            reused1=reused[0],
+            reused2=reused[1],
+            different_leaves1=len(unmatched1),
+            different_leaves2=len(unmatched2),
+            different_rows=different_rows,
+        )
+
+        # 摘要不同的块：读取后逐值比较
+        with phase(profiler, "读取差异块", different_rows):
+            rows1 = read_leaves(file1_path, tree1, unmatched1, common_columns, cancel)
+            rows2 = read_leaves(file2_path, tree2, unmatched2, common_columns, cancel)
+        check_cancelled(cancel)
+        diff = diff_frames(
+            rows1, rows2, key_column, common_columns, profiler=profiler, cancel=cancel,
+            **compare_options,
+        )
+        del rows1, rows2
+
+        # 摘要相同的块：两边内容相同，只需按关键值配对（含重复关键值的处理）
+        if len(pairs1):
+            keys1 = pd.concat(tree1.leaf_keys(pairs1))
+            offsets = tree2.leaves["row_start"][pairs2] - tree1.leaves["row_start"][pairs1]
+            keys2 = keys1.copy()
+            keys2.index = keys1.index + np.repeat(offsets, tree1.leaves["row_count"][pairs1])
+            same = diff_frames(
+                keys1,
+                keys2,
+                key_column,
+                key_columns,
+                duplicates=compare_options.get("duplicates", "first"),
+            )
+            same["compare_columns"] = diff["compare_columns"]
+            diff = merge_diffs([diff, same])
+        return diff
+    finally:
+        for tree in trees:
+            tree.close()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+命令行入口（无界面）
+
+供定时任务与 CI 调用，不依赖 PyQt6 和显示环境。模块本身只导入标准库，
+pandas 等依赖在执行具体命令时才导入，`--help` 与参数错误几乎没有启动开销
+（benchmark.py 会检查启动耗时是否在 STARTUP_BUDGET_SECONDS 以内）。
+
+    python file_diff_cli.py diff a.csv b.csv -k 订单号 --json
+    python file_diff_cli.py diff data.xlsx --sheet1 一月 --sheet2 二月 -k ID --report diff.xlsx
+    python file_diff_cli.py diff old.parquet new.parquet -k 订单号
+    python file_diff_cli.py diff orders.db --table1 orders --table2 "SELECT * FROM orders_v2" -k ID
+    python file_diff_cli.py batch --manifest pairs.csv -k 订单号 --summary summary.csv
+    python file_diff_cli.py batch --dirs 今天 昨天 --pattern "*.csv" -k ID
+    python file_diff_cli.py cache clear [文件路径]
+    python file_diff_cli.py cache info
+
+也可以通过 main.py 调用：带参数运行 main.py 时进入命令行模式，不带参数时启动界面。
+
+退出码:
+    0 没有差异（batch: 全部文件对比较成功且没有差异）
+    1 存在差异
+    2 出错（参数错误、文件无法读取等；batch: 任一文件对比较失败）
+    130 被 Ctrl+C 中断
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+EXIT_SAME = 0
+EXIT_DIFFERENT = 1
+EXIT_ERROR = 2
+EXIT_INTERRUPTED = 130
+
+# 命令行启动（解析参数、输出帮助）的耗时预算（秒）
+STARTUP_BUDGET_SECONDS = 0.3
+
+
+def _add_compare_options(parser: argparse.ArgumentParser):
+    """diff 与 batch 共用的比较参数（对应 two_file_diff 的同名参数）"""
+    group = parser.add_argument_group("比较参数")
+    group.add_argument(
+        "-k",
+        "--key",
+        action="append",
+        dest="key_column",
+        help="关键列名；组合关键列时重复指定（-k 订单号 -k 行号）",
+    )
+    group.add_argument(
+        "--file-type",
+        choices=["excel", "csv", "txt", "parquet", "feather", "sqlite"],
+        help="文件类型（默认按扩展名推断）",
+    )
+    group.add_argument("--delimiter", help="CSV/TXT 分隔符（默认逗号，\\t 表示制表符）")
+    group.add_argument(
+        "--columns",
+        action="append",
+        help="只比较这些列（逗号分隔或重复指定），默认所有共同列",
+    )
+    group.add_argument(
+        "--ignore-columns", action="append", help="不比较的列（逗号分隔或重复指定）"
+    )
+    group.add_argument("--streaming", action="store_true", help="流式分区比较（仅 CSV/TXT）")
+    group.add_argument(
+        "--key-first", action="store_true", help="两遍读取：先只读关键列（仅 CSV/TXT）"
+    )
+    group.add_argument(
+        "--sorted",
+        action="store_true",
+        dest="sorted_input",
+        help="两个文件已按关键列升序排列，按块同步归并比较（仅 CSV/TXT）",
+    )
+    group.add_argument(
+        "--checksums",
+        action="store_true",
+        dest="block_checksums",
+        help="分块校验比较，只读取摘要不同的块（已排序的 CSV/TXT，校验文件保存在数据文件旁）",
+    )
+    group.add_argument("--memory-limit-mb", type=int, help="流式比较的内存预算（MB）")
+    group.add_argument("--workers", type=int, help="并行比较的进程数")
+    group.add_argument("--cache", action="store_true", dest="use_cache", help="使用解析结果缓存")
+    group.add_argument(
+        "--load-mode", choices=["thread", "process", "serial"], help="两个数据源的读取方式"
+    )
+    group.add_argument(
+        "--duplicates",
+        choices=["first", "occurrence", "content"],
+        help="重复关键值的处理方式",
+    )
+    group.add_argument("--fingerprint", action="store_true", help="先比较行指纹")
+    group.add_argument(
+        "--verify-fingerprint", action="store_true", help="对指纹相同的行逐值复核"
+    )
+    group.add_argument(
+        "--report-format",
+        choices=["csv", "jsonl", "parquet", "xlsx"],
+        help="差异报告格式（默认按报告路径的扩展名推断）",
+    )
+
+
+def _compare_options(args) -> dict:
+    """命令行参数中用户实际指定的比较参数，未指定的使用 two_file_diff 的默认值"""
+    names = [
+        "file_type",
+        "delimiter",
+        "columns",
+        "ignore_columns",
+        "memory_limit_mb",
+        "workers",
+        "load_mode",
+        "duplicates",
+        "report_format",
+    ]
+    options = {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+    flags = (
+        "streaming",
+        "key_first",
+        "sorted_input",
+        "block_checksums",
+        "use_cache",
+        "fingerprint",
+        "verify_fingerprint",
+    )
+    for flag in flags:
+        if getattr(args, flag):
+            options[flag] = True
+    for name in ("columns", "ignore_columns"):
+        if name in options:
+            options[name] = _column_names(options[name])
+    if options.get("delimiter") == "\\t":
+        options["delimiter"] = "\t"
+    return options
+
+
+def _column_names(values) -> list:
+    """把重复指定、逗号（含中文逗号）分隔的列名展开为列表（与批量清单中的写法一致）"""
+    names = [name for value in values for name in value.replace("，", ",").split(",")]
+    return [name.strip() for name in names if name.strip()]
+
+
+def _key_column(args):
+    if not args.key_column:
+        return None
+    return args.key_column[0] if len(args.key_column) == 1 else args.key_column
+
+
+def _verbosity(args) -> int:
+    from file_diff_log import DETAIL, NORMAL, QUIET
+
+    if args.json or args.quiet:
+        return QUIET
+    return DETAIL if args.verbose else NORMAL
+
+
+def _print_json(data):
+    print(json.dumps(data, ensure_ascii=False, indent=2, default=str))
+
+
+def cmd_diff(args) -> int:
+    from file_diff import two_file_diff
+    from file_diff_batch import infer_file_type
+
+    options = _compare_options(args)
+    if args.file2 is None:
+        # 只给出一个文件时比较其中的两个 sheet
+        if not (args.sheet1 and args.sheet2):
+            raise ValueError("只指定一个文件时需要用 --sheet1 和 --sheet2 指定要比较的两个 sheet")
+        if infer_file_type(args.file1) == "sqlite":
+            # 同一数据库中的两个表；其他扩展名仍按 Excel 工作簿处理
+            options.setdefault("file_type", "sqlite")
+        options.update(compare_mode="sheet", file_path_for_sheet=args.file1)
+    else:
+        options.setdefault("file_type", infer_file_type(args.file1))
+    if args.report:
+        options.update(output_report=True, report_path=args.report)
+
+    profile = args.profile
+    if args.profile and not args.json:
+        from file_diff_profile import format_event
+
+        # 每个阶段结束时输出一行耗时与内存
+        def profile(record):
+            if record["event"] == "end":
+                print(format_event(record))
+
+    start = time.perf_counter()
+    result = two_file_diff(
+        args.file1,
+        args.file2,
+        key_column=_key_column(args),
+        sheet1=args.sheet1,
+        sheet2=args.sheet2,
+        snapshot=args.snapshot,
+        profile=profile,
+        verbosity=_verbosity(args),
+        **options,
+    )
+    seconds = time.perf_counter() - start
+
+    if args.json:
+        _print_json(
+            {
+                "status": "ok",
+                "has_differences": result.has_differences,
+                "counts": result.counts,
+                "description": result.meta.get("description"),
+                "compared_columns": result.meta.get("compared_columns"),
+                "skipped_columns": result.meta.get("skipped_columns"),
+                "report": result.meta.get("report_path"),
+                "seconds": round(seconds, 3),
+                "profile": result.meta.get("profile"),
+            }
+        )
+    return EXIT_DIFFERENT if result.has_differences else EXIT_SAME
+
+
+def cmd_batch(args) -> int:
+    from file_diff_batch import batch_diff, load_manifest, match_directories
+
+    if args.manifest:
+        pairs = load_manifest(args.manifest)
+    else:
+        pairs = match_directories(args.dirs[0], args.dirs[1], args.pattern)
+    options = _compare_options(args)
+    if args.report_dir:
+        _assign_reports(pairs, args.report_dir, options.get("report_format", "csv"))
+    summary = batch_diff(
+        pairs,
+        key_column=_key_column(args),
+        concurrency=args.concurrency,
+        summary_path=args.summary,
+        verbosity=_verbosity(args),
+        **options,
+    )
+    if args.json:
+        # 经 to_json 转换，各类别数量中的缺失值（失败的文件对）输出为 null
+        _print_json(json.loads(summary.to_json(orient="records", force_ascii=False)))
+    if (summary["status"] != "成功").any():
+        return EXIT_ERROR
+    return EXIT_DIFFERENT if summary["has_differences"].fillna(False).any() else EXIT_SAME
+
+
+def _assign_reports(pairs, report_dir: str, report_format: str):
+    """为没有单独指定报告路径的文件对在 report_dir 下生成报告路径"""
+    os.makedirs(report_dir, exist_ok=True)
+    for pair in pairs:
+        if pair.get("report_path") or not pair.get("file2"):
+            continue
+        name1 = os.path.splitext(os.path.basename(pair["file1"]))[0]
+        name2 = os.path.splitext(os.path.basename(pair["file2"]))[0]
+        pair["report_path"] = os.path.join(
+            report_dir, f"{name1}_vs_{name2}_diff_report.{report_format}"
+        )
+
+
+def cmd_cache(args) -> int:
+    from file_diff_cache import CACHE_DIR, cache_size, clear_cache
+
+    if args.action == "clear":
+        removed = clear_cache(args.file)
+        if args.json:
+            _print_json({"removed": removed})
+        else:
+            print(f"🧹 已删除 {removed} 个缓存条目")
+    else:
+        count, size = cache_size()
+        if args.json:
+            _print_json({"cache_dir": CACHE_DIR, "entries": count, "bytes": size})
+        else:
+            print(f"📦 缓存目录: {CACHE_DIR}，{count} 个条目，共 {size / 1024 / 1024:.1f} MB")
+    return EXIT_SAME
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="file_diff",
+        description="基于关键列比较两个 Excel/CSV/TXT/Parquet/Feather/SQLite 数据源（无界面）",
+        epilog="退出码: 0 没有差异，1 存在差异，2 出错",
+    )
+    output = argparse.ArgumentParser(add_help=False)
+    group = output.add_argument_group("输出")
+    group.add_argument("--json", action="store_true", help="以 JSON 输出结果（不输出过程信息）")
+    group.add_argument("-q", "--quiet", action="store_true", help="不输出过程信息")
+    group.add_argument("-v", "--verbose", action="store_true", help="输出完整的关键值列表与差异明细")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="命令")
+
+    diff = subparsers.add_parser("diff", parents=[output], help="比较两个文件或同一文件的两个 sheet")
+    diff.add_argument("file1", help="数据源1（只给出一个文件时比较其中的两个 sheet 或表）")
+    diff.add_argument("file2", nargs="?", help="数据源2")
+    diff.add_argument(
+        "--sheet1", "--table1", help="数据源1的 sheet 名；SQLite 为表名或 SELECT 查询"
+    )
+    diff.add_argument(
+        "--sheet2", "--table2", help="数据源2的 sheet 名；SQLite 为表名或 SELECT 查询"
+    )
+    diff.add_argument("--report", help="生成差异报告并保存到该路径")
+    diff.add_argument("--snapshot", help="快照文件路径（增量比较）")
+    diff.add_argument("--profile", action="store_true", help="记录并输出各阶段耗时与内存")
+    _add_compare_options(diff)
+    diff.set_defaults(func=cmd_diff)
+
+    batch = subparsers.add_parser("batch", parents=[output], help="批量比较多个文件对")
+    source = batch.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="清单文件（CSV）")
+    source.add_argument("--dirs", nargs=2, metavar=("DIR1", "DIR2"), help="按文件名匹配两个目录")
+    batch.add_argument("--pattern", default="*", help="--dirs 模式下的文件名通配符")
+    batch.add_argument("--concurrency", type=int, help="同时比较的文件对数量")
+    batch.add_argument("--summary", help="汇总表 CSV 保存路径")
+    batch.add_argument("--report-dir", help="为每个文件对生成差异报告的目录")
+    _add_compare_options(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    cache = subparsers.add_parser("cache", parents=[output], help="管理解析结果缓存")
+    cache.add_argument("action", choices=["clear", "info"])
+    cache.add_argument("file", nargs="?", help="clear 时只清除该文件的缓存条目")
+    cache.set_defaults(func=cmd_cache)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        print("⛔ 已中断", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        if getattr(args, "json", False):
+            _print_json({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        print(f"❌ {type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
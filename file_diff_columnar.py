@@ -0,0 +1,204 @@
+"""
+列式与数据库数据源：Parquet、Feather（Arrow IPC）文件与 SQLite 表
+
+这些格式自带列类型，读取时不需要逐个单元格解析文本：
+- Parquet / Feather 通过 pyarrow 只读取需要比较的列（Feather 以内存映射方式读取），
+  列类型原样保留；含空值的整数列读取为可空整数（Int64 等），不会转为 float64 而丢失大整数的精度
+- SQLite 的数据源可以是表名，也可以是一条 SELECT / WITH 查询；需要比较的列在查询中投影，
+  数据库以只读方式打开。含空值的整数列同样读取为 Int64
+
+pyarrow（>=4.0）是可选依赖，只在读取 Parquet / Feather 时导入。
+"""
+
+import os
+import sqlite3
+from typing import List, Tuple
+
+import pandas as pd
+
+# 列式格式的文件类型
+ARROW_FILE_TYPES = ("parquet", "feather")
+COLUMNAR_FILE_TYPES = ARROW_FILE_TYPES + ("sqlite",)
+
+_DISPLAY = {"parquet": "Parquet文件", "feather": "Feather文件"}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("读取 Parquet / Feather 需要安装 pyarrow: pip install \"pyarrow>=4.0\"") from e
+    return pa, feather, pq
+
+
+def _arrow_schema(file_path: str, file_type: str):
+    pa, feather, pq = _import_pyarrow()
+    if file_type == "parquet":
+        return pq.read_schema(file_path)
+    try:
+        with pa.memory_map(file_path) as source:
+            return pa.ipc.open_file(source).schema
+    except pa.ArrowInvalid:
+        # Feather V1 没有 IPC 文件头，读取（内存映射）整个表取得表结构
+        return feather.read_table(file_path, memory_map=True).schema
+
+
+def _arrow_header(schema) -> List[str]:
+    """表结构中的列名，不含 pandas 写出的索引列"""
+    index_columns = set()
+    if schema.pandas_metadata:
+        names = schema.pandas_metadata.get("index_columns", [])
+        # RangeIndex 只记录在元数据中（字典），不占用列
+        index_columns = {name for name in names if isinstance(name, str)}
+    return [name for name in schema.names if name not in index_columns]
+
+
+def _arrow_frame(table) -> pd.DataFrame:
+    """把 Arrow 表转为 DataFrame；含空值的整数列转为可空整数，索引为行号"""
+    pa = _import_pyarrow()[0]
+    nullable = {
+        pa.int8(): pd.Int8Dtype(),
+        pa.int16(): pd.Int16Dtype(),
+        pa.int32(): pd.Int32Dtype(),
+        pa.int64(): pd.Int64Dtype(),
+        pa.uint8(): pd.UInt8Dtype(),
+        pa.uint16(): pd.UInt16Dtype(),
+        pa.uint32(): pd.UInt32Dtype(),
+        pa.uint64(): pd.UInt64Dtype(),
+    }
+    converted = table.to_pandas()
+    values = [
+        column.to_pandas(types_mapper=nullable.get)
+        if column.type in nullable and column.null_count
+        else converted.iloc[:, i]
+        for i, column in enumerate(table.columns)
+    ]
+    # 按位置组装（列名可能重复），与 _read_sqlite 相同
+    data = pd.DataFrame(dict(enumerate(series.reset_index(drop=True) for series in values)))
+    data.columns = table.column_names
+    data.index = pd.RangeIndex(len(data))
+    return data
+
+
+# ---- SQLite ----
+
+
+def quote_identifier(name: str) -> str:
+    """SQLite 标识符加引号（内部的双引号写两次）"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def is_query(source: str) -> bool:
+    """数据源是否为一条查询语句（否则视为表名）"""
+    words = str(source).strip().split(None, 1)
+    return bool(words) and words[0].lower() in ("select", "with")
+
+
+def _connect(file_path: str) -> sqlite3.Connection:
+    """以只读方式打开数据库；文件不存在时报错而不是新建空数据库"""
+    from urllib.request import pathname2url
+
+    uri = "file:" + pathname2url(os.path.abspath(file_path)) + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+def _table_names(connection: sqlite3.Connection) -> List[str]:
+    rows = connection.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+        "AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def list_tables(file_path: str) -> List[str]:
+    """返回数据库中的表与视图名（按创建顺序）"""
+    connection = _connect(file_path)
+    try:
+        return _table_names(connection)
+    finally:
+        connection.close()
+
+
+def _sqlite_source(connection: sqlite3.Connection, source: str) -> Tuple[str, str]:
+    """数据源对应的查询语句与类型描述；source 为 None 时使用第一个表"""
+    if source is None:
+        tables = _table_names(connection)
+        if not tables:
+            raise ValueError("数据库中没有表")
+        source = tables[0]
+    if is_query(source):
+        return str(source).strip().rstrip(";"), "SQLite查询"
+    return f"SELECT * FROM {quote_identifier(source)}", f"SQLite表 {source}"
+
+
+def _sqlite_column(values) -> pd.Series:
+    """
+    一列查询结果转为 Series：类型由值推断（与 read_csv 一致），
+    只含整数和空值的列转为 Int64，而不是 float64
+    """
+    if not values:
+        return pd.Series([], dtype=object)
+    series = pd.Series(values)
+    if series.dtype.kind == "f" and series.hasnans:
+        if all(isinstance(value, int) for value in values if value is not None):
+            return pd.Series(pd.array(values, dtype="Int64"))
+    return series
+
+
+def _read_sqlite(
+    file_path: str, source: str, usecols: List[str] = None, header_only: bool = False
+):
+    connection = _connect(file_path)
+    try:
+        sql, display = _sqlite_source(connection, source)
+        if header_only:
+            cursor = connection.execute(f"SELECT * FROM ({sql}) LIMIT 0")
+            return [column[0] for column in cursor.description], display
+        if usecols is not None:
+            projection = ", ".join(quote_identifier(name) for name in usecols)
+            sql = f"SELECT {projection} FROM ({sql})"
+        cursor = connection.execute(sql)
+        names = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        connection.close()
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    data = pd.DataFrame(dict(enumerate(_sqlite_column(list(v)) for v in values)))
+    data.columns = names
+    data.index = pd.RangeIndex(len(rows))
+    return data, display
+
+
+# ---- 统一入口 ----
+
+
+def read_columnar_header(file_path: str, file_type: str, source: str = None) -> List[str]:
+    """只读取表头（Parquet / Feather 读取表结构，SQLite 执行 LIMIT 0 查询）"""
+    if file_type == "sqlite":
+        return _read_sqlite(file_path, source, header_only=True)[0]
+    return _arrow_header(_arrow_schema(file_path, file_type))
+
+
+def read_columnar(
+    file_path: str, file_type: str, source: str = None, usecols: List[str] = None
+) -> Tuple[pd.DataFrame, str]:
+    """
+    读取一个列式数据源，返回 (数据, 类型描述)
+
+    参数:
+        file_type: "parquet"、"feather" 或 "sqlite"
+        source: SQLite 的表名或查询语句（None 表示第一个表）；Parquet / Feather 忽略
+        usecols: 只读取的列（None 表示全部列）
+    """
+    if file_type == "sqlite":
+        return _read_sqlite(file_path, source, usecols)
+    pa, feather, pq = _import_pyarrow()
+    if usecols is None:
+        usecols = _arrow_header(_arrow_schema(file_path, file_type))
+    if file_type == "parquet":
+        table = pq.read_table(file_path, columns=list(usecols))
+    else:
+        table = feather.read_table(file_path, columns=list(usecols), memory_map=True)
+    return _arrow_frame(table), _DISPLAY[file_type]
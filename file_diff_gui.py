@@ -1,6 +1,5 @@
 import sys
 import os
-import pandas as pd
 from PyQt6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -25,37 +24,84 @@ from PyQt6.QtWidgets import (
     QSpinBox,
     QRadioButton,
     QButtonGroup,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QHeaderView,
     QAbstractItemView,
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt6.QtGui import QFont, QIcon, QPalette, QColor, QPixmap
+from PyQt6.QtGui import QFont, QIcon, QPalette, QPixmap
 from typing import Dict, List, Union
 from datetime import datetime
 
 # 导入我们的差异比较函数
-from file_diff import two_file_diff
+from file_diff import FILE_TYPES, TEXT_FILE_TYPES, list_sheets, two_file_diff
+from file_diff_cache import clear_cache
+from file_diff_cancel import CancelToken, DiffCancelled
+from file_diff_log import QUIET
+from file_diff_model import DiffResultModel, ResultSearchIndex
+from file_diff_profile import format_event, memory_text
+
+# 停止输入多久后开始筛选（毫秒）
+FILTER_DEBOUNCE_MS = 250
 
 
 class DiffWorkerThread(QThread):
     """差异比较工作线程"""
 
-    finished = pyqtSignal(dict)
+    finished = pyqtSignal(object)
     error = pyqtSignal(str)
     progress = pyqtSignal(str)
+    cancelled = pyqtSignal()
 
     def __init__(self, params):
         super().__init__()
         self.params = params
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """请求取消比较，比较在下一个检查点停止"""
+        self.cancel_token.cancel()
 
     def run(self):
         try:
             self.progress.emit("开始比较文件...")
-            result = two_file_diff(**self.params)
+            # 各阶段开始和结束时通过 progress 信号把进度转发到界面
+            result = two_file_diff(
+                **self.params,
+                profile=lambda record: self.progress.emit(format_event(record)),
+                cancel=self.cancel_token,
+                # 结果显示在表格中，不再向控制台输出过程信息
+                verbosity=QUIET,
+            )
             self.progress.emit("比较完成！")
             self.finished.emit(result)
+        except DiffCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+class FilterWorkerThread(QThread):
+    """结果筛选工作线程：在索引上查找，结果带上请求序号，过期的结果由界面丢弃"""
+
+    filtered = pyqtSignal(int, object)
+    error = pyqtSignal(str)
+
+    def __init__(self, generation, index, text="", column=None, key=""):
+        super().__init__()
+        self.generation = generation
+        self.index = index
+        self.query = (text, column, key)
+        self.cancel_token = CancelToken()
+
+    def run(self):
+        try:
+            # 索引只建立一次（建立过程不可取消，后续请求等待它完成后直接使用）
+            self.index.build()
+            items = self.index.search(*self.query, cancel=self.cancel_token)
+            self.filtered.emit(self.generation, items)
+        except DiffCancelled:
+            pass
         except Exception as e:
             self.error.emit(str(e))
 
@@ -148,6 +194,7 @@ class ExcelDiffGUI(QMainWindow):
         """
         )
 
+        self.worker_thread = None
         self.init_ui()
 
     def init_ui(self):
@@ -199,7 +246,7 @@ class ExcelDiffGUI(QMainWindow):
         file_type_group.setLayout(file_type_layout)
 
         self.file_type_combo = QComboBox()
-        self.file_type_combo.addItems(["excel", "csv", "txt"])
+        self.file_type_combo.addItems(list(FILE_TYPES))
         self.file_type_combo.currentIndexChanged.connect(self.on_file_type_changed)
 
         file_type_layout.addWidget(QLabel("文件类型:"))
@@ -276,7 +323,9 @@ class ExcelDiffGUI(QMainWindow):
 
         options_layout.addWidget(QLabel("关键列:"), 0, 0)
         self.key_column_edit = QLineEdit()
-        self.key_column_edit.setPlaceholderText("输入用于匹配行的关键列名...")
+        self.key_column_edit.setPlaceholderText(
+            "输入用于匹配行的关键列名，多个关键列用逗号分隔..."
+        )
         options_layout.addWidget(self.key_column_edit, 0, 1)
 
         # 分隔符标签和输入框 - 保存为实例变量以便后续控制
@@ -296,6 +345,52 @@ class ExcelDiffGUI(QMainWindow):
         self.report_browse_btn.clicked.connect(self.browse_report_path)
         options_layout.addWidget(self.report_browse_btn, 3, 2)
 
+        # 并行进程数：大于1时按关键列分片在多个进程中比较
+        options_layout.addWidget(QLabel("并行进程数:"), 4, 0)
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(1)
+        options_layout.addWidget(self.workers_spin, 4, 1)
+
+        self.fingerprint_check = QCheckBox("行指纹快速比较（适合大部分行一致的数据）")
+        options_layout.addWidget(self.fingerprint_check, 5, 0, 1, 2)
+
+        # 列筛选：未参与比较的列在读取时即被跳过
+        options_layout.addWidget(QLabel("仅比较列:"), 6, 0)
+        self.include_columns_edit = QLineEdit()
+        self.include_columns_edit.setPlaceholderText("留空比较所有共同列，多个列名用逗号分隔...")
+        options_layout.addWidget(self.include_columns_edit, 6, 1)
+
+        options_layout.addWidget(QLabel("忽略列:"), 7, 0)
+        self.ignore_columns_edit = QLineEdit()
+        self.ignore_columns_edit.setPlaceholderText("不参与比较的列，多个列名用逗号分隔...")
+        options_layout.addWidget(self.ignore_columns_edit, 7, 1)
+
+        # 解析结果缓存：同一文件反复比较时不再重新解析
+        self.use_cache_check = QCheckBox("缓存解析结果（同一文件反复比较时加快读取）")
+        # 缓存解析全部列，首次比较宽表时比只读取比较列慢，默认不启用
+        self.use_cache_check.setChecked(False)
+        options_layout.addWidget(self.use_cache_check, 8, 0, 1, 2)
+        self.clear_cache_btn = QPushButton("清空缓存")
+        self.clear_cache_btn.clicked.connect(self.clear_parse_cache)
+        options_layout.addWidget(self.clear_cache_btn, 8, 2)
+
+        # 两个数据源的读取方式
+        options_layout.addWidget(QLabel("读取方式:"), 9, 0)
+        self.load_mode_combo = QComboBox()
+        self.load_mode_combo.addItem("并发读取（线程）", "thread")
+        self.load_mode_combo.addItem("并发读取（进程，适合大型Excel）", "process")
+        self.load_mode_combo.addItem("依次读取", "serial")
+        options_layout.addWidget(self.load_mode_combo, 9, 1)
+
+        # 重复关键值的处理方式
+        options_layout.addWidget(QLabel("重复关键值:"), 10, 0)
+        self.duplicates_combo = QComboBox()
+        self.duplicates_combo.addItem("只保留第一个", "first")
+        self.duplicates_combo.addItem("按出现顺序逐行配对", "occurrence")
+        self.duplicates_combo.addItem("先配对内容相同的行", "content")
+        options_layout.addWidget(self.duplicates_combo, 10, 1)
+
         scroll_layout.addWidget(options_group)
 
         # 操作按钮
@@ -327,14 +422,32 @@ class ExcelDiffGUI(QMainWindow):
         filter_control_layout = QVBoxLayout()
         filter_control_group.setLayout(filter_control_layout)
 
-        # 筛选输入框
+        # 筛选输入框：停止输入 FILTER_DEBOUNCE_MS 毫秒后在后台线程中筛选
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        # 信号的参数（文本、下标）不能传给 start：start(int) 会把它当作新的间隔
+
         filter_layout = QHBoxLayout()
         filter_layout.addWidget(QLabel("差异筛选:"))
         self.filter_edit = QLineEdit()
         self.filter_edit.setPlaceholderText("输入关键字筛选差异项...")
-        self.filter_edit.textChanged.connect(self.apply_filter)
+        self.filter_edit.textChanged.connect(lambda *_: self.filter_timer.start())
         filter_layout.addWidget(self.filter_edit)
 
+        filter_layout.addWidget(QLabel("列:"))
+        self.filter_column_combo = QComboBox()
+        self.filter_column_combo.addItem("所有列", None)
+        self.filter_column_combo.currentIndexChanged.connect(lambda *_: self.filter_timer.start())
+        filter_layout.addWidget(self.filter_column_combo)
+
+        filter_layout.addWidget(QLabel("关键值:"))
+        self.filter_key_edit = QLineEdit()
+        self.filter_key_edit.setPlaceholderText("关键值包含...")
+        self.filter_key_edit.textChanged.connect(lambda *_: self.filter_timer.start())
+        filter_layout.addWidget(self.filter_key_edit)
+
         self.filter_btn = QPushButton("应用筛选")
         self.filter_btn.clicked.connect(self.apply_filter)
         filter_layout.addWidget(self.filter_btn)
@@ -349,47 +462,44 @@ class ExcelDiffGUI(QMainWindow):
         checkbox_layout = QHBoxLayout()
         self.show_stats_check = QCheckBox("显示统计信息")
         self.show_stats_check.setChecked(True)
-        self.show_stats_check.stateChanged.connect(self.apply_filter)
+        self.show_stats_check.stateChanged.connect(self.apply_visibility)
         checkbox_layout.addWidget(self.show_stats_check)
 
         self.show_not_in_file1_check = QCheckBox("显示仅在数据源2中存在")
         self.show_not_in_file1_check.setChecked(True)
-        self.show_not_in_file1_check.stateChanged.connect(self.apply_filter)
+        self.show_not_in_file1_check.stateChanged.connect(self.apply_visibility)
         checkbox_layout.addWidget(self.show_not_in_file1_check)
 
         self.show_not_in_file2_check = QCheckBox("显示仅在数据源1中存在")
         self.show_not_in_file2_check.setChecked(True)
-        self.show_not_in_file2_check.stateChanged.connect(self.apply_filter)
+        self.show_not_in_file2_check.stateChanged.connect(self.apply_visibility)
         checkbox_layout.addWidget(self.show_not_in_file2_check)
 
         filter_control_layout.addLayout(checkbox_layout)
         results_layout.addWidget(filter_control_group)
 
-        # 创建滚动区域来包含结果表格，以支持水平滚动
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-        scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-
-        # 结果表格
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(1)
-        self.results_table.setHorizontalHeaderLabels(["差异详情信息"])
-        # 设置列宽策略，允许水平滚动
+        # 结果表格：模型直接读取结果数组，只为可见的行生成文本
+        self.results_model = DiffResultModel(self)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        # 列宽按内容估算（只采样部分行），最后一列填满剩余宽度，超出时水平滚动
         header = self.results_table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
         header.setStretchLastSection(True)
+        header.setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        # 行高固定，避免逐行计算行高
+        self.results_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         self.results_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.results_table.setAlternatingRowColors(True)
-
-        # 将表格设置为滚动区域的子控件
-        scroll_area.setWidget(self.results_table)
-
-        # 将滚动区域添加到布局中
-        results_layout.addWidget(scroll_area)
+        self.results_table.setSortingEnabled(True)
+        results_layout.addWidget(self.results_table)
 
         # 存储原始结果数据
         self.original_results = None
+        self.search_index = None
+        # 筛选请求序号：只采用最新一次请求的结果
+        self.filter_generation = 0
+        self.filter_threads = []
 
         self.tab_widget.addTab(results_tab, "比较结果")
 
@@ -401,6 +511,12 @@ class ExcelDiffGUI(QMainWindow):
         self.progress_bar.setVisible(False)
         status_layout.addWidget(self.progress_bar)
 
+        # 取消按钮只在比较进行中显示
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.clicked.connect(self.cancel_comparison)
+        self.cancel_btn.setVisible(False)
+        status_layout.addWidget(self.cancel_btn)
+
         self.status_label = QLabel("就绪")
         status_layout.addWidget(self.status_label)
 
@@ -429,32 +545,42 @@ class ExcelDiffGUI(QMainWindow):
         """文件类型改变时的处理"""
         file_type = self.file_type_combo.currentText()
 
-        if file_type == "excel":
-            self.delimiter_edit.setEnabled(False)
-            self.delimiter_edit.hide()
-            # 隐藏分隔符标签
-            self.delimiter_label.hide()
-            # 显示比较模式选择（仅Excel文件支持Sheet比较模式）
+        # 只有CSV/TXT文件需要分隔符
+        is_text = file_type in TEXT_FILE_TYPES
+        self.delimiter_edit.setEnabled(is_text)
+        self.delimiter_edit.setVisible(is_text)
+        self.delimiter_label.setVisible(is_text)
+
+        # SQLite 的“Sheet”是表名，也可以直接输入查询语句
+        self.sheet1_combo.setEditable(file_type == "sqlite")
+        self.sheet2_combo.setEditable(file_type == "sqlite")
+
+        if file_type in ("excel", "sqlite"):
+            # 显示比较模式选择（Excel文件与SQLite数据库支持Sheet比较模式）
             self.mode_group.show()
         else:
-            self.delimiter_edit.setEnabled(True)
-            self.delimiter_edit.show()
-            # 显示分隔符标签
-            self.delimiter_label.show()
-            # 隐藏比较模式选择（非Excel文件只支持文件比较模式）
+            # 隐藏比较模式选择（其他文件只支持文件比较模式）
             self.mode_group.hide()
             # 强制切换到文件比较模式
             self.file_mode_radio.setChecked(True)
 
+    @staticmethod
+    def file_filter(file_type: str) -> str:
+        """文件对话框的过滤条件"""
+        filters = {
+            "excel": "Excel文件 (*.xlsx *.xls)",
+            "csv": "CSV文件 (*.csv)",
+            "txt": "文本文件 (*.txt)",
+            "parquet": "Parquet文件 (*.parquet *.pq)",
+            "feather": "Feather文件 (*.feather *.arrow *.ipc)",
+            "sqlite": "SQLite数据库 (*.db *.sqlite *.sqlite3)",
+        }
+        return f"{filters[file_type]};;所有文件 (*.*)"
+
     def browse_file1(self):
         """浏览第一个文件"""
         file_type = self.file_type_combo.currentText()
-        if file_type == "excel":
-            filter_str = "Excel文件 (*.xlsx *.xls);;所有文件 (*.*)"
-        elif file_type == "csv":
-            filter_str = "CSV文件 (*.csv);;所有文件 (*.*)"
-        else:
-            filter_str = "文本文件 (*.txt);;所有文件 (*.*)"
+        filter_str = self.file_filter(file_type)
 
         file_path, _ = QFileDialog.getOpenFileName(
             self, "选择第一个文件", "", filter_str
@@ -462,21 +588,15 @@ class ExcelDiffGUI(QMainWindow):
         if file_path:
             self.file1_path_edit.setText(file_path)
 
-            # 如果是Excel文件，尝试加载Sheet列表
-            if file_type == "excel":
+            # 如果是Excel文件或SQLite数据库，尝试加载Sheet（表）列表
+            if file_type in ("excel", "sqlite"):
                 self.load_excel_sheets(file_path)
 
     def browse_file2(self):
         """浏览第二个文件"""
         is_file_mode = self.file_mode_radio.isChecked()
         file_type = self.file_type_combo.currentText()
-
-        if file_type == "excel":
-            filter_str = "Excel文件 (*.xlsx *.xls);;所有文件 (*.*)"
-        elif file_type == "csv":
-            filter_str = "CSV文件 (*.csv);;所有文件 (*.*)"
-        else:
-            filter_str = "文本文件 (*.txt);;所有文件 (*.*)"
+        filter_str = self.file_filter(file_type)
 
         file_path, _ = QFileDialog.getOpenFileName(
             self, "选择第二个文件", "", filter_str
@@ -484,23 +604,26 @@ class ExcelDiffGUI(QMainWindow):
         if file_path:
             self.file2_path_edit.setText(file_path)
 
-            # 如果是Excel文件且是文件比较模式，尝试加载Sheet列表
-            if file_type == "excel" and is_file_mode:
+            # 如果是Excel文件或SQLite数据库且是文件比较模式，尝试加载Sheet（表）列表
+            if file_type in ("excel", "sqlite") and is_file_mode:
                 self.load_excel_sheets(file_path)
 
     def browse_report_path(self):
-        """浏览报告保存路径"""
+        """浏览报告保存路径（报告格式按扩展名确定）"""
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "选择报告保存路径", "", "CSV文件 (*.csv);;所有文件 (*.*)"
+            self,
+            "选择报告保存路径",
+            "",
+            "CSV文件 (*.csv);;Excel文件 (*.xlsx);;JSON Lines文件 (*.jsonl);;"
+            "Parquet文件 (*.parquet);;所有文件 (*.*)",
         )
         if file_path:
             self.report_path_edit.setText(file_path)
 
     def load_excel_sheets(self, file_path):
-        """加载Excel文件的Sheet列表"""
+        """加载Excel文件的Sheet列表（工作簿句柄保留，比较时直接复用）或SQLite数据库的表名"""
         try:
-            excel_file = pd.ExcelFile(file_path)
-            sheet_names = excel_file.sheet_names
+            sheet_names = list_sheets(file_path, self.file_type_combo.currentText())
 
             self.sheet1_combo.clear()
             self.sheet1_combo.addItems(sheet_names)
@@ -514,6 +637,21 @@ class ExcelDiffGUI(QMainWindow):
         except Exception as e:
             QMessageBox.warning(self, "错误", f"无法加载Excel文件: {str(e)}")
 
+    def clear_parse_cache(self):
+        """清空解析结果缓存"""
+        removed = clear_cache()
+        QMessageBox.information(self, "清空缓存", f"已删除 {removed} 个缓存条目")
+
+    @staticmethod
+    def parse_column_list(text):
+        """解析逗号（中英文均可）分隔的列名列表"""
+        return [name.strip() for name in text.replace("，", ",").split(",") if name.strip()]
+
+    def parse_key_columns(self):
+        """解析关键列输入：逗号分隔的多个列名作为组合关键列"""
+        names = self.parse_column_list(self.key_column_edit.text())
+        return names[0] if len(names) == 1 else names
+
     def start_comparison(self):
         """开始比较"""
         # 验证输入
@@ -536,7 +674,7 @@ class ExcelDiffGUI(QMainWindow):
         params = {
             "file1_path": self.file1_path_edit.text(),
             "file2_path": self.file2_path_edit.text() if is_file_mode else None,
-            "key_column": self.key_column_edit.text(),
+            "key_column": self.parse_key_columns(),
             "output_report": self.output_report_check.isChecked(),
             "report_path": (
                 self.report_path_edit.text() if self.report_path_edit.text() else None
@@ -547,6 +685,13 @@ class ExcelDiffGUI(QMainWindow):
             ),
             "file_type": file_type,
             "delimiter": self.delimiter_edit.text(),
+            "workers": self.workers_spin.value(),
+            "fingerprint": self.fingerprint_check.isChecked(),
+            "columns": self.parse_column_list(self.include_columns_edit.text()) or None,
+            "ignore_columns": self.parse_column_list(self.ignore_columns_edit.text()),
+            "use_cache": self.use_cache_check.isChecked(),
+            "load_mode": self.load_mode_combo.currentData(),
+            "duplicates": self.duplicates_combo.currentData(),
         }
 
         if not is_file_mode:
@@ -555,6 +700,8 @@ class ExcelDiffGUI(QMainWindow):
 
         # 禁用比较按钮
         self.compare_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setVisible(True)
         self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 0)  # 不确定进度
         self.status_label.setText("正在比较...")
@@ -563,19 +710,30 @@ class ExcelDiffGUI(QMainWindow):
         self.tab_widget.setCurrentIndex(1)
 
         # 清空结果表格
-        self.results_table.setRowCount(0)
+        self.original_results = None
+        self.search_index = None
+        self.results_model.set_result(None)
 
         # 启动工作线程
         self.worker_thread = DiffWorkerThread(params)
         self.worker_thread.finished.connect(self.on_comparison_finished)
         self.worker_thread.error.connect(self.on_comparison_error)
         self.worker_thread.progress.connect(self.on_progress_update)
+        self.worker_thread.cancelled.connect(self.on_comparison_cancelled)
         self.worker_thread.start()
 
+    def cancel_comparison(self):
+        """取消正在进行的比较"""
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            self.worker_thread.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("正在取消...")
+
     def on_comparison_finished(self, results):
         """比较完成处理"""
         # 恢复UI状态
         self.compare_btn.setEnabled(True)
+        self.cancel_btn.setVisible(False)
         self.progress_bar.setVisible(False)
         self.status_label.setText("比较完成")
 
@@ -586,141 +744,130 @@ class ExcelDiffGUI(QMainWindow):
         """比较错误处理"""
         # 恢复UI状态
         self.compare_btn.setEnabled(True)
+        self.cancel_btn.setVisible(False)
         self.progress_bar.setVisible(False)
         self.status_label.setText("比较出错")
 
         # 显示错误消息
         QMessageBox.critical(self, "错误", f"比较过程中出错: {error_msg}")
 
+    def on_comparison_cancelled(self):
+        """比较被取消处理"""
+        self.compare_btn.setEnabled(True)
+        self.cancel_btn.setVisible(False)
+        self.progress_bar.setVisible(False)
+        self.status_label.setText("比较已取消")
+
     def on_progress_update(self, message):
         """进度更新处理"""
+        # 取消请求之后仍可能收到进度消息，保留“正在取消”的提示
+        if self.worker_thread is not None and self.worker_thread.cancel_token.cancelled:
+            return
         self.status_label.setText(message)
 
     def display_results(self, results):
         """显示比较结果"""
         # 保存原始结果数据
         self.original_results = results
-
-        # 应用筛选和显示控制
+        self.results_model.set_result(results, self.build_stats_lines(results))
+        self.results_table.resizeColumnsToContents()
+
+        self.filter_column_combo.blockSignals(True)
+        self.filter_column_combo.clear()
+        self.filter_column_combo.addItem("所有列", None)
+        for column in results.columns:
+            self.filter_column_combo.addItem(str(column), column)
+        self.filter_column_combo.blockSignals(False)
+
+        # 筛选索引在后台线程中预先建立，第一次筛选时无需等待
+        self.search_index = ResultSearchIndex(results)
         self.apply_filter()
 
+    @staticmethod
+    def build_stats_lines(results) -> List[str]:
+        """统计信息段的各行文本"""
+        counts = results.counts
+        meta = results.meta
+        lines = [
+            f"完全一致的行数: {counts['identical']}",
+            f"有差异的行数: {counts['mismatch']}",
+            f"仅在数据源1中存在的行数: {counts['not_in_file2']}",
+            f"仅在数据源2中存在的行数: {counts['not_in_file1']}",
+            f"数据源1中多出的重复行数: {counts['extra_in_file1']}",
+            f"数据源2中多出的重复行数: {counts['extra_in_file2']}",
+            f"比较列: {', '.join(map(str, meta.get('compared_columns', [])))}",
+            f"跳过列: {', '.join(map(str, meta.get('skipped_columns', []))) or '无'}",
+        ]
+        if meta.get("load_seconds"):
+            seconds1, seconds2 = meta["load_seconds"]
+            lines.append(f"读取耗时: 数据源1 {seconds1:.2f} 秒, 数据源2 {seconds2:.2f} 秒")
+        for record in meta.get("profile") or []:
+            text = f"阶段耗时 - {record['phase']}: {record['seconds']:.3f} 秒"
+            if record["rows"] is not None:
+                text += f", {record['rows']} 行"
+            text += memory_text(record, ", ")
+            lines.append(text)
+        return lines
+
+    def apply_visibility(self):
+        """显示控制：只切换模型中各段的可见性，不重新筛选"""
+        self.results_model.set_filter(
+            stats=self.show_stats_check.isChecked(),
+            not_in_file1=self.show_not_in_file1_check.isChecked(),
+            not_in_file2=self.show_not_in_file2_check.isChecked(),
+        )
+
     def apply_filter(self):
-        """应用筛选和显示控制"""
-        if not self.original_results:
+        """在后台线程中筛选；尚未完成的上一次筛选被取消，其结果不再采用"""
+        self.filter_timer.stop()
+        if self.original_results is None:
             return
 
-        # 清空表格
-        self.results_table.setRowCount(0)
-
-        # 获取筛选文本和显示控制状态
-        filter_text = self.filter_edit.text().lower()
-        show_stats = self.show_stats_check.isChecked()
-        show_not_in_file1 = self.show_not_in_file1_check.isChecked()
-        show_not_in_file2 = self.show_not_in_file2_check.isChecked()
-
-        # 添加结果数据
-        row = 0
-
-        # 添加统计信息 - 根据复选框状态决定是否显示
-        if show_stats:
-            self.results_table.insertRow(row)
-            stats_item = QTableWidgetItem("统计信息:")
-            stats_item.setBackground(QColor(200, 220, 255))  # 浅蓝色背景
-            self.results_table.setItem(row, 0, stats_item)
-            row += 1
-
-            self.results_table.insertRow(row)
-            self.results_table.setItem(
-                row,
-                0,
-                QTableWidgetItem(
-                    f"完全一致的行数: {len(self.original_results['identical'])}"
-                ),
-            )
-            row += 1
-
-            self.results_table.insertRow(row)
-            self.results_table.setItem(
-                row,
-                0,
-                QTableWidgetItem(
-                    f"有差异的行数: {len(self.original_results['mismatch'])}"
-                ),
-            )
-            row += 1
-
-            self.results_table.insertRow(row)
-            self.results_table.setItem(
-                row,
-                0,
-                QTableWidgetItem(
-                    f"仅在数据源1中存在的行数: {len(self.original_results['not_in_file1'])}"
-                ),
-            )
-            row += 1
-
-            self.results_table.insertRow(row)
-            self.results_table.setItem(
-                row,
-                0,
-                QTableWidgetItem(
-                    f"仅在数据源2中存在的行数: {len(self.original_results['not_in_file2'])}"
-                ),
-            )
-            row += 1
-
-        # 添加"仅在数据源2中存在"的数据 - 根据复选框状态决定是否显示
-        if show_not_in_file1 and self.original_results["not_in_file1"]:
-            self.results_table.insertRow(row)
-            not_in_file1_item = QTableWidgetItem("仅在数据源2中存在:")
-            not_in_file1_item.setBackground(QColor(255, 220, 200))  # 浅橙色背景
-            self.results_table.setItem(row, 0, not_in_file1_item)
-            row += 1
-
-            for item in self.original_results["not_in_file1"]:
-                self.results_table.insertRow(row)
-                self.results_table.setItem(row, 0, QTableWidgetItem(f"{item}"))
-                row += 1
-
-        # 添加"仅在数据源1中存在"的数据 - 根据复选框状态决定是否显示
-        if show_not_in_file2 and self.original_results["not_in_file2"]:
-            self.results_table.insertRow(row)
-            not_in_file2_item = QTableWidgetItem("仅在数据源1中存在:")
-            not_in_file2_item.setBackground(QColor(255, 220, 200))  # 浅橙色背景
-            self.results_table.setItem(row, 0, not_in_file2_item)
-            row += 1
-
-            for item in self.original_results["not_in_file2"]:
-                self.results_table.insertRow(row)
-                self.results_table.setItem(row, 0, QTableWidgetItem(f"{item}"))
-                row += 1
-
-        # 添加差异数据 - 显示在顶部以提高可读性
-        if self.original_results["mismatch"]:
-            # 应用筛选
-            filtered_mismatch = []
-            if filter_text:
-                for item in self.original_results["mismatch"]:
-                    if filter_text in item.lower():
-                        filtered_mismatch.append(item)
-            else:
-                filtered_mismatch = self.original_results["mismatch"]
-
-            if filtered_mismatch:
-                self.results_table.insertRow(row)
-                mismatch_item = QTableWidgetItem("差异详情:")
-                mismatch_item.setBackground(QColor(255, 200, 200))  # 浅红色背景
-                self.results_table.setItem(row, 0, mismatch_item)
-                row += 1
-
-                for item in filtered_mismatch:
-                    self.results_table.insertRow(row)
-                    self.results_table.setItem(row, 0, QTableWidgetItem(item))
-                    row += 1
+        for thread in self.filter_threads:
+            thread.cancel_token.cancel()
+        self.filter_generation += 1
+        thread = FilterWorkerThread(
+            self.filter_generation,
+            self.search_index,
+            self.filter_edit.text(),
+            self.filter_column_combo.currentData(),
+            self.filter_key_edit.text(),
+        )
+        thread.filtered.connect(self.on_filter_finished)
+        thread.error.connect(self.on_filter_error)
+        # 线程结束前保留引用，避免 QThread 对象在运行中被回收
+        self.filter_threads.append(thread)
+        thread.finished.connect(lambda: self._release_filter_thread(thread))
+        thread.start()
+
+    def _release_filter_thread(self, thread):
+        if thread in self.filter_threads:
+            thread.wait()
+            self.filter_threads.remove(thread)
+
+    def on_filter_finished(self, generation, items):
+        """筛选完成：只采用最新一次请求的结果"""
+        if generation != self.filter_generation or self.original_results is None:
+            return
+        self.results_model.set_filter(
+            items,
+            stats=self.show_stats_check.isChecked(),
+            not_in_file1=self.show_not_in_file1_check.isChecked(),
+            not_in_file2=self.show_not_in_file2_check.isChecked(),
+        )
+
+    def on_filter_error(self, error_msg):
+        self.status_label.setText(f"筛选出错: {error_msg}")
 
     def clear_filter(self):
         """清除筛选"""
+        for widget in (self.filter_edit, self.filter_key_edit, self.filter_column_combo):
+            widget.blockSignals(True)
         self.filter_edit.clear()
+        self.filter_key_edit.clear()
+        self.filter_column_combo.setCurrentIndex(0)
+        for widget in (self.filter_edit, self.filter_key_edit, self.filter_column_combo):
+            widget.blockSignals(False)
         self.apply_filter()
 
 
@@ -0,0 +1,75 @@
+"""
+分级事件输出
+
+比较过程中的提示信息不再直接 print，而是作为事件交给 DiffLog：
+- verbosity=QUIET (0): 不输出任何内容，也不格式化任何文本（批量比较、无界面调用）
+- verbosity=NORMAL (1): 过程信息与截断的摘要，关键值列表与差异明细只显示前 SUMMARY_LIMIT 条（默认）
+- verbosity=DETAIL (2): 完整的关键值列表与每一处差异（旧版行为）
+
+默认打印到控制台；传入 handler 时每个事件以字典形式交给它，不再打印:
+    kind: 事件类型（如 "start"、"loaded"、"warning"、"not_in_file1"、"mismatch"、"report"）
+    level: 事件级别（NORMAL 或 DETAIL）
+    message: 格式化后的文本
+    以及事件附带的结构化字段（如关键值事件的 count、keys）
+"""
+
+from itertools import islice
+from typing import Callable, Dict, Iterable, Union
+
+QUIET = 0
+NORMAL = 1
+DETAIL = 2
+
+# NORMAL 级别下关键值列表与差异明细最多显示的条数
+SUMMARY_LIMIT = 20
+
+
+class DiffLog:
+    """按 verbosity 过滤并分发事件；message 可以是返回文本的函数，只在需要输出时才调用"""
+
+    def __init__(self, verbosity: int = NORMAL, handler: Callable[[Dict], None] = None):
+        self.verbosity = verbosity
+        self.handler = handler
+
+    def enabled(self, level: int = NORMAL) -> bool:
+        return self.verbosity >= level
+
+    def emit(
+        self, kind: str, message: Union[str, Callable[[], str]], level: int = NORMAL, **fields
+    ):
+        if self.verbosity < level:
+            return
+        if callable(message):
+            message = message()
+        if self.handler is None:
+            print(message)
+        else:
+            self.handler(dict(fields, kind=kind, level=level, message=message))
+
+    def keys(self, kind: str, label: str, keys):
+        """输出一组关键值；NORMAL 级别只列出前 SUMMARY_LIMIT 个"""
+        if not self.enabled():
+            return
+        count = len(keys)
+        if self.enabled(DETAIL) or count <= SUMMARY_LIMIT:
+            text = f"{label}: {list(keys)}"
+        else:
+            text = (
+                f"{label}: {list(keys[:SUMMARY_LIMIT])} ...（共 {count} 个，verbosity=2 显示全部）"
+            )
+        self.emit(kind, text, count=count, keys=keys)
+
+    def lines(self, kind: str, lines: Iterable[str], total: int, prefix: str = ""):
+        """逐行输出明细（如每一处差异）；NORMAL 级别只输出前 SUMMARY_LIMIT 行并提示剩余数量"""
+        if not self.enabled():
+            return
+        limit = None if self.enabled(DETAIL) else SUMMARY_LIMIT
+        for line in islice(lines, limit):
+            self.emit(kind, prefix + line)
+        if limit is not None and total > limit:
+            self.emit(kind, f"  ... 另有 {total - limit} 处差异未显示（verbosity=2 显示全部）")
+
+
+def as_log(log: DiffLog = None) -> DiffLog:
+    """未指定时使用默认的 NORMAL 级别控制台输出"""
+    return log if log is not None else DiffLog()
@@ -0,0 +1,333 @@
+"""
+比较结果的表格模型（GUI 结果选项卡使用）
+
+DiffResultModel 直接建立在 DiffResult 的列式数组之上：统计信息、仅在数据源1/2 中存在、
+多出的重复行、差异详情各为一段，每段由一个标题行和若干数据行组成。
+模型只保存各段的行下标数组，视图滚动到哪里才为哪些行生成文本，
+因此显示上百万条差异也不需要预先创建任何单元格对象。
+
+列: 类别 | 关键值 | 差异单元格数 | 差异详情
+点击表头按列排序时各段分别排序，段的先后顺序与标题行位置不变。
+
+ResultSearchIndex 为筛选建立一次小写文本索引（关键值、每个差异单元格），
+之后每次筛选只在索引上做子串查找，可在后台线程中执行并随时取消。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtGui import QColor, QFont
+
+from file_diff_cancel import CancelToken, check_cancelled
+from file_diff_result import DiffResult
+
+COLUMNS = ["类别", "关键值", "差异单元格数", "差异详情"]
+KEY_COLUMN = 1
+COUNT_COLUMN = 2
+DETAIL_COLUMN = 3
+
+# 各段标题行的背景色
+SECTION_COLORS = {
+    "stats": QColor(200, 220, 255),  # 浅蓝色
+    "not_in_file1": QColor(255, 220, 200),  # 浅橙色
+    "not_in_file2": QColor(255, 220, 200),
+    "extra_in_file1": QColor(255, 235, 180),  # 浅黄色
+    "extra_in_file2": QColor(255, 235, 180),
+    "mismatch": QColor(255, 200, 200),  # 浅红色
+}
+
+# 已生成的差异详情文本最多缓存的行数
+_TEXT_CACHE_SIZE = 20000
+# 查找时每处理这么多个字符串检查一次取消状态
+_SEARCH_BLOCK = 200000
+
+# 只包含关键值的段（筛选关键值时与差异详情一起筛选）
+KEY_SECTIONS = ("not_in_file1", "not_in_file2", "extra_in_file1", "extra_in_file2")
+
+
+class _TextIndex:
+    """一组字符串的小写副本（pandas 字符串数组，安装 pyarrow 时查找在 C++ 中完成）"""
+
+    def __init__(self, texts: Iterable[str]):
+        self.texts = pd.Series(list(texts), dtype="string").str.lower()
+
+    def search(self, needle: str, cancel: CancelToken = None) -> np.ndarray:
+        """包含 needle（不区分大小写）的字符串的布尔掩码，分块查找，块之间检查取消状态"""
+        # 查找文本与索引用同一种方式转小写
+        needle = pd.Series([needle], dtype="string").str.lower().iloc[0]
+        mask = np.zeros(len(self.texts), dtype=bool)
+        for start in range(0, len(self.texts), _SEARCH_BLOCK):
+            check_cancelled(cancel)
+            block = self.texts.iloc[start : start + _SEARCH_BLOCK]
+            mask[start : start + len(block)] = block.str.contains(
+                needle, regex=False
+            ).to_numpy(dtype=bool, na_value=False)
+        return mask
+
+
+class ResultSearchIndex:
+    """
+    DiffResult 的筛选索引，第一次查找时建立（可预先调用 build），线程安全
+
+    - 文本筛选: 差异行的关键值或任一差异单元格（"列名: '值1' vs '值2'"）包含该文本
+    - 列筛选: 只看指定列的差异单元格（差异行必须在该列有差异）
+    - 关键值筛选: 关键值文本包含该文本，同时作用于仅在一边存在和多出的重复行
+    """
+
+    def __init__(self, result: DiffResult):
+        self.result = result
+        self._lock = threading.Lock()
+        self._keys: Dict[str, _TextIndex] = None
+        self._cells: _TextIndex = None
+
+    def build(self):
+        with self._lock:
+            if self._keys is not None:
+                return
+            result = self.result
+            columns = [str(col) for col in result.columns]
+            self._cells = _TextIndex(
+                f"{columns[c]}: '{v1}' vs '{v2}'"
+                for c, v1, v2 in zip(
+                    result.cell_col_ids.tolist(), result.old_values, result.new_values
+                )
+            )
+            sections = {
+                "not_in_file1": result.not_in_file1_keys,
+                "not_in_file2": result.not_in_file2_keys,
+                "extra_in_file1": result.extra_in_file1_keys,
+                "extra_in_file2": result.extra_in_file2_keys,
+                "mismatch": result.mismatch_keys,
+            }
+            self._keys = {
+                name: _TextIndex(f"{key}" for key in keys) for name, keys in sections.items()
+            }
+
+    def search(
+        self, text: str = "", column: str = None, key: str = "", cancel: CancelToken = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        返回各段满足条件的条目下标 {段名: 下标数组}，供 DiffResultModel.set_filter 使用；
+        不在字典中的段不筛选，三个条件都为空时返回空字典
+        """
+        if not text and column is None and not key:
+            return {}
+        self.build()
+        result = self.result
+        items = {}
+
+        if key:
+            for name in KEY_SECTIONS:
+                items[name] = np.flatnonzero(self._keys[name].search(key, cancel))
+
+        rows = None
+        cells = None
+        if column is not None:
+            col_ids = [i for i, name in enumerate(result.columns) if str(name) == str(column)]
+            cells = np.isin(result.cell_col_ids, col_ids)
+        if text:
+            matched = self._cells.search(text, cancel)
+            cells = matched if cells is None else cells & matched
+        if cells is not None:
+            rows = np.zeros(result.mismatch_count, dtype=bool)
+            rows[result.cell_rows[cells]] = True
+            if text and column is None:
+                # 不限定列时关键值中包含该文本的差异行也保留
+                rows |= self._keys["mismatch"].search(text, cancel)
+        if key:
+            key_rows = self._keys["mismatch"].search(key, cancel)
+            rows = key_rows if rows is None else rows & key_rows
+        if rows is not None:
+            items["mismatch"] = np.flatnonzero(rows)
+        check_cancelled(cancel)
+        return items
+
+
+class _Section:
+    """模型中的一段：标题 + 按 order 排列的条目（条目为该类别中的下标）"""
+
+    def __init__(self, name: str, title: str, items: np.ndarray):
+        self.name = name
+        self.title = title
+        self.items = items
+        self.order = items
+
+    def __len__(self) -> int:
+        # 标题行 + 数据行
+        return 1 + len(self.order)
+
+
+class DiffResultModel(QAbstractTableModel):
+    """以 DiffResult 为数据源的只读表格模型"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.result: DiffResult = None
+        self.stats: List[str] = []
+        self.sections: List[_Section] = []
+        self.visible = {
+            "stats": True,
+            "not_in_file1": True,
+            "not_in_file2": True,
+            "extra_in_file1": True,
+            "extra_in_file2": True,
+            "mismatch": True,
+        }
+        self.filter_items: Dict[str, np.ndarray] = {}
+        self.sort_column = -1
+        self.sort_order = Qt.SortOrder.AscendingOrder
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._text_cache: "OrderedDict[int, str]" = OrderedDict()
+        self._cell_counts = None
+        self._first_columns = None
+
+    # ---- 数据源 ----
+
+    def set_result(self, result: DiffResult, stats: List[str] = None):
+        """设置新的比较结果（None 表示清空）"""
+        self.result = result
+        self.stats = list(stats or [])
+        self.filter_items = {}
+        self._text_cache.clear()
+        if result is not None:
+            self._cell_counts = result.row_cell_counts()
+            self._first_columns = result.row_first_column()
+        else:
+            self._cell_counts = self._first_columns = None
+        self._rebuild()
+
+    def set_filter(self, items: Dict[str, np.ndarray] = None, **visible):
+        """
+        各段只显示 items 中的条目（{段名: 条目下标}，见 ResultSearchIndex.search；
+        未列出的段显示全部），并按关键字参数显示或隐藏各段，如 set_filter(items, stats=False)
+        """
+        if items is not None:
+            self.filter_items = items
+        self.visible.update(visible)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.beginResetModel()
+        self.sections = []
+        result = self.result
+        if result is not None:
+            candidates = [
+                ("stats", "统计信息:", len(self.stats)),
+                ("not_in_file1", "仅在数据源2中存在:", len(result.not_in_file1_keys)),
+                ("not_in_file2", "仅在数据源1中存在:", len(result.not_in_file2_keys)),
+                ("extra_in_file1", "数据源1中多出的重复行:", len(result.extra_in_file1_keys)),
+                ("extra_in_file2", "数据源2中多出的重复行:", len(result.extra_in_file2_keys)),
+                ("mismatch", "差异详情:", result.mismatch_count),
+            ]
+            for name, title, count in candidates:
+                items = self.filter_items.get(name)
+                items = np.arange(count) if items is None else np.asarray(items)
+                if self.visible.get(name, True) and len(items):
+                    self.sections.append(_Section(name, title, items))
+            for section in self.sections:
+                section.order = self._sorted(section)
+        self._offsets = np.cumsum([0] + [len(section) for section in self.sections])
+        self.endResetModel()
+
+    # ---- 排序 ----
+
+    def _keys(self, name: str) -> pd.Index:
+        return {
+            "not_in_file1": self.result.not_in_file1_keys,
+            "not_in_file2": self.result.not_in_file2_keys,
+            "extra_in_file1": self.result.extra_in_file1_keys,
+            "extra_in_file2": self.result.extra_in_file2_keys,
+            "mismatch": self.result.mismatch_keys,
+        }[name]
+
+    def _sorted(self, section: _Section) -> np.ndarray:
+        items = section.items
+        if self.sort_column <= 0 or section.name == "stats":
+            order = np.arange(len(items))
+        elif self.sort_column == KEY_COLUMN:
+            keys = self._keys(section.name).take(items)
+            try:
+                order = keys.argsort(kind="stable")
+            except TypeError:
+                # 关键值类型混杂无法直接比较时按文本排序
+                order = np.argsort(keys.map(str).to_numpy(dtype=object), kind="stable")
+        elif section.name != "mismatch":
+            order = np.arange(len(items))
+        elif self.sort_column == COUNT_COLUMN:
+            order = np.argsort(self._cell_counts[items], kind="stable")
+        else:
+            # 差异详情按第一个差异列排序
+            order = np.argsort(self._first_columns[items], kind="stable")
+        if self.sort_order == Qt.SortOrder.DescendingOrder:
+            order = order[::-1]
+        return items[order]
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self._rebuild()
+
+    # ---- QAbstractTableModel ----
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else int(self._offsets[-1])
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section: int, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def locate(self, row: int):
+        """返回 (段, 段内条目下标)；标题行的条目下标为 None"""
+        section_id = int(np.searchsorted(self._offsets, row, side="right")) - 1
+        section = self.sections[section_id]
+        position = row - int(self._offsets[section_id])
+        if position == 0:
+            return section, None
+        return section, int(section.order[position - 1])
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        section, item = self.locate(index.row())
+        column = index.column()
+        if item is None:
+            if role == Qt.ItemDataRole.DisplayRole and column == 0:
+                return section.title
+            if role == Qt.ItemDataRole.BackgroundRole:
+                return SECTION_COLORS[section.name]
+            if role == Qt.ItemDataRole.FontRole:
+                font = QFont()
+                font.setBold(True)
+                return font
+            return None
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        if section.name == "stats":
+            return self.stats[item] if column == DETAIL_COLUMN else None
+        if column == 0:
+            return section.title.rstrip(":")
+        if column == KEY_COLUMN:
+            return f"{self._keys(section.name)[item]}"
+        if section.name != "mismatch":
+            return None
+        if column == COUNT_COLUMN:
+            return int(self._cell_counts[item])
+        return self._cells_text(item)
+
+    def _cells_text(self, row: int) -> str:
+        text = self._text_cache.get(row)
+        if text is None:
+            text = self.result.format_cells(row)
+            self._text_cache[row] = text
+            if len(self._text_cache) > _TEXT_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+        return text
+
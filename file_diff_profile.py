@@ -0,0 +1,146 @@
+"""
+分阶段性能记录
+
+DiffProfiler 记录比较过程中每个阶段（读取、关键值编码、去重、对齐、逐值比较、生成文本、写报告等）
+的耗时、处理行数与内存占用。two_file_diff(profile=...) 会创建一个 DiffProfiler，
+结果保存在 result.meta["profile"] 中；传入回调函数时每个阶段开始和结束时都会调用它，
+GUI 用它在状态栏显示实时进度。
+
+每条记录是一个字典:
+    phase: 阶段名称
+    event: "start" 或 "end"（回调中可见，meta["profile"] 只保存 "end" 记录）
+    seconds: 阶段耗时（秒）
+    rows: 阶段处理的行数（无意义时为 None）
+    rss_mb: 阶段结束时进程占用的内存（MB，需要安装 psutil，否则为 None）
+    rss_delta_mb: 阶段内进程占用内存的变化（MB，需要安装 psutil；由 add 直接添加的记录为 None）
+    process_peak_mb: 阶段结束时进程自启动以来的内存峰值（MB，无法获取时为 None）。
+        这是累计的峰值而不是该阶段的峰值：之前的阶段达到的峰值会一直出现在之后的记录中，
+        只有超过之前的峰值时才会增长
+"""
+
+import contextlib
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+
+def _memory_mb():
+    """返回 (当前内存, 进程启动以来的内存峰值)，单位 MB，无法获取的项为 None"""
+    rss = peak = None
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        rss = info.rss / 1024 / 1024
+        if hasattr(info, "peak_wset"):
+            peak = info.peak_wset / 1024 / 1024
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 为单位，macOS 以字节为单位
+        peak = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    return rss, peak
+
+
+class DiffProfiler:
+    """收集各阶段的耗时、行数与内存，可在子线程中使用"""
+
+    def __init__(self, callback: Callable[[Dict], None] = None):
+        self.callback = callback
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str, rows: int = None):
+        """
+        记录一个阶段；可在阶段内部补充处理的行数：
+
+            with profiler.phase("逐值比较") as record:
+                ...
+                record["rows"] = len(df)
+        """
+        record = {"phase": name, "event": "start", "seconds": 0.0, "rows": rows}
+        if self.callback is not None:
+            self.callback(dict(record))
+        start_rss = _memory_mb()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self.add(**record, start_rss_mb=start_rss)
+
+    def add(
+        self, phase: str, seconds: float, rows: int = None, start_rss_mb: float = None, **_
+    ):
+        """
+        直接添加一条已完成的记录（如在线程池或子进程中单独计时的阶段）；
+        start_rss_mb 为阶段开始时的内存，用于计算 rss_delta_mb
+        """
+        rss, peak = _memory_mb()
+        record = {
+            "phase": phase,
+            "event": "end",
+            "seconds": seconds,
+            "rows": rows,
+            "rss_mb": rss,
+            "rss_delta_mb": None if rss is None or start_rss_mb is None else rss - start_rss_mb,
+            "process_peak_mb": peak,
+        }
+        with self._lock:
+            self.records.append(record)
+        if self.callback is not None:
+            self.callback(dict(record))
+
+    def to_frame(self) -> pd.DataFrame:
+        """各阶段记录的表格"""
+        columns = ["phase", "seconds", "rows", "rss_mb", "rss_delta_mb", "process_peak_mb"]
+        return pd.DataFrame(self.records, columns=["event"] + columns)[columns]
+
+    def summary(self) -> str:
+        """可打印的各阶段耗时摘要"""
+        lines = []
+        for record in self.records:
+            line = f"  {record['phase']}: {record['seconds']:.3f} 秒"
+            if record["rows"] is not None:
+                line += f", {record['rows']} 行"
+            line += memory_text(record, ", ")
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def phase(profiler: DiffProfiler, name: str, rows: int = None):
+    """profiler 为 None 时不做任何记录，便于在比较函数中无条件使用"""
+    if profiler is None:
+        return contextlib.nullcontext({})
+    return profiler.phase(name, rows)
+
+
+def memory_text(record: Dict, separator: str) -> str:
+    """记录中的内存信息：阶段内的内存变化与进程累计的内存峰值（无法获取的项省略）"""
+    text = ""
+    if record.get("rss_delta_mb") is not None:
+        text += f"{separator}内存变化 {record['rss_delta_mb']:+.0f} MB"
+    if record.get("process_peak_mb") is not None:
+        text += f"{separator}进程内存峰值 {record['process_peak_mb']:.0f} MB"
+    return text
+
+
+def format_event(record: Dict) -> str:
+    """把回调收到的记录格式化为一行进度文本（GUI 状态栏使用）"""
+    if record["event"] == "start":
+        return f"⏳ {record['phase']}..."
+    text = f"✅ {record['phase']} 完成，耗时 {record['seconds']:.2f} 秒"
+    if record["rows"] is not None:
+        text += f"，{record['rows']} 行"
+    return text + memory_text(record, "，")
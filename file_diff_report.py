@@ -0,0 +1,310 @@
+"""
+流式差异报告
+
+报告按块直接由 DiffResult 的列式数组生成并立即写出，不再先拼出整份差异文本和 DataFrame，
+写报告的耗时与内存只取决于块大小（REPORT_CHUNK_ROWS），与结果是否已在界面中展示无关。
+
+每个差异单元格一行，仅存在于一边或多出的重复行每个关键值一行：
+    差异类型 | <关键列...> | 列 | 数据源1的值 | 数据源2的值
+组合关键列时每个关键列各占一列。
+
+支持的格式（默认按扩展名推断）:
+- csv: UTF-8 BOM，文件开头是以 "#" 开头的注释行（比较对象、统计信息等）
+- jsonl: 每行一个 JSON 对象
+- parquet: 需要 pyarrow，按块写入行组；值列统一保存为字符串，注释行保存在文件元数据中
+- xlsx: openpyxl 只写模式，内存占用恒定；注释行写入“摘要”工作表，超出单表行数上限时自动续表
+"""
+
+import os
+import re
+from datetime import datetime
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from file_diff_cancel import CancelToken, check_cancelled
+
+REPORT_FORMATS = ("csv", "jsonl", "parquet", "xlsx")
+# 每块生成与写出的报告行数
+REPORT_CHUNK_ROWS = 100_000
+
+TYPE_COLUMN = "差异类型"
+COLUMN_COLUMN = "列"
+VALUE1_COLUMN = "数据源1的值"
+VALUE2_COLUMN = "数据源2的值"
+
+# 各类别的差异类型文本（与旧版报告一致），按此顺序写出
+KEY_BLOCKS = [
+    ("not_in_file1_keys", "仅在文件2中"),
+    ("not_in_file2_keys", "仅在文件1中"),
+    ("extra_in_file1_keys", "文件1中多出的重复行"),
+    ("extra_in_file2_keys", "文件2中多出的重复行"),
+]
+MISMATCH_LABEL = "不匹配"
+
+# Excel 单个工作表的行数上限（含标题行）
+_XLSX_MAX_ROWS = 1_048_576
+# Excel 单元格中不允许出现的控制字符（与 openpyxl 的 ILLEGAL_CHARACTERS_RE 相同）
+_ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+# Parquet 元数据中保存注释行的键
+_PARQUET_META_KEY = b"file_diff.header"
+
+
+def resolve_report_format(path: str, report_format: str = None) -> str:
+    """确定报告格式：显式指定优先，否则按扩展名推断，无法识别时为 csv"""
+    if report_format is None:
+        ext = os.path.splitext(path)[1].lower().lstrip(".")
+        report_format = {"xls": "xlsx", "json": "jsonl", "pq": "parquet"}.get(ext, ext)
+        if report_format not in REPORT_FORMATS:
+            report_format = "csv"
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"report_format 必须是 {REPORT_FORMATS} 之一")
+    return report_format
+
+
+def _key_names(result) -> List[str]:
+    if isinstance(result.key_column, str):
+        return [result.key_column]
+    return list(result.key_column)
+
+
+def report_columns(result) -> List[str]:
+    """报告的列名；关键列与固定列重名时在关键列名后加“(关键列)”"""
+    fixed = {TYPE_COLUMN, COLUMN_COLUMN, VALUE1_COLUMN, VALUE2_COLUMN}
+    keys = [f"{name}(关键列)" if name in fixed else str(name) for name in _key_names(result)]
+    return [TYPE_COLUMN, *keys, COLUMN_COLUMN, VALUE1_COLUMN, VALUE2_COLUMN]
+
+
+def _key_arrays(keys: pd.Index, width: int) -> List[np.ndarray]:
+    """把关键值拆成每个关键列一个数组"""
+    if isinstance(keys, pd.MultiIndex):
+        return [keys.get_level_values(i).to_numpy(dtype=object) for i in range(width)]
+    if width == 1:
+        return [keys.to_numpy(dtype=object)]
+    tuples = keys.to_numpy(dtype=object)
+    return [np.array([key[i] for key in tuples], dtype=object) for i in range(width)]
+
+
+def iter_report_chunks(
+    result, chunk_rows: int = REPORT_CHUNK_ROWS, cancel: CancelToken = None
+) -> Iterator[pd.DataFrame]:
+    """按块生成报告行，每块最多 chunk_rows 行；每块之间检查取消状态"""
+    names = report_columns(result)
+    key_names = names[1:-3]
+    width = len(key_names)
+
+    def frame(label, keys, column, value1, value2):
+        data = {TYPE_COLUMN: np.full(len(keys), label, dtype=object)}
+        data.update(zip(key_names, _key_arrays(keys, width)))
+        data[COLUMN_COLUMN] = column
+        data[VALUE1_COLUMN] = value1
+        data[VALUE2_COLUMN] = value2
+        return pd.DataFrame(data, columns=names)
+
+    for attr, label in KEY_BLOCKS:
+        keys = getattr(result, attr)
+        for start in range(0, len(keys), chunk_rows):
+            check_cancelled(cancel)
+            block = keys[start : start + chunk_rows]
+            empty = np.full(len(block), None, dtype=object)
+            yield frame(label, block, empty, empty, empty)
+
+    column_names = np.asarray(result.columns, dtype=object)
+    for start in range(0, len(result.cell_rows), chunk_rows):
+        check_cancelled(cancel)
+        end = start + chunk_rows
+        yield frame(
+            MISMATCH_LABEL,
+            result.mismatch_keys.take(result.cell_rows[start:end]),
+            column_names[result.cell_col_ids[start:end]],
+            result.old_values[start:end],
+            result.new_values[start:end],
+        )
+
+
+# ---- 各格式的写入 ----
+
+
+def _write_csv(path, result, chunks, header_lines):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        for line in header_lines:
+            f.write(line + "\n")
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=header, lineterminator="\n")
+            header = False
+        if header:
+            # 没有任何差异时只写列名
+            f.write(",".join(report_columns(result)) + "\n")
+
+
+def _write_jsonl(path, result, chunks, header_lines):
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            text = chunk.to_json(
+                orient="records",
+                lines=True,
+                force_ascii=False,
+                date_format="iso",
+                default_handler=str,
+            )
+            f.write(text if text.endswith("\n") else text + "\n")
+
+
+def _key_dtypes(result, width: int) -> list:
+    """
+    各关键列在所有写出的关键值中的类型；各类别之间类型不同的关键列为 None
+
+    只考虑非空的类别（不匹配的关键值只在存在差异单元格时写出）。
+    """
+    blocks = [getattr(result, attr) for attr, _ in KEY_BLOCKS]
+    if len(result.cell_rows):
+        blocks.append(result.mismatch_keys)
+    blocks = [keys for keys in blocks if len(keys)] or [result.mismatch_keys]
+    dtypes = None
+    for keys in blocks:
+        if isinstance(keys, pd.MultiIndex):
+            block_dtypes = list(keys.dtypes)
+        elif width == 1:
+            block_dtypes = [keys.dtype]
+        else:
+            # 组合关键值保存为元组
+            block_dtypes = [np.dtype(object)] * width
+        if dtypes is None:
+            dtypes = block_dtypes
+        else:
+            dtypes = [a if a == b else None for a, b in zip(dtypes, block_dtypes)]
+    return dtypes
+
+
+def _write_parquet(path, result, chunks, header_lines):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("写入 Parquet 报告需要安装 pyarrow: pip install \"pyarrow>=4.0\"") from e
+
+    names = report_columns(result)
+    key_names = names[1:-3]
+    # 关键列在所有写出的关键值中类型一致且为数值时保留类型（各类别的关键值来自不同的数据源，
+    # 类型可能不同，如数据源1为整数、数据源2为浮点数）；其余列统一保存为字符串
+    types = {name: pa.string() for name in names}
+    for name, dtype in zip(key_names, _key_dtypes(result, len(key_names))):
+        if isinstance(dtype, np.dtype) and dtype.kind in "iufb":
+            types[name] = pa.from_numpy_dtype(dtype)
+    schema = pa.schema(
+        [(name, types[name]) for name in names],
+        metadata={_PARQUET_META_KEY: "\n".join(header_lines).encode("utf-8")},
+    )
+
+    def column(values, name):
+        if pa.types.is_string(types[name]):
+            values = pd.Series(values, dtype=object).map(str, na_action="ignore")
+        else:
+            # object 数组转换时 Arrow 不检查截断，先还原为数值数组
+            values = pd.Series(values, dtype=object).infer_objects()
+        return pa.array(values, type=types[name], from_pandas=True, safe=True)
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [column(chunk[name].to_numpy(), name) for name in names], schema=schema
+                )
+            )
+
+
+def _excel_value(value):
+    """转换为 openpyxl 可以写入的值"""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, str):
+        return _ILLEGAL_CHARACTERS_RE.sub("", value)
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, datetime):
+        if pd.isna(value):
+            return None
+        return value if value.tzinfo is None else str(value)
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    return _ILLEGAL_CHARACTERS_RE.sub("", str(value))
+
+
+def _write_xlsx(path, result, chunks, header_lines):
+    from openpyxl import Workbook
+
+    names = report_columns(result)
+    workbook = Workbook(write_only=True)
+    summary = workbook.create_sheet("摘要")
+    for line in header_lines:
+        if line:
+            summary.append([_excel_value(line.lstrip("# "))])
+
+    sheet_count = 0
+    sheet = None
+    sheet_rows = _XLSX_MAX_ROWS
+    for chunk in chunks:
+        for row in zip(*(chunk[name].to_numpy() for name in names)):
+            if sheet_rows >= _XLSX_MAX_ROWS:
+                sheet_count += 1
+                sheet = workbook.create_sheet("差异" if sheet_count == 1 else f"差异{sheet_count}")
+                sheet.append(names)
+                sheet_rows = 1
+            sheet.append([_excel_value(value) for value in row])
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("差异").append(names)
+    workbook.save(path)
+
+
+_WRITERS = {
+    "csv": _write_csv,
+    "jsonl": _write_jsonl,
+    "parquet": _write_parquet,
+    "xlsx": _write_xlsx,
+}
+
+
+def write_report(
+    result,
+    path: str,
+    report_format: str = None,
+    header_lines: List[str] = None,
+    chunk_rows: int = REPORT_CHUNK_ROWS,
+    cancel: CancelToken = None,
+) -> int:
+    """
+    把比较结果流式写成差异报告，返回写出的报告行数（不含注释与列名）
+
+    参数:
+        result: DiffResult
+        path: 报告保存路径
+        report_format: "csv"、"jsonl"、"parquet" 或 "xlsx"，None 表示按扩展名推断（默认 csv）
+        header_lines: 报告开头的注释行（CSV 原样写入，XLSX 写入“摘要”工作表，
+            Parquet 保存在文件元数据中，JSON Lines 不写入）
+        chunk_rows: 每块生成与写出的行数
+        cancel: 取消标记；被取消时删除写了一半的报告并抛出 DiffCancelled
+    """
+    writer = _WRITERS[resolve_report_format(path, report_format)]
+    written = [0]
+
+    def counted():
+        for chunk in iter_report_chunks(result, chunk_rows, cancel):
+            written[0] += len(chunk)
+            yield chunk
+
+    # 先写临时文件再替换，取消或出错时不会留下不完整的报告
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        writer(tmp_path, result, counted(), header_lines or [])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written[0]
@@ -0,0 +1,282 @@
+"""
+差异比较结果
+
+DiffResult 以列式数组保存比较结果（关键值、列编号、两边的值），
+只有在需要展示时才生成文本，同时兼容旧版本返回的字典格式：
+result["mismatch"]、result.get("identical", []) 等写法保持可用。
+"""
+
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+import pandas as pd
+
+
+class DiffResult(Mapping):
+    """
+    两个数据源的比较结果
+
+    属性:
+        key_column: 关键列名，组合关键列为列名列表（此时各关键值为元组）
+        columns: 参与逐值比较的列，cell_col_ids 中的编号即为该列表的下标
+        identical_keys: 完全一致的关键值（数据源1顺序）
+        mismatch_keys: 存在差异的关键值（数据源1顺序，每个关键值一项）
+        not_in_file1_keys: 仅在数据源2中存在的关键值
+        not_in_file2_keys: 仅在数据源1中存在的关键值
+        extra_in_file1_keys / extra_in_file2_keys: 关键值两边都存在，但数据源1/2 中
+            重复次数更多、没有配对的行的关键值
+        cell_rows: 每个差异单元格对应 mismatch_keys 中的下标
+        cell_col_ids: 每个差异单元格所在列的编号
+        old_values / new_values: 每个差异单元格在数据源1/2中的值
+        meta: 附加信息（比较列、跳过列、数据源描述等）
+    """
+
+    # 类别编码，用于 to_frame() 等列式输出
+    IDENTICAL = 0
+    MISMATCH = 1
+    NOT_IN_FILE1 = 2
+    NOT_IN_FILE2 = 3
+    EXTRA_IN_FILE1 = 4
+    EXTRA_IN_FILE2 = 5
+    CATEGORIES = (
+        "identical",
+        "mismatch",
+        "not_in_file1",
+        "not_in_file2",
+        "extra_in_file1",
+        "extra_in_file2",
+    )
+
+    def __init__(
+        self,
+        key_column: Union[str, List[str]],
+        columns: List[str],
+        identical_keys: pd.Index,
+        mismatch_keys: pd.Index,
+        not_in_file1_keys: pd.Index,
+        not_in_file2_keys: pd.Index,
+        cell_rows: np.ndarray,
+        cell_col_ids: np.ndarray,
+        old_values: np.ndarray,
+        new_values: np.ndarray,
+        meta: Dict = None,
+        extra_in_file1_keys: pd.Index = None,
+        extra_in_file2_keys: pd.Index = None,
+    ):
+        self.key_column = key_column
+        self.columns = list(columns)
+        self.identical_keys = identical_keys
+        self.mismatch_keys = mismatch_keys
+        self.not_in_file1_keys = not_in_file1_keys
+        self.not_in_file2_keys = not_in_file2_keys
+        self.extra_in_file1_keys = (
+            not_in_file2_keys[:0] if extra_in_file1_keys is None else extra_in_file1_keys
+        )
+        self.extra_in_file2_keys = (
+            not_in_file1_keys[:0] if extra_in_file2_keys is None else extra_in_file2_keys
+        )
+        self.cell_rows = cell_rows
+        self.cell_col_ids = cell_col_ids
+        self.old_values = old_values
+        self.new_values = new_values
+        self.meta = meta or {}
+        self._legacy = {}
+        # 每个差异行在单元格数组中的起止位置
+        self._row_bounds = np.searchsorted(
+            cell_rows, np.arange(len(mismatch_keys) + 1)
+        )
+
+    @classmethod
+    def from_diff(
+        cls, diff: Dict, key_column: Union[str, List[str]], meta: Dict = None
+    ) -> "DiffResult":
+        """由 file_diff.diff_frames / merge_diffs 的中间结果构造"""
+        common_keys = diff["common_keys"]
+        rows = diff["rows"]
+        mismatch_mask = np.zeros(len(common_keys), dtype=bool)
+        mismatch_mask[rows] = True
+        mismatch_rows = np.flatnonzero(mismatch_mask)
+        # 单元格的行号由“共同行下标”换算为“差异行下标”
+        cell_rows = np.searchsorted(mismatch_rows, rows)
+        return cls(
+            key_column=key_column,
+            columns=diff["compare_columns"],
+            identical_keys=common_keys[~mismatch_mask],
+            mismatch_keys=common_keys[mismatch_mask],
+            not_in_file1_keys=diff["not_in_file1"],
+            not_in_file2_keys=diff["not_in_file2"],
+            cell_rows=cell_rows,
+            cell_col_ids=diff["col_ids"],
+            old_values=diff["old_values"],
+            new_values=diff["new_values"],
+            meta=meta,
+            extra_in_file1_keys=diff["extra_in_file1"],
+            extra_in_file2_keys=diff["extra_in_file2"],
+        )
+
+    # ---- 统计 ----
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """各类别的数量，不生成任何文本"""
+        return {
+            "identical": len(self.identical_keys),
+            "mismatch": len(self.mismatch_keys),
+            "not_in_file1": len(self.not_in_file1_keys),
+            "not_in_file2": len(self.not_in_file2_keys),
+            "extra_in_file1": len(self.extra_in_file1_keys),
+            "extra_in_file2": len(self.extra_in_file2_keys),
+        }
+
+    @property
+    def mismatch_count(self) -> int:
+        return len(self.mismatch_keys)
+
+    @property
+    def has_differences(self) -> bool:
+        counts = self.counts
+        return any(counts[name] for name in self.CATEGORIES if name != "identical")
+
+    # ---- 按需生成文本 ----
+
+    def format_key(self, key) -> str:
+        if isinstance(self.key_column, str):
+            return f"【{self.key_column}={key}】"
+        pairs = ", ".join(f"{col}={value}" for col, value in zip(self.key_column, key))
+        return f"【{pairs}】"
+
+    def format_cells(self, row: int) -> str:
+        """生成第 row 个差异行各差异单元格的描述（不含关键值）"""
+        start, end = self._row_bounds[row], self._row_bounds[row + 1]
+        return "; ".join(
+            f"{self.columns[c]}: '{v1}' vs '{v2}'"
+            for c, v1, v2 in zip(
+                self.cell_col_ids[start:end],
+                self.old_values[start:end],
+                self.new_values[start:end],
+            )
+        )
+
+    def format_mismatch(self, row: int) -> str:
+        """生成第 row 个差异行的描述文本，格式与旧版本一致"""
+        return f"{self.format_key(self.mismatch_keys[row])} {self.format_cells(row)}"
+
+    def row_cell_counts(self) -> np.ndarray:
+        """每个差异行的差异单元格数量"""
+        return np.diff(self._row_bounds)
+
+    def row_first_column(self) -> np.ndarray:
+        """每个差异行第一个差异单元格所在列的编号"""
+        return self.cell_col_ids[self._row_bounds[:-1]]
+
+    def iter_mismatch_text(self, rows=None) -> Iterator[str]:
+        """逐行生成差异描述；rows 为差异行下标（None 表示全部）"""
+        if rows is None:
+            rows = range(len(self.mismatch_keys))
+        for row in rows:
+            yield self.format_mismatch(row)
+
+    # ---- 结构化筛选 ----
+
+    def cell_mask(self, column: Union[str, List[str]] = None, key=None) -> np.ndarray:
+        """
+        按列名和/或关键值筛选差异单元格，返回布尔掩码
+
+        key 可以是单个关键值或关键值列表；组合关键列时单个关键值是一个元组（如 (1, "a")），
+        多个关键值用元组的列表表示。
+        """
+        mask = np.ones(len(self.cell_rows), dtype=bool)
+        if column is not None:
+            names = [column] if isinstance(column, str) else list(column)
+            ids = [i for i, name in enumerate(self.columns) if name in names]
+            mask &= np.isin(self.cell_col_ids, ids)
+        if key is not None:
+            single_composite = (
+                isinstance(key, tuple)
+                and isinstance(self.mismatch_keys, pd.MultiIndex)
+                and not any(isinstance(part, tuple) for part in key)
+            )
+            if single_composite or not isinstance(
+                key, (list, tuple, set, np.ndarray, pd.Index)
+            ):
+                keys = [key]
+            else:
+                keys = key
+            row_mask = self.mismatch_keys.isin(list(keys))
+            mask &= row_mask[self.cell_rows]
+        return mask
+
+    def mismatch_rows(self, column=None, key=None) -> np.ndarray:
+        """返回满足条件的差异行下标"""
+        return np.unique(self.cell_rows[self.cell_mask(column, key)])
+
+    def cells(self, column=None, key=None) -> pd.DataFrame:
+        """以 DataFrame 返回差异单元格：关键值、列名、数据源1的值、数据源2的值"""
+        mask = self.cell_mask(column, key)
+        return pd.DataFrame(
+            {
+                "key": self.mismatch_keys.take(self.cell_rows[mask]).to_flat_index(),
+                "column": np.asarray(self.columns, dtype=object)[self.cell_col_ids[mask]],
+                "value1": self.old_values[mask],
+                "value2": self.new_values[mask],
+            }
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        所有差异项的列式视图：category 为类别编码（MISMATCH / NOT_IN_FILE1 / NOT_IN_FILE2 /
+        EXTRA_IN_FILE1 / EXTRA_IN_FILE2），差异单元格每格一行，其余类别每个关键值一行
+        """
+        cells = self.cells()
+        cells.insert(0, "category", self.MISMATCH)
+        frames = [
+            pd.DataFrame({"category": category, "key": keys.to_flat_index()})
+            for category, keys in (
+                (self.NOT_IN_FILE1, self.not_in_file1_keys),
+                (self.NOT_IN_FILE2, self.not_in_file2_keys),
+                (self.EXTRA_IN_FILE1, self.extra_in_file1_keys),
+                (self.EXTRA_IN_FILE2, self.extra_in_file2_keys),
+            )
+        ]
+        frames.append(cells)
+        return pd.concat(frames, ignore_index=True)
+
+    # ---- 兼容旧版字典 ----
+
+    def _materialize(self, name: str) -> list:
+        if name == "identical":
+            return list(self.identical_keys)
+        if name == "mismatch":
+            return list(self.iter_mismatch_text())
+        if name == "not_in_file1":
+            return list(self.not_in_file1_keys)
+        if name == "not_in_file2":
+            return list(self.not_in_file2_keys)
+        if name == "extra_in_file1":
+            return list(self.extra_in_file1_keys)
+        if name == "extra_in_file2":
+            return list(self.extra_in_file2_keys)
+        raise KeyError(name)
+
+    def __getitem__(self, name: str) -> list:
+        if name not in self._legacy:
+            self._legacy[name] = self._materialize(name)
+        return self._legacy[name]
+
+    def __iter__(self):
+        return iter(self.CATEGORIES)
+
+    def __contains__(self, name) -> bool:
+        return name in self.CATEGORIES
+
+    def __len__(self) -> int:
+        return len(self.CATEGORIES)
+
+    def to_dict(self) -> Dict[str, list]:
+        """转换为旧版本的结果字典"""
+        return {name: self[name] for name in self.CATEGORIES}
+
+    def __repr__(self) -> str:
+        counts = ", ".join(f"{name}={count}" for name, count in self.counts.items())
+        return f"DiffResult({counts})"
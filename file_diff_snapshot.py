@@ -0,0 +1,297 @@
+"""
+数据源快照（增量比较）
+
+每天用今天的全量导出与昨天的比较时，昨天的文件已经在上一次比较中作为数据源2读取过。
+本模块把数据源2的关键值、每行的行指纹以及按块保存的行数据写入一个 SQLite 快照文件，
+下一次比较时若数据源1正是快照对应的文件，就不再解析数据源1：
+
+1. 只读取并哈希新的数据源2
+2. 用快照中的关键值与行指纹找出新增、删除和指纹不同的行
+3. 只从快照中加载指纹不同的行的数据逐值比较
+
+比较结果与行指纹模式（fingerprint=True）的完整比较一致。快照与本次比较的关键列、比较列
+或列类型不一致时返回 None，由调用方改为完整比较。
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from file_diff import as_key_columns, compare_aligned, diff_frames
+from file_diff_cancel import CancelToken
+
+SNAPSHOT_VERSION = 1
+# 行数据按块保存，差异行只需加载所在的块
+BLOCK_ROWS = 4096
+# 快照中保存行指纹的列名
+HASH_COLUMN = "__row_hash__"
+# SQLite 单条语句的参数数量有限，按批查询
+_QUERY_BATCH = 500
+
+
+def column_category(series: pd.Series) -> Union[str, None]:
+    """
+    列的哈希类别：类别相同的两列，值相等则行指纹相等（与 _hash_values 的规则一致）
+
+    无法安全哈希的列（如混合类型）返回 None。
+    """
+    kind = series.dtype.kind
+    if kind in "biu" and not series.hasnans:
+        return "int"
+    if kind in "iu" and series.hasnans:
+        # 含空值的可空整数（Int64 等），转为 float64 会失去大整数的精度
+        return None
+    if kind in "biuf":
+        return "float"
+    if kind in "mM":
+        return str(series.dtype)
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        return "string"
+    return None
+
+
+def hash_rows(df: pd.DataFrame, columns: List[str], categories: Dict[str, str]) -> np.ndarray:
+    """按列的哈希类别计算每行的 64 位指纹"""
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    values = {}
+    for col in columns:
+        category = categories[col]
+        if category == "int":
+            values[col] = df[col].to_numpy(dtype="int64")
+        elif category == "float":
+            values[col] = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        elif category == "string":
+            values[col] = df[col].to_numpy(dtype=object)
+        else:
+            values[col] = df[col].to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(values), index=False).to_numpy()
+
+
+def _file_digest(file_path: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_identity(file_path: str) -> Dict:
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _same_file(identity: Dict, file_path: str) -> bool:
+    """大小与修改时间一致即视为同一文件；修改时间变化（如复制）时再比较内容摘要"""
+    current = _file_identity(file_path)
+    if current["size"] != identity["size"]:
+        return False
+    if current["mtime_ns"] == identity["mtime_ns"]:
+        return True
+    return _file_digest(file_path) == identity["digest"]
+
+
+def write_snapshot(
+    snapshot_path: str,
+    file_path: str,
+    data: pd.DataFrame,
+    header: List[str],
+    key_column: Union[str, List[str]],
+    source: Dict,
+):
+    """
+    把一个数据源写入快照文件（覆盖已有快照）
+
+    参数:
+        snapshot_path: 快照文件路径
+        file_path: 数据源文件路径，用于下次比较时确认数据源1就是该文件
+        data: 已读取的数据（行索引为行在文件中的位置）
+        header: 数据源的完整表头
+        key_column: 关键列
+        source: 读取参数（file_type、sheet_name、delimiter）以及类型描述 display
+    """
+    key_columns = as_key_columns(key_column)
+    hashed_columns = [col for col in data.columns if col not in key_columns]
+    categories = {col: column_category(data[col]) for col in hashed_columns}
+    data = data.reset_index(drop=True)
+
+    index = data[key_columns].copy()
+    if all(categories.values()):
+        index[HASH_COLUMN] = hash_rows(data, hashed_columns, categories)
+
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "pandas_version": pd.__version__,
+        "identity": dict(_file_identity(file_path), digest=_file_digest(file_path)),
+        "key_columns": key_columns,
+        "header": list(header),
+        "columns": data.columns.tolist(),
+        "hashed_columns": hashed_columns,
+        "categories": categories,
+        "source": source,
+        "rows": len(data),
+    }
+
+    # 先写临时文件再替换，写入中断时不会破坏上一次的快照
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value BLOB)")
+        conn.execute("CREATE TABLE blocks (block_id INTEGER PRIMARY KEY, data BLOB)")
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("meta", _dumps(meta)), ("index", _dumps(index))],
+        )
+        conn.executemany(
+            "INSERT INTO blocks VALUES (?, ?)",
+            (
+                (block_id, _dumps(data.iloc[start : start + BLOCK_ROWS]))
+                for block_id, start in enumerate(range(0, len(data), BLOCK_ROWS))
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, snapshot_path)
+
+
+def _dumps(obj) -> bytes:
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class Snapshot:
+    """已打开的快照，提供关键值、行指纹以及按行位置加载行数据"""
+
+    def __init__(self, snapshot_path: str):
+        self.conn = sqlite3.connect(snapshot_path)
+        self.meta = self._load("meta")
+        self.index = None
+
+    def _load(self, name: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return pickle.loads(row[0])
+
+    def matches(
+        self, file_path: str, key_column: Union[str, List[str]], source: Dict
+    ) -> bool:
+        """快照是否描述了以相同方式读取的 file_path"""
+        meta = self.meta
+        return (
+            meta["version"] == SNAPSHOT_VERSION
+            and meta["pandas_version"] == pd.__version__
+            and meta["key_columns"] == as_key_columns(key_column)
+            and all(meta["source"].get(name) == value for name, value in source.items())
+            and _same_file(meta["identity"], file_path)
+        )
+
+    @property
+    def header(self) -> List[str]:
+        return self.meta["header"]
+
+    @property
+    def display(self) -> str:
+        return self.meta["source"]["display"]
+
+    def load_rows(self, positions: np.ndarray) -> pd.DataFrame:
+        """按行位置加载行数据，只读取这些行所在的块"""
+        block_ids = np.unique(positions // BLOCK_ROWS).tolist()
+        blocks = []
+        for start in range(0, len(block_ids), _QUERY_BATCH):
+            batch = block_ids[start : start + _QUERY_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            cursor = self.conn.execute(
+                f"SELECT data FROM blocks WHERE block_id IN ({placeholders})", batch
+            )
+            blocks.extend(pickle.loads(row[0]) for row in cursor)
+        if not blocks:
+            return pd.DataFrame(columns=self.meta["columns"])
+        frame = pd.concat(blocks) if len(blocks) > 1 else blocks[0]
+        return frame.loc[positions]
+
+    def diff(
+        self,
+        df2: pd.DataFrame,
+        key_column: Union[str, List[str]],
+        compared_columns: List[str],
+        duplicates: str = "first",
+        cancel: CancelToken = None,
+    ) -> Union[Dict, None]:
+        """
+        用快照代替数据源1与 df2 比较，返回与 file_diff.diff_frames 相同结构的中间结果
+
+        duplicates、cancel 同 diff_frames；快照的比较列或列类型与本次比较不一致时返回 None。
+        """
+        key_columns = as_key_columns(key_column)
+        compare_columns = [col for col in compared_columns if col not in key_columns]
+        hashed_columns = self.meta["hashed_columns"]
+        categories = self.meta["categories"]
+        if set(compare_columns) != set(hashed_columns):
+            return None
+        if any(
+            categories[col] is None or column_category(df2[col]) != categories[col]
+            for col in hashed_columns
+        ):
+            return None
+
+        if self.index is None:
+            self.index = self._load("index")
+        df2 = df2.reset_index(drop=True)
+        keys2 = df2[key_columns].copy()
+        keys2[HASH_COLUMN] = hash_rows(df2, hashed_columns, categories)
+
+        # 关键值的匹配（含重复值处理）与完整比较完全相同，只是“值”换成了行指纹
+        diff = diff_frames(
+            self.index,
+            keys2,
+            key_column,
+            key_columns + [HASH_COLUMN],
+            duplicates=duplicates,
+            cancel=cancel,
+        )
+        candidates = diff["rows"]
+
+        # 只加载并逐值比较指纹不同的行
+        rows1 = self.load_rows(diff["common_pos"][candidates])
+        rows2 = df2.iloc[diff["common_pos2"][candidates]]
+        rows, col_ids, old_values, new_values = compare_aligned(
+            rows1.reset_index(drop=True), rows2.reset_index(drop=True), compare_columns, cancel
+        )
+        diff.update(
+            {
+                "compare_columns": compare_columns,
+                "rows": candidates[rows],
+                "col_ids": col_ids,
+                "old_values": old_values,
+                "new_values": new_values,
+            }
+        )
+        return diff
+
+    def close(self):
+        self.conn.close()
+
+
+def open_snapshot(
+    snapshot_path: str,
+    file_path: str,
+    key_column: Union[str, List[str]],
+    source: Dict,
+) -> Union[Snapshot, None]:
+    """打开描述 file_path 的快照；快照不存在、已损坏或描述的不是该文件时返回 None"""
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return None
+    try:
+        snapshot = Snapshot(snapshot_path)
+    except Exception:
+        return None
+    if not snapshot.matches(file_path, key_column, source):
+        snapshot.close()
+        return None
+    return snapshot
@@ -0,0 +1,643 @@
+"""
+CSV/TXT 流式分区比较引擎
+
+按块读取两个文本文件，按关键列的哈希值把行分散到磁盘上的临时分区，
+再逐个分区调用 file_diff.diff_frames 进行比较，峰值内存受 memory_limit_mb 约束。
+
+为保证结果与一次性读取完全一致：
+- 各块一律按字符串读取，读完整个文件后再按整列统一推断类型（与 pd.read_csv 的推断规则一致）
+- 每行保留其在原文件中的位置，用于合并分区结果时恢复数据源1的行顺序
+- 同一关键值必然落在同一分区且按文件顺序追加，因此“保留第一个”的去重语义不变
+
+取消比较时（见 file_diff_cancel）在每读完一块、每比较完一个分区后生效，临时分区目录随即删除。
+
+key_first_diff 是另一种按块读取的方式，适合两边大部分关键值不同的文件（如滚动的周报导出）：
+第一遍只读取关键列，确定仅单边存在的关键值与共同关键值；第二遍按块读取其余列，
+只保留关键值两边都存在的行。内存占用随共同行数而不是两边总行数增长。
+
+merge_join_diff 用于已按关键列升序排列的文件：两个文件按块同步读取、逐段比较，
+不需要分区和临时文件，同时驻留内存的只有两边各约两块数据。
+"""
+
+import math
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from file_diff import (
+    as_key_columns,
+    diff_frames,
+    factorize_keys,
+    merge_diffs,
+    parallel_diff_frames,
+    partition_ids,
+)
+from file_diff_cancel import CancelToken, check_cancelled, gather
+from file_diff_log import DiffLog, as_log
+from file_diff_profile import DiffProfiler, phase
+
+# 文本解析为 DataFrame 后的大致内存膨胀系数（字符串对象、索引等开销）
+MEMORY_EXPANSION = 6
+# 分区数量上限，避免临时文件数量失控
+MAX_PARTITIONS = 512
+
+_INT_PATTERN = r"[+-]?\d+"
+_TRUE_VALUES = {"True", "TRUE", "true"}
+_FALSE_VALUES = {"False", "FALSE", "false"}
+
+
+class _ColumnProfile:
+    """逐块累积一列的类型信息，用于整列统一推断类型"""
+
+    def __init__(self):
+        self.has_null = False
+        self.has_value = False
+        self.all_int = True
+        self.all_float = True
+        self.all_bool = True
+
+    def update(self, series: pd.Series):
+        values = series.dropna()
+        if len(values) < len(series):
+            self.has_null = True
+        if values.empty:
+            return
+        self.has_value = True
+        if self.all_bool:
+            self.all_bool = bool(values.isin(_TRUE_VALUES | _FALSE_VALUES).all())
+        if self.all_int:
+            self.all_int = bool(values.str.fullmatch(_INT_PATTERN).all())
+        if self.all_float and not self.all_int:
+            self.all_float = bool(pd.to_numeric(values, errors="coerce").notna().all())
+
+    def convert(self, series: pd.Series) -> pd.Series:
+        """按整列推断的类型转换一个分区内的列"""
+        if not self.has_value:
+            # 整列为空时 pandas 解析为 float64
+            return pd.Series(np.nan, index=series.index, dtype="float64")
+        if self.all_bool:
+            converted = series.map(lambda v: v in _TRUE_VALUES, na_action="ignore")
+            return converted.astype(object if self.has_null else bool)
+        if self.all_int:
+            # 整列含空值时 pandas 解析为 float64，不含空值的分区也要一致
+            return pd.to_numeric(series).astype("float64" if self.has_null else "int64")
+        if self.all_float:
+            return pd.to_numeric(series).astype("float64")
+        return series
+
+
+def _estimate_row_bytes(file_path: str) -> float:
+    """根据文件开头的样本估算每行的平均字节数"""
+    with open(file_path, "rb") as f:
+        sample = f.read(1 << 16)
+    return len(sample) / max(1, sample.count(b"\n"))
+
+
+def _chunk_rows(file_paths: List[str], budget: int) -> int:
+    """按内存预算（字节）与文件的平均行长确定每块读取的行数"""
+    row_bytes = max(max(_estimate_row_bytes(path) for path in file_paths), 1.0)
+    return max(1000, int(budget / (4 * MEMORY_EXPANSION * row_bytes)))
+
+
+def _spill(
+    file_path: str,
+    side: int,
+    columns: List[str],
+    key_column: Union[str, List[str]],
+    delimiter: str,
+    chunksize: int,
+    partitions: int,
+    spill_dir: str,
+    cancel: CancelToken = None,
+) -> Dict[str, _ColumnProfile]:
+    """按块读取文件并把各行追加到对应的分区文件，返回每列的类型信息"""
+    profiles = {col: _ColumnProfile() for col in columns}
+    handles = {}
+    position = 0
+    try:
+        reader = pd.read_csv(
+            file_path,
+            delimiter=delimiter,
+            usecols=columns,
+            dtype=str,
+            chunksize=chunksize,
+        )
+        for chunk in reader:
+            check_cancelled(cancel)
+            chunk = chunk[columns]
+            chunk.index = pd.RangeIndex(position, position + len(chunk))
+            position += len(chunk)
+
+            for col in columns:
+                profiles[col].update(chunk[col])
+
+            part_ids = partition_ids(chunk[as_key_columns(key_column)], partitions)
+            for part_id, part in chunk.groupby(part_ids, sort=False):
+                handle = handles.get(part_id)
+                if handle is None:
+                    handle = open(
+                        os.path.join(spill_dir, f"side{side}_part{part_id}.pkl"), "wb"
+                    )
+                    handles[part_id] = handle
+                pickle.dump(part, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return profiles
+
+
+def _load_partition(
+    spill_dir: str,
+    side: int,
+    part_id: int,
+    columns: List[str],
+    profiles: Dict[str, _ColumnProfile],
+) -> pd.DataFrame:
+    """读取一个分区的全部块并按整列类型转换"""
+    path = os.path.join(spill_dir, f"side{side}_part{part_id}.pkl")
+    parts = []
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    parts.append(pickle.load(f))
+                except EOFError:
+                    break
+        os.remove(path)
+
+    if parts:
+        frame = pd.concat(parts) if len(parts) > 1 else parts[0]
+    else:
+        frame = pd.DataFrame({col: pd.Series([], dtype=str) for col in columns})
+    return pd.DataFrame(
+        {col: profiles[col].convert(frame[col]) for col in columns}, index=frame.index
+    )
+
+
+def _diff_partition(
+    spill_dir: str,
+    part_id: int,
+    key_column: Union[str, List[str]],
+    columns: List[str],
+    profiles1: Dict[str, _ColumnProfile],
+    profiles2: Dict[str, _ColumnProfile],
+    compare_options: Dict,
+    cancel: CancelToken = None,
+) -> Union[Dict, None]:
+    """读取并比较一对分区，可在子进程中执行（此时不传 cancel）；两边均为空时返回 None"""
+    df1 = _load_partition(spill_dir, 1, part_id, columns, profiles1)
+    df2 = _load_partition(spill_dir, 2, part_id, columns, profiles2)
+    if df1.empty and df2.empty:
+        return None
+    return diff_frames(df1, df2, key_column, columns, cancel=cancel, **compare_options)
+
+
+def stream_diff(
+    file1_path: str,
+    file2_path: str,
+    key_column: Union[str, List[str]],
+    common_columns: List[str],
+    delimiter: str = ",",
+    memory_limit_mb: int = 512,
+    chunksize: int = None,
+    workers: int = 1,
+    compare_options: Dict = None,
+    cancel: CancelToken = None,
+    log: DiffLog = None,
+) -> Dict:
+    """
+    流式比较两个 CSV/TXT 文件，返回与 file_diff.diff_frames 相同结构的中间结果
+
+    参数:
+        file1_path: 数据源1 文件路径
+        file2_path: 数据源2 文件路径
+        key_column: 关键列名或组合关键列的列名列表
+        common_columns: 参与比较的共同列（需包含关键列）
+        delimiter: 分隔符
+        memory_limit_mb: 内存预算（MB），决定分区数量与每块行数
+        chunksize: 每块读取的行数（None 表示根据内存预算自动计算）
+        workers: 并行比较分区的进程数，同时驻留内存的分区对数等于进程数
+        compare_options: 传给 diff_frames 的比较选项（如 fingerprint）
+        cancel: 取消标记，每读完一块、每比较完一个分区检查一次；并行时直接终止工作进程
+        log: 输出事件的 DiffLog（默认打印到控制台）
+    """
+    workers = max(1, workers)
+    budget = max(1, memory_limit_mb) * 1024 * 1024
+    total_size = os.path.getsize(file1_path) + os.path.getsize(file2_path)
+    # 同时驻留内存的分区对数等于进程数，分区数按两边文件解析后的总大小估算
+    partitions = min(
+        MAX_PARTITIONS,
+        max(workers, math.ceil(total_size * MEMORY_EXPANSION * workers / budget)),
+    )
+    if chunksize is None:
+        chunksize = _chunk_rows([file1_path, file2_path], budget)
+
+    as_log(log).emit(
+        "streaming",
+        lambda: f"🌊 流式比较: {partitions} 个分区，每块 {chunksize} 行",
+        partitions=partitions,
+        chunksize=chunksize,
+    )
+
+    spill_dir = tempfile.mkdtemp(prefix="file_diff_spill_")
+    try:
+        profiles1 = _spill(
+            file1_path, 1, common_columns, key_column, delimiter,
+            chunksize, partitions, spill_dir, cancel,
+        )
+        profiles2 = _spill(
+            file2_path, 2, common_columns, key_column, delimiter,
+            chunksize, partitions, spill_dir, cancel,
+        )
+
+        args = (key_column, common_columns, profiles1, profiles2, compare_options or {})
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            futures = [
+                pool.submit(_diff_partition, spill_dir, part_id, *args)
+                for part_id in range(partitions)
+            ]
+            diffs = gather(pool, futures, cancel)
+        else:
+            diffs = []
+            for part_id in range(partitions):
+                check_cancelled(cancel)
+                diffs.append(_diff_partition(spill_dir, part_id, *args, cancel))
+        diffs = [diff for diff in diffs if diff is not None]
+
+        if not diffs:
+            empty = pd.DataFrame({col: [] for col in common_columns})
+            diffs.append(diff_frames(empty, empty, key_column, common_columns))
+        return merge_diffs(diffs)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def read_rows(
+    file_path: str,
+    columns: List[str],
+    keep: np.ndarray,
+    delimiter: str = ",",
+    chunksize: int = 100_000,
+    cancel: CancelToken = None,
+) -> pd.DataFrame:
+    """
+    按块读取 columns 列，只保留 keep 为 True 的行（keep 按文件中的行位置给出），返回的行索引为行在文件中的位置
+
+    每块由 C 解析器按块推断类型，并检查所有块（包括未保留任何行的块）的类型一致（见 _check_types），
+    未保留任何行的块也以空表参与合并，合并后的列类型与一次性读取相同（如整数块与浮点块合并为浮点列）。
+    类型不一致时（如文本列中某块只含数字）改为与 stream_diff 相同，按字符串重新读取、整列推断类型后转换。
+    """
+    try:
+        return _read_kept_rows(file_path, columns, keep, delimiter, chunksize, cancel, False)
+    except ColumnTypeChangedError:
+        return _read_kept_rows(file_path, columns, keep, delimiter, chunksize, cancel, True)
+
+
+def _read_kept_rows(
+    file_path: str,
+    columns: List[str],
+    keep: np.ndarray,
+    delimiter: str,
+    chunksize: int,
+    cancel: CancelToken,
+    as_text: bool,
+) -> pd.DataFrame:
+    """read_rows 的实现；as_text 为 True 时按字符串读取并按整列类型转换"""
+    profiles = {col: _ColumnProfile() for col in columns}
+    kinds = {}
+    parts = []
+    position = 0
+    reader = pd.read_csv(
+        file_path,
+        delimiter=delimiter,
+        usecols=columns,
+        dtype=str if as_text else None,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        check_cancelled(cancel)
+        chunk = chunk[columns]
+        chunk.index = pd.RangeIndex(position, position + len(chunk))
+        if as_text:
+            for col in columns:
+                profiles[col].update(chunk[col])
+        else:
+            _check_types(chunk, kinds, file_path)
+        parts.append(chunk[keep[position : position + len(chunk)]])
+        position += len(chunk)
+    if not parts:
+        return pd.read_csv(file_path, delimiter=delimiter, usecols=columns, nrows=0)[columns]
+    frame = pd.concat(parts) if len(parts) > 1 else parts[0]
+    if not as_text:
+        return frame
+    return pd.DataFrame(
+        {col: profiles[col].convert(frame[col]) for col in columns}, index=frame.index
+    )
+
+
+def key_first_diff(
+    file1_path: str,
+    file2_path: str,
+    key_column: Union[str, List[str]],
+    common_columns: List[str],
+    delimiter: str = ",",
+    memory_limit_mb: int = 512,
+    chunksize: int = None,
+    workers: int = 1,
+    compare_options: Dict = None,
+    profiler: DiffProfiler = None,
+    cancel: CancelToken = None,
+    log: DiffLog = None,
+) -> Dict:
+    """
+    两遍读取比较两个 CSV/TXT 文件，返回与 file_diff.diff_frames 相同结构的中间结果
+
+    第一遍只读取关键列并比较关键值，得到仅单边存在的关键值；第二遍按块读取其余比较列，
+    只保留关键值在两边都存在的行，再与第一遍的关键列拼接后比较。结果与一次性读取完全一致。
+
+    参数与 stream_diff 相同；memory_limit_mb / chunksize 决定第二遍每块读取的行数，
+    workers 大于 1 时共同行在进程池中并行比较，profiler 记录两遍读取与比较的各阶段。
+    """
+    compare_options = compare_options or {}
+    key_columns = as_key_columns(key_column)
+    other_columns = [col for col in common_columns if col not in key_columns]
+    log = as_log(log)
+
+    # 第一遍：只读取关键列，类型推断与完整读取相同
+    keys = []
+    for path in (file1_path, file2_path):
+        check_cancelled(cancel)
+        with phase(profiler, "读取关键列") as record:
+            frame = pd.read_csv(path, delimiter=delimiter, usecols=key_columns)[key_columns]
+            record["rows"] = len(frame)
+        keys.append(frame)
+    keys1, keys2 = keys
+
+    # 仅单边存在的关键值、重复标记由只含关键列的比较得到
+    check_cancelled(cancel)
+    key_diff = diff_frames(
+        keys1, keys2, key_column, key_columns, duplicates=compare_options.get("duplicates", "first")
+    )
+    codes1, codes2 = factorize_keys(keys1, keys2)
+    shared1 = pd.Index(codes1).isin(codes2)
+    shared2 = pd.Index(codes2).isin(codes1)
+    del codes1, codes2
+
+    rows1, rows2 = len(keys1), len(keys2)
+    shared_rows1, shared_rows2 = int(shared1.sum()), int(shared2.sum())
+    log.emit(
+        "key_first",
+        lambda: f"🔑 两遍读取: 数据源1 共 {rows1} 行，其中 {shared_rows1} 行的关键值两边都存在；"
+        f"数据源2 共 {rows2} 行，其中 {shared_rows2} 行",
+        rows1=rows1,
+        rows2=rows2,
+        shared1=shared_rows1,
+        shared2=shared_rows2,
+    )
+
+    # 第二遍：只保留共同关键值的行
+    if chunksize is None:
+        chunksize = _chunk_rows([file1_path, file2_path], max(1, memory_limit_mb) * 1024 * 1024)
+    frames = []
+    for path, key_frame, shared in ((file1_path, keys1, shared1), (file2_path, keys2, shared2)):
+        check_cancelled(cancel)
+        with phase(profiler, "读取共同行", int(shared.sum())):
+            frame = key_frame[shared]
+            if other_columns:
+                rows = read_rows(path, other_columns, shared, delimiter, chunksize, cancel)
+                frame = pd.concat([frame, rows], axis=1)[common_columns]
+        frames.append(frame)
+    del keys, keys1, keys2
+    frame1, frame2 = frames
+    del frames
+
+    check_cancelled(cancel)
+    if workers > 1:
+        log.emit("parallel", lambda: f"⚙️ 使用 {workers} 个进程并行比较")
+        with phase(profiler, "并行比较", len(frame1) + len(frame2)):
+            diff = parallel_diff_frames(
+                frame1, frame2, key_column, common_columns, workers, cancel=cancel,
+                **compare_options,
+            )
+    else:
+        diff = diff_frames(
+            frame1, frame2, key_column, common_columns, profiler=profiler, cancel=cancel,
+            **compare_options,
+        )
+    diff.update(
+        duplicates1=key_diff["duplicates1"],
+        duplicates2=key_diff["duplicates2"],
+        not_in_file1=key_diff["not_in_file1"],
+        not_in_file2=key_diff["not_in_file2"],
+    )
+    return diff
+
+
+class UnsortedInputError(ValueError):
+    """有序归并比较时发现输入没有按关键列升序排列"""
+
+
+class ColumnTypeChangedError(UnsortedInputError):
+    """
+    按块推断类型时某列在后面的块中出现了与前面的块不同类型的值（如数值列中出现文本），
+    已解析的块与整列推断的类型不一致；有序归并比较与输入没有排序一样改用流式分区比较，
+    read_rows 改为按字符串重新读取
+    """
+
+
+def value_kind(series: pd.Series) -> Union[str, None]:
+    """
+    一块中一列的类型类别："bool"、"int"、"float"、"text" 或 "mixed"（同时含数值与文本），
+    没有非空值时为 None
+    """
+    kind = series.dtype.kind
+    if kind == "b":
+        return "bool"
+    if kind in "iu":
+        return "int"
+    if kind == "f":
+        return None if series.isna().all() else "float"
+    if isinstance(series.dtype, pd.StringDtype):
+        return "text" if series.notna().any() else None
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    return {"string": "text", "boolean": "bool", "empty": None}.get(inferred, "mixed")
+
+
+def _check_types(chunk: pd.DataFrame, kinds: Dict[str, str], file_path: str):
+    """
+    检查一块中各列的类型与之前的块一致（merge_join_diff 使用）
+
+    每列的类型类别由第一次出现非空值的块确定并记录在 kinds 中。整数块与浮点块可以混合
+    （按数值比较的结果与整列转为浮点数相同）；其他情况下块的划分会影响比较结果
+    （如文本列中某块只含数字时被解析为数值），抛出 ColumnTypeChangedError。
+    """
+    for col in chunk.columns:
+        current = value_kind(chunk[col])
+        if current is None:
+            continue
+        kind = kinds.setdefault(col, current)
+        if current == "mixed" or (current != kind and {kind, current} - {"int", "float"}):
+            raise ColumnTypeChangedError(
+                f"{os.path.basename(file_path)} 的列 {col!r} 在第 {chunk.index[0] + 1} 行起的块中"
+                "出现了与前面类型不同的值"
+            )
+
+
+def key_at(frame: pd.DataFrame, key_columns: List[str], row: int) -> tuple:
+    """第 row 行的关键值（元组）"""
+    return tuple(frame[col].iat[row] for col in key_columns)
+
+
+def check_sorted(chunk: pd.DataFrame, key_columns: List[str], previous, file_path: str):
+    """检查一块的关键值是否升序且不小于上一块的最后一个关键值，空关键值视为无法排序"""
+    keys = chunk[key_columns]
+    try:
+        ordered = not keys.isna().any().any() and (
+            pd.Index(keys[key_columns[0]]).is_monotonic_increasing
+            if len(key_columns) == 1
+            else pd.MultiIndex.from_frame(keys).is_monotonic_increasing
+        )
+        if ordered and previous is not None:
+            ordered = previous <= key_at(chunk, key_columns, 0)
+    except TypeError:
+        ordered = False
+    if not ordered:
+        raise UnsortedInputError(f"{os.path.basename(file_path)} 没有按关键列升序排列")
+
+
+def _cut(frame: pd.DataFrame, key_columns: List[str], boundary: tuple) -> int:
+    """已排序的 frame 中第一个关键值不小于 boundary 的行位置（二分查找）"""
+    low, high = 0, len(frame)
+    while low < high:
+        middle = (low + high) // 2
+        if key_at(frame, key_columns, middle) < boundary:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def merge_join_diff(
+    file1_path: str,
+    file2_path: str,
+    key_column: Union[str, List[str]],
+    common_columns: List[str],
+    delimiter: str = ",",
+    memory_limit_mb: int = 512,
+    chunksize: int = None,
+    compare_options: Dict = None,
+    cancel: CancelToken = None,
+    log: DiffLog = None,
+) -> Dict:
+    """
+    有序归并比较两个已按关键列升序排列的 CSV/TXT 文件，返回与 file_diff.diff_frames 相同结构的中间结果
+
+    两个文件按块同步读取，每次取两边已读到的最后一个关键值中较小的一个为边界，
+    边界之前的关键值两边都已读全，对这一段调用 diff_frames 比较后即释放，
+    同一关键值的所有行必然在同一段中，重复关键值的处理与一次性读取相同。
+    同时驻留内存的只有两边各约两块数据，与文件大小无关（比较结果本身仍随关键值数量增长）。
+
+    每块由 C 解析器按块推断类型，并检查各列在所有块中的类型类别与第一次出现非空值的块一致
+    （见 _check_types），因此分类结果与块的划分无关。整数列在某些块中含空值或小数时，
+    这些块为浮点数、其余块为整数，按数值比较的结果与一次性读取相同，但报告中数值的写法可能不同
+    （如 5 与 5.0），超过 2**53 的整数也不会像整列转为浮点数时那样失去精度。
+    其他类型不一致（如文本列中某块只含数字、数值列中出现文本）时抛出 ColumnTypeChangedError
+    （UnsortedInputError 的子类），与输入没有排序一样改用流式分区比较。
+
+    关键值的顺序按解析后的值比较（数值按大小，字符串按字符编码）。发现某块的关键值没有升序排列、
+    存在空关键值或关键值无法比较大小时抛出 UnsortedInputError，已比较的部分作废。
+
+    参数:
+        memory_limit_mb / chunksize: 决定每块读取的行数
+        其余参数与 stream_diff 相同
+    """
+    key_columns = as_key_columns(key_column)
+    if chunksize is None:
+        chunksize = _chunk_rows([file1_path, file2_path], max(1, memory_limit_mb) * 1024 * 1024)
+    as_log(log).emit(
+        "sorted_merge",
+        lambda: f"🔀 有序归并比较: 每块 {chunksize} 行",
+        chunksize=chunksize,
+    )
+
+    paths = (file1_path, file2_path)
+    readers = [
+        iter(pd.read_csv(path, delimiter=delimiter, usecols=common_columns, chunksize=chunksize))
+        for path in paths
+    ]
+    # 每个文件各列的类型类别
+    kinds = [{}, {}]
+    buffers = [None, None]
+    positions = [0, 0]
+    exhausted = [False, False]
+
+    def refill(side):
+        chunk = next(readers[side], None)
+        while chunk is not None and chunk.empty:
+            chunk = next(readers[side], None)
+        if chunk is None:
+            exhausted[side] = True
+            return
+        chunk = chunk[common_columns]
+        chunk.index = pd.RangeIndex(positions[side], positions[side] + len(chunk))
+        positions[side] += len(chunk)
+        _check_types(chunk, kinds[side], paths[side])
+        buffer = buffers[side]
+        previous = None
+        if buffer is not None and len(buffer):
+            previous = key_at(buffer, key_columns, len(buffer) - 1)
+        check_sorted(chunk, key_columns, previous, paths[side])
+        buffers[side] = chunk if buffer is None or buffer.empty else pd.concat([buffer, chunk])
+
+    diffs = []
+    for side in (0, 1):
+        refill(side)
+    while True:
+        check_cancelled(cancel)
+        # 未读完的一边中，已读到的最后一个关键值较小者为边界；两边都读完时比较剩余的全部行
+        lasts = [
+            key_at(buffers[side], key_columns, len(buffers[side]) - 1)
+            for side in (0, 1)
+            if not exhausted[side]
+        ]
+        try:
+            boundary = min(lasts) if lasts else None
+        except TypeError:
+            raise UnsortedInputError("两个文件的关键值无法比较大小") from None
+        blocks = []
+        for side in (0, 1):
+            buffer = buffers[side]
+            if buffer is None:
+                buffer = pd.DataFrame(columns=common_columns)
+            try:
+                cut = len(buffer) if boundary is None else _cut(buffer, key_columns, boundary)
+            except TypeError:
+                raise UnsortedInputError("两个文件的关键值无法比较大小") from None
+            blocks.append(buffer.iloc[:cut])
+            buffers[side] = buffer.iloc[cut:]
+        if len(blocks[0]) or len(blocks[1]):
+            diffs.append(
+                diff_frames(
+                    blocks[0], blocks[1], key_column, common_columns, cancel=cancel,
+                    **(compare_options or {}),
+                )
+            )
+        del blocks
+        if boundary is None:
+            break
+        for side in (0, 1):
+            buffer = buffers[side]
+            if not exhausted[side] and key_at(buffer, key_columns, len(buffer) - 1) == boundary:
+                refill(side)
+
+    if not diffs:
+        empty = pd.DataFrame({col: [] for col in common_columns})
+        diffs.append(diff_frames(empty, empty, key_column, common_columns))
+    return merge_diffs(diffs)
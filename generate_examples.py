@@ -4,13 +4,28 @@
 """
 示例数据生成脚本
 用于创建用于测试文件差异比较功能的示例Excel文件
+
+不带参数运行时生成 examples 目录下的小型示例；指定 --rows 等参数时生成
+用于性能测试的大规模数据集（见 generate_dataset 和 benchmark.py）:
+
+    python generate_examples.py --rows 1000000 --columns 20 --file-type csv --out-dir data
 """
 
-import pandas as pd
+import argparse
+import hashlib
+import json
 import os
 import random
 from datetime import datetime, timedelta
 
+import numpy as np
+import pandas as pd
+
+# 数据集各列的类型："mixed" 依次循环使用全部类型
+DTYPES = ("int", "float", "str", "date", "bool")
+# Excel 单个工作表的数据行数上限（不含标题行）
+EXCEL_MAX_ROWS = 1_048_575
+
 def generate_sample_data():
     """生成示例数据"""
     
@@ -146,5 +161,232 @@ python generate_examples.py
     print("- products_modified.xlsx")
     print("- README.md")
 
+def _column_types(columns, dtypes):
+    """每个数据列的类型"""
+    if dtypes == "mixed":
+        return [DTYPES[i % len(DTYPES)] for i in range(columns)]
+    if dtypes not in DTYPES:
+        raise ValueError(f"dtypes 必须是 'mixed' 或 {DTYPES} 之一")
+    return [dtypes] * columns
+
+
+def _random_column(rng, dtype, rows):
+    """生成一列随机值"""
+    if dtype == "int":
+        return rng.integers(0, 1_000_000, rows)
+    if dtype == "float":
+        return np.round(rng.random(rows) * 10_000, 2)
+    if dtype == "str":
+        pool = np.array([f"值{i}" for i in range(1000)], dtype=object)
+        return pool[rng.integers(0, len(pool), rows)]
+    if dtype == "date":
+        days = rng.integers(0, 3650, rows)
+        return (np.datetime64("2015-01-01") + days.astype("timedelta64[D]")).astype(
+            "datetime64[ns]"
+        )
+    return rng.random(rows) < 0.5
+
+
+def _changed_values(values, dtype):
+    """把一组值改成必然不同的值"""
+    if dtype == "int":
+        return values + 1
+    if dtype == "float":
+        return values + 0.5
+    if dtype == "str":
+        return np.array([f"{v}_改" for v in values], dtype=object)
+    if dtype == "date":
+        return values + np.timedelta64(1, "D")
+    return ~values
+
+
+def dataset_name(**params) -> str:
+    """由生成参数得到数据集文件名（不含扩展名），参数相同则名称相同"""
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"dataset_{params['rows']}r_{params['columns']}c_{digest[:8]}"
+
+
+def generate_dataset(
+    out_dir,
+    rows=100_000,
+    columns=10,
+    dtypes="mixed",
+    mismatch_rate=0.01,
+    insert_rate=0.005,
+    delete_rate=0.005,
+    duplicate_rate=0.0,
+    file_type="csv",
+    delimiter=None,
+    shuffle=True,
+    seed=0,
+    overwrite=False,
+):
+    """
+    生成一对用于比较的数据文件
+
+    数据源1有 rows 行，关键列为 "ID"，另有 columns 个数据列；数据源2由数据源1修改得到:
+    mismatch_rate 比例的行各有一个单元格被修改，delete_rate 比例的行被删除，
+    另外追加 insert_rate 比例的新行；duplicate_rate 比例的行在数据源1末尾原样重复一次
+    （默认的 duplicates="first" 下不影响结果，"occurrence" / "content" 下计为 extra_in_file1）。
+    修改、删除与重复的行互不重叠，因此比较结果可以精确预知。
+
+    参数:
+        out_dir: 输出目录
+        rows / columns: 数据源1的行数与数据列数
+        dtypes: 数据列类型，"mixed" 或 "int"、"float"、"str"、"date"、"bool" 之一
+        file_type: "csv"、"txt" 或 "excel"（Excel 每个文件最多 1048575 行）
+        delimiter: CSV/TXT 的分隔符，默认 CSV 为逗号、TXT 为制表符
+        shuffle: 是否打乱数据源2的行顺序
+        seed: 随机种子，参数相同时生成的数据完全相同
+        overwrite: 为 False 时同名数据集已存在则直接复用
+
+    返回:
+        字典: file1、file2、key_column、file_type、delimiter、params，
+        expected（默认 duplicates="first" 下 two_file_diff 应得到的各类别数量）
+        以及 duplicate_rows（数据源1中重复的行数）
+    """
+    if file_type not in ["excel", "csv", "txt"]:
+        raise ValueError("file_type 必须是 'excel'、'csv' 或 'txt'")
+    if delimiter is None:
+        delimiter = "\t" if file_type == "txt" else ","
+    n_mismatch = int(rows * mismatch_rate)
+    n_delete = int(rows * delete_rate)
+    n_duplicate = int(rows * duplicate_rate)
+    n_insert = int(rows * insert_rate)
+    if n_mismatch + n_delete + n_duplicate > rows:
+        raise ValueError("修改、删除与重复的行数之和不能超过总行数")
+    if file_type == "excel" and max(rows + n_duplicate, rows + n_insert) > EXCEL_MAX_ROWS:
+        raise ValueError(f"Excel 文件最多 {EXCEL_MAX_ROWS} 行数据")
+
+    params = {
+        "rows": rows,
+        "columns": columns,
+        "dtypes": dtypes,
+        "mismatch_rate": mismatch_rate,
+        "insert_rate": insert_rate,
+        "delete_rate": delete_rate,
+        "duplicate_rate": duplicate_rate,
+        "file_type": file_type,
+        "delimiter": delimiter,
+        "shuffle": shuffle,
+        "seed": seed,
+    }
+    ext = {"excel": "xlsx", "csv": "csv", "txt": "txt"}[file_type]
+    name = dataset_name(**params)
+    file1 = os.path.join(out_dir, f"{name}_1.{ext}")
+    file2 = os.path.join(out_dir, f"{name}_2.{ext}")
+    info_path = os.path.join(out_dir, f"{name}.json")
+    if not overwrite and all(os.path.exists(p) for p in (file1, file2, info_path)):
+        with open(info_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    types = _column_types(columns, dtypes)
+    names = [f"{dtype}_{i}" for i, dtype in enumerate(types)]
+
+    def frame(ids):
+        data = {"ID": ids}
+        for col, dtype in zip(names, types):
+            data[col] = _random_column(rng, dtype, len(ids))
+        return pd.DataFrame(data)
+
+    df1 = frame("K" + pd.Series(np.arange(rows)).astype(str))
+
+    # 互不重叠地选出修改、删除与重复的行
+    picked = rng.permutation(rows)
+    mismatch_rows = np.sort(picked[:n_mismatch])
+    delete_rows = picked[n_mismatch : n_mismatch + n_delete]
+    duplicate_rows = np.sort(picked[n_mismatch + n_delete : n_mismatch + n_delete + n_duplicate])
+
+    df2 = df1.copy()
+    if columns:
+        # 每个修改行随机选一列改成不同的值
+        changed_cols = rng.integers(0, columns, n_mismatch)
+        for i, (col, dtype) in enumerate(zip(names, types)):
+            target = mismatch_rows[changed_cols == i]
+            position = df2.columns.get_loc(col)
+            df2.iloc[target, position] = _changed_values(
+                df2[col].to_numpy()[target], dtype
+            )
+    else:
+        n_mismatch = 0
+    keep = np.ones(rows, dtype=bool)
+    keep[delete_rows] = False
+    df2 = df2[keep]
+    inserted = frame("N" + pd.Series(np.arange(n_insert)).astype(str))
+    df2 = pd.concat([df2, inserted], ignore_index=True)
+    if shuffle:
+        df2 = df2.iloc[rng.permutation(len(df2))].reset_index(drop=True)
+    df1 = pd.concat([df1, df1.iloc[duplicate_rows]], ignore_index=True)
+
+    for df, path in ((df1, file1), (df2, file2)):
+        if file_type == "excel":
+            df.to_excel(path, index=False)
+        else:
+            df.to_csv(path, index=False, sep=delimiter, date_format="%Y-%m-%d")
+
+    info = {
+        "file1": file1,
+        "file2": file2,
+        "key_column": "ID",
+        "file_type": file_type,
+        "delimiter": delimiter,
+        "params": params,
+        "expected": {
+            "identical": rows - n_mismatch - n_delete,
+            "mismatch": n_mismatch,
+            "not_in_file1": n_insert,
+            "not_in_file2": n_delete,
+            "extra_in_file1": 0,
+            "extra_in_file2": 0,
+        },
+        "duplicate_rows": n_duplicate,
+    }
+    with open(info_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成示例数据或性能测试数据集")
+    parser.add_argument("--rows", type=int, help="数据源1的行数；不指定时生成 examples 目录下的小型示例")
+    parser.add_argument("--columns", type=int, default=10, help="数据列数（不含关键列）")
+    parser.add_argument("--dtypes", default="mixed", help="列类型：mixed、int、float、str、date、bool")
+    parser.add_argument("--mismatch-rate", type=float, default=0.01, help="被修改的行比例")
+    parser.add_argument("--insert-rate", type=float, default=0.005, help="数据源2新增的行比例")
+    parser.add_argument("--delete-rate", type=float, default=0.005, help="数据源2删除的行比例")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="数据源1重复关键值的行比例")
+    parser.add_argument("--file-type", default="csv", choices=["csv", "txt", "excel"])
+    parser.add_argument("--delimiter", help="CSV/TXT 分隔符（默认 CSV 为逗号、TXT 为制表符）")
+    parser.add_argument("--no-shuffle", action="store_true", help="不打乱数据源2的行顺序")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="data", help="数据集输出目录")
+    args = parser.parse_args()
+
+    if args.rows is None:
+        generate_sample_data()
+        return
+    info = generate_dataset(
+        args.out_dir,
+        rows=args.rows,
+        columns=args.columns,
+        dtypes=args.dtypes,
+        mismatch_rate=args.mismatch_rate,
+        insert_rate=args.insert_rate,
+        delete_rate=args.delete_rate,
+        duplicate_rate=args.duplicate_rate,
+        file_type=args.file_type,
+        delimiter=args.delimiter,
+        shuffle=not args.no_shuffle,
+        seed=args.seed,
+        overwrite=True,
+    )
+    print("数据集已生成:")
+    print(f"- {info['file1']}")
+    print(f"- {info['file2']}")
+    print(f"预期结果: {info['expected']}")
+
+
 if __name__ == "__main__":
-    generate_sample_data()
\ No newline at end of file
+    main()
@@ -1,23 +1,34 @@
 #!/usr/bin/env python3
 """
 文件差异比较工具 - 主入口脚本
-用于启动GUI界面
+不带参数时启动GUI界面，带参数时作为命令行工具运行（见 file_diff_cli）:
+    python main.py diff a.csv b.csv -k ID --json
 """
 
 import sys
 import os
+import multiprocessing
 
 # 添加当前目录到Python路径，确保可以导入项目模块
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-# 导入GUI模块
-from file_diff_gui import ExcelDiffGUI
-from PyQt6.QtWidgets import QApplication
-
 
 def main():
     """主函数"""
+    # 打包为可执行文件后，多进程比较的子进程需要由此入口正确启动
+    multiprocessing.freeze_support()
+
+    # 带参数时作为命令行工具运行，不导入 PyQt6
+    if len(sys.argv) > 1:
+        from file_diff_cli import main as cli_main
+
+        sys.exit(cli_main(sys.argv[1:]))
+
+    # 导入GUI模块
+    from file_diff_gui import ExcelDiffGUI
+    from PyQt6.QtWidgets import QApplication
+
     # 创建应用实例
     app = QApplication(sys.argv)
 
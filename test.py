@@ -6,10 +6,23 @@
 用于测试文件差异比较功能
 """
 
+import json
+import multiprocessing
 import os
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+
 from file_diff import two_file_diff
+from file_diff_cancel import CancelToken, DiffCancelled, gather
+from file_diff_log import NORMAL, QUIET, DiffLog
 
 # 设置输出编码，解决Windows环境下的中文显示问题
 if sys.platform == "win32":
@@ -19,6 +32,29 @@ if sys.platform == "win32":
     sys.stderr = codecs.getwriter("utf-8")(sys.stderr.detach())
 
 
+def save_result(result, output_file):
+    """将结构化结果按单元格保存为CSV"""
+    labels = {
+        result.MISMATCH: "不匹配",
+        result.NOT_IN_FILE1: "仅在文件2中",
+        result.NOT_IN_FILE2: "仅在文件1中",
+        result.EXTRA_IN_FILE1: "文件1中多出的重复行",
+        result.EXTRA_IN_FILE2: "文件2中多出的重复行",
+    }
+    result_df = result.to_frame()
+    result_df["category"] = result_df["category"].map(labels)
+    result_df = result_df.rename(
+        columns={
+            "category": "差异类型",
+            "key": "关键值",
+            "column": "列名",
+            "value1": "数据源1的值",
+            "value2": "数据源2的值",
+        }
+    )
+    result_df.to_csv(output_file, index=False, encoding="utf-8-sig")
+
+
 def test_file_diff():
     """测试文件差异比较功能"""
 
@@ -36,22 +72,11 @@ def test_file_diff():
 
     if os.path.exists(file1) and os.path.exists(file2):
         result = two_file_diff(file1, file2, key_column="员工ID")
-        print(f"  - 比较完成，共发现 {len(result.get('mismatch', []))} 处差异")
+        print(f"  - 比较完成，共发现 {result.mismatch_count} 处差异")
 
         # 保存结果
         output_file = os.path.join(examples_dir, "employees_diff_result.csv")
-        # 将结果字典转换为DataFrame以便保存
-        result_df = pd.DataFrame(
-            {
-                "差异类型": ["不匹配"] * len(result.get("mismatch", []))
-                + ["仅在文件2中"] * len(result.get("not_in_file1", []))
-                + ["仅在文件1中"] * len(result.get("not_in_file2", [])),
-                "详情": result.get("mismatch", [])
-                + result.get("not_in_file1", [])
-                + result.get("not_in_file2", []),
-            }
-        )
-        result_df.to_csv(output_file, index=False, encoding="utf-8-sig")
+        save_result(result, output_file)
         print(f"  - 结果已保存到: {output_file}")
     else:
         print("  - 测试文件不存在，跳过测试")
@@ -65,22 +90,11 @@ def test_file_diff():
 
     if os.path.exists(file1) and os.path.exists(file2):
         result = two_file_diff(file1, file2, key_column="产品ID")
-        print(f"  - 比较完成，共发现 {len(result.get('mismatch', []))} 处差异")
+        print(f"  - 比较完成，共发现 {result.mismatch_count} 处差异")
 
         # 保存结果
         output_file = os.path.join(examples_dir, "products_diff_result.csv")
-        # 将结果字典转换为DataFrame以便保存
-        result_df = pd.DataFrame(
-            {
-                "差异类型": ["不匹配"] * len(result.get("mismatch", []))
-                + ["仅在文件2中"] * len(result.get("not_in_file1", []))
-                + ["仅在文件1中"] * len(result.get("not_in_file2", [])),
-                "详情": result.get("mismatch", [])
-                + result.get("not_in_file1", [])
-                + result.get("not_in_file2", []),
-            }
-        )
-        result_df.to_csv(output_file, index=False, encoding="utf-8-sig")
+        save_result(result, output_file)
         print(f"  - 结果已保存到: {output_file}")
     else:
         print("  - 测试文件不存在，跳过测试")
@@ -88,6 +102,696 @@ def test_file_diff():
     print("\n所有测试完成!")
 
 
+# ---- 各比较模式与一次性读取的结果一致性 ----
+
+
+def make_frames(rows=300, seed=0, composite=False):
+    """
+    生成两个略有不同的小数据集：部分关键值只在一边，部分单元格被修改，含空值与混合类型的列
+    """
+    rng = np.random.RandomState(seed)
+    ids = rng.permutation(rows * 2)[:rows]
+    df1 = pd.DataFrame(
+        {
+            "id": ids,
+            "part": rng.choice(["a", "b"], rows),
+            "num": rng.randint(0, 5, rows),
+            "price": np.round(rng.uniform(0, 10, rows), 2),
+            "text": rng.choice(["x", "y", "z", None], rows),
+        }
+    )
+    df2 = df1.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    # 删除一部分行、增加一部分只在数据源2中的行
+    df2 = df2.iloc[rows // 10 :].copy()
+    extra = df1.iloc[: rows // 20].copy()
+    extra["id"] = extra["id"] + rows * 2
+    df2 = pd.concat([df2, extra], ignore_index=True)
+    changed = rng.rand(len(df2)) < 0.2
+    df2.loc[changed, "num"] = df2.loc[changed, "num"] + 1
+    df2.loc[rng.rand(len(df2)) < 0.1, "text"] = "changed"
+    df2.loc[rng.rand(len(df2)) < 0.05, "price"] = np.nan
+    if not composite:
+        df1 = df1.drop_duplicates("id")
+        df2 = df2.drop_duplicates("id")
+    return df1, df2
+
+
+def engine_cases(rows):
+    """各比较方式共用的输入：单关键列、组合关键列、数字与文本混合的关键列"""
+    df1, df2 = make_frames(rows)
+    yield "单关键列", "id", df1, df2
+    df1, df2 = make_frames(rows, composite=True)
+    yield "组合关键列", ["id", "part"], df1, df2
+    df1, df2 = make_frames(rows)
+    for frame in (df1, df2):
+        frame["id"] = [f"k{v}" if v % 3 == 0 else str(v) for v in frame["id"]]
+    yield "混合类型关键列", "id", df1, df2
+
+
+def write_csv(directory, name, frame):
+    path = os.path.join(directory, name)
+    frame.to_csv(path, index=False)
+    return path
+
+
+def result_signature(result):
+    """用于比较两次比较结果的规范化表示：各类别数量、各类别的关键值集合与差异单元格集合"""
+    keys = {
+        name: sorted(map(str, getattr(result, name)))
+        for name in (
+            "not_in_file1_keys",
+            "not_in_file2_keys",
+            "extra_in_file1_keys",
+            "extra_in_file2_keys",
+        )
+    }
+    cells = result.cells()
+    cells = sorted(
+        zip(
+            map(str, cells["key"]),
+            cells["column"],
+            map(str, cells["value1"]),
+            map(str, cells["value2"]),
+        )
+    )
+    return result.counts, keys, cells
+
+
+def assert_same_result(result, expected, label):
+    actual, wanted = result_signature(result), result_signature(expected)
+    assert actual[0] == wanted[0], f"{label}: 数量不一致 {actual[0]} != {wanted[0]}"
+    assert actual[1] == wanted[1], f"{label}: 关键值不一致"
+    assert actual[2] == wanted[2], f"{label}: 差异单元格不一致"
+    print(f"  - {label}: 一致")
+
+
+def diff_csv(file1, file2, key_column, events=None, **options):
+    """比较两个CSV文件；传入 events 列表时收集输出事件"""
+    options.setdefault("verbosity", QUIET)
+    if events is not None:
+        options.update(verbosity=NORMAL, on_event=events.append)
+    return two_file_diff(file1, file2, key_column=key_column, file_type="csv", **options)
+
+
+class CancelAfter(CancelToken):
+    """测试用取消标记：should_cancel() 为真时在下一次 check 中取消"""
+
+    def __init__(self, should_cancel):
+        super().__init__()
+        self.should_cancel = should_cancel
+
+    def check(self):
+        if self.should_cancel():
+            self.cancel()
+        super().check()
+
+
+def wait_until(condition, timeout=10):
+    """等待 condition() 为真，超时返回 False"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_composite_key_cells():
+    """组合关键列时按单个关键值（元组）与关键值列表筛选差异单元格"""
+    print("测试用例: 组合关键列的差异单元格筛选")
+    with tempfile.TemporaryDirectory() as tmp:
+        df1 = pd.DataFrame({"id": [1, 1, 2], "part": ["a", "b", "a"], "v": [1, 2, 3]})
+        df2 = pd.DataFrame({"id": [1, 1, 2], "part": ["a", "b", "a"], "v": [9, 2, 8]})
+        result = diff_csv(
+            write_csv(tmp, "c1.csv", df1), write_csv(tmp, "c2.csv", df2), ["id", "part"]
+        )
+    cells = result.cells(key=(1, "a"))
+    assert len(cells) == 1 and cells["value2"].iloc[0] == 9, cells
+    assert len(result.cells(key=[(1, "a"), (2, "a")])) == 2
+    assert len(result.cells(key=(1, "b"))) == 0
+    print("  - 单个组合关键值与关键值列表筛选正确")
+
+
+def test_streaming_partitions():
+    """流式分区比较拆分为多个分区时与一次性读取的结果一致"""
+    print("测试用例: 流式分区比较")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, key, df1, df2 in engine_cases(20000):
+            file1, file2 = write_csv(tmp, "s1.csv", df1), write_csv(tmp, "s2.csv", df2)
+            events = []
+            result = diff_csv(file1, file2, key, events, streaming=True, memory_limit_mb=1)
+            partitions = [e["partitions"] for e in events if e["kind"] == "streaming"]
+            assert partitions and partitions[0] > 1, partitions
+            assert_same_result(result, diff_csv(file1, file2, key), f"{label}（{partitions[0]} 个分区）")
+
+
+def test_streaming_null_ints():
+    """整数列的空值只在某个分区中时，其余分区同样按浮点数转换，与一次性读取的结果一致"""
+    print("测试用例: 流式比较中含空值的整数列")
+    rows = np.arange(20000)
+    df1 = pd.DataFrame({"id": rows, "big": pd.array(2**53 + rows, dtype="Int64")})
+    df2 = df1.copy()
+    df1.loc[5, "big"] = pd.NA
+    df2.loc[6, "big"] = pd.NA
+    with tempfile.TemporaryDirectory() as tmp:
+        file1, file2 = write_csv(tmp, "n1.csv", df1), write_csv(tmp, "n2.csv", df2)
+        result = diff_csv(file1, file2, "id", streaming=True, memory_limit_mb=1)
+        assert_same_result(result, diff_csv(file1, file2, "id"), "空值只在一个分区中")
+
+
+def test_parallel_workers():
+    """workers=2 时（一次性读取与流式分区比较）与单进程的结果一致"""
+    print("测试用例: 多进程分片比较")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, key, df1, df2 in engine_cases(3000):
+            file1, file2 = write_csv(tmp, "w1.csv", df1), write_csv(tmp, "w2.csv", df2)
+            expected = diff_csv(file1, file2, key)
+            assert_same_result(diff_csv(file1, file2, key, workers=2), expected, label)
+            result = diff_csv(file1, file2, key, streaming=True, memory_limit_mb=1, workers=2)
+            assert_same_result(result, expected, f"{label}（流式）")
+
+        # 空关键值在数据源1的数值列与数据源2的文本列中哈希不同，仍应分到同一分片
+        df1 = pd.DataFrame({"id": [1, 2, 3, 4, 5, 6, None], "v": range(7)})
+        df2 = pd.DataFrame({"id": ["1", "2", "3", "x", "y", "z", None], "v": [0, 1, 2, 3, 4, 5, 9]})
+        file1, file2 = write_csv(tmp, "w1.csv", df1), write_csv(tmp, "w2.csv", df2)
+        expected = diff_csv(file1, file2, "id")
+        assert expected.counts["mismatch"] == 1, expected.counts
+        assert_same_result(diff_csv(file1, file2, "id", workers=3), expected, "空关键值")
+
+
+def test_cancel_parallel():
+    """workers=2 时在等待进程池期间取消：抛出 DiffCancelled 并终止全部工作进程"""
+    print("测试用例: 取消多进程比较")
+    with tempfile.TemporaryDirectory() as tmp:
+        _, key, df1, df2 = next(engine_cases(3000))
+        file1, file2 = write_csv(tmp, "x1.csv", df1), write_csv(tmp, "x2.csv", df2)
+        threads = threading.active_count()
+        for label, options in [
+            ("一次性读取", {}),
+            ("流式", {"streaming": True, "memory_limit_mb": 1}),
+        ]:
+            # 工作进程启动后的第一次检查即取消，此时进程池一定已在运行
+            cancel = CancelAfter(lambda: bool(multiprocessing.active_children()))
+            try:
+                diff_csv(file1, file2, key, workers=2, cancel=cancel, **options)
+            except DiffCancelled:
+                pass
+            else:
+                raise AssertionError(f"{label}: 取消后应抛出 DiffCancelled")
+            assert cancel.cancelled, label
+            assert wait_until(lambda: not multiprocessing.active_children()), (
+                f"{label}: 工作进程未终止"
+            )
+            # 执行器的管理线程读到 EOF 后结束
+            assert wait_until(lambda: threading.active_count() <= threads), (
+                f"{label}: 进程池未关闭"
+            )
+
+    # 正在运行的长任务也会被直接终止，不必等它们结束
+    pool = ProcessPoolExecutor(max_workers=2)
+    futures = [pool.submit(time.sleep, 60) for _ in range(4)]
+    cancel = CancelToken()
+    threading.Timer(0.5, cancel.cancel).start()
+    start = time.monotonic()
+    try:
+        gather(pool, futures, cancel)
+    except DiffCancelled:
+        pass
+    else:
+        raise AssertionError("取消后应抛出 DiffCancelled")
+    assert wait_until(lambda: not multiprocessing.active_children()), "工作进程未终止"
+    assert wait_until(lambda: threading.active_count() <= threads), "进程池未关闭"
+    assert time.monotonic() - start < 30, "等待了正在运行的任务"
+
+
+def test_cancel_streaming():
+    """流式比较在读取每一块时检查取消状态，取消后临时分区目录被删除"""
+    print("测试用例: 取消流式比较")
+    with tempfile.TemporaryDirectory() as tmp:
+        _, key, df1, df2 = next(engine_cases(20000))
+        file1, file2 = write_csv(tmp, "s1.csv", df1), write_csv(tmp, "s2.csv", df2)
+
+        def spill_dirs():
+            prefix = "file_diff_spill_"
+            return {name for name in os.listdir(tempfile.gettempdir()) if name.startswith(prefix)}
+
+        before = spill_dirs()
+        events, checks = [], []
+
+        def should_cancel():
+            # 进入流式比较后第 3 次检查时取消，并记下此时已写出的分区文件
+            if events:
+                checks.append(sorted(
+                    name
+                    for spill_dir in spill_dirs() - before
+                    for name in os.listdir(os.path.join(tempfile.gettempdir(), spill_dir))
+                ))
+            return len(checks) == 3
+
+        try:
+            diff_csv(
+                file1, file2, key, streaming=True, memory_limit_mb=1,
+                cancel=CancelAfter(should_cancel), verbosity=NORMAL,
+                on_event=lambda e: e["kind"] == "streaming" and events.append(e),
+            )
+        except DiffCancelled:
+            pass
+        else:
+            raise AssertionError("取消后应抛出 DiffCancelled")
+        # 数据源1共有多块，读到第 3 块时即停止，数据源2尚未开始读取
+        assert 20000 / events[0]["chunksize"] > 3, events
+        spilled = checks[-1]
+        assert spilled and all(name.startswith("side1_") for name in spilled), spilled
+        assert spill_dirs() <= before, "临时分区目录未删除"
+
+
+def test_fingerprint():
+    """行指纹模式（含逐值复核）与逐列比较的结果一致"""
+    print("测试用例: 行指纹比较")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, key, df1, df2 in engine_cases(3000):
+            file1, file2 = write_csv(tmp, "f1.csv", df1), write_csv(tmp, "f2.csv", df2)
+            expected = diff_csv(file1, file2, key)
+            assert_same_result(diff_csv(file1, file2, key, fingerprint=True), expected, label)
+            result = diff_csv(file1, file2, key, fingerprint=True, verify_fingerprint=True)
+            assert_same_result(result, expected, f"{label}（逐值复核）")
+
+
+def test_snapshot():
+    """快照增量比较：上一次的数据源2作为本次的数据源1时使用快照，结果与完整比较一致"""
+    print("测试用例: 快照增量比较")
+    with tempfile.TemporaryDirectory() as tmp:
+        df1, df2 = make_frames(2000)
+        df3 = df2.assign(num=df2["num"] * 2).iloc[50:]
+        files = [write_csv(tmp, f"day{i}.csv", frame) for i, frame in enumerate((df1, df2, df3))]
+        snapshot = os.path.join(tmp, "data.fdsnap")
+        for day in (1, 2):
+            events = []
+            result = diff_csv(files[day - 1], files[day], "id", events, snapshot=snapshot)
+            used = any(e["kind"] == "snapshot" for e in events)
+            # 第一次比较只写入快照，第二次的数据源1即为快照对应的文件
+            assert used == (day == 2), f"第 {day} 次比较是否使用快照: {used}"
+            expected = diff_csv(files[day - 1], files[day], "id")
+            assert_same_result(result, expected, f"第 {day} 次比较")
+
+
+def make_duplicates(rows=3000):
+    """在 make_frames 的基础上增加重复关键值：部分重复行内容被修改，数据源2中还有完全相同的重复行"""
+    df1, df2 = make_frames(rows)
+    df1 = pd.concat([df1, df1.iloc[:200].assign(num=7)], ignore_index=True)
+    df2 = pd.concat([df2, df2.iloc[:150].assign(num=7), df2.iloc[:30]], ignore_index=True)
+    return df1, df2
+
+
+def test_duplicate_modes():
+    """重复关键值的各处理方式在流式、多进程与行指纹比较中与一次性读取的结果一致"""
+    print("测试用例: 重复关键值的处理方式")
+    with tempfile.TemporaryDirectory() as tmp:
+        df1, df2 = make_duplicates()
+        file1, file2 = write_csv(tmp, "d1.csv", df1), write_csv(tmp, "d2.csv", df2)
+        for mode in ("first", "occurrence", "content"):
+            expected = diff_csv(file1, file2, "id", duplicates=mode)
+            extra = expected.counts["extra_in_file1"] + expected.counts["extra_in_file2"]
+            assert (extra > 0) == (mode != "first"), expected.counts
+            for label, options in (
+                ("流式", {"streaming": True, "memory_limit_mb": 1}),
+                ("多进程", {"workers": 2}),
+                ("行指纹", {"fingerprint": True}),
+            ):
+                result = diff_csv(file1, file2, "id", duplicates=mode, **options)
+                assert_same_result(result, expected, f"{mode}（{label}）")
+
+
+def test_key_first():
+    """两遍读取（分块读取第二遍）与一次性读取的结果一致，包括重复关键值"""
+    print("测试用例: 两遍读取")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, key, df1, df2 in engine_cases(3000):
+            file1, file2 = write_csv(tmp, "k1.csv", df1), write_csv(tmp, "k2.csv", df2)
+            events = []
+            result = diff_csv(file1, file2, key, events, key_first=True, memory_limit_mb=1)
+            assert any(e["kind"] == "key_first" for e in events)
+            assert_same_result(result, diff_csv(file1, file2, key), label)
+
+        # 文本列的前几块只含数字，数据源2倒序：两边按块推断的类型会不同
+        rows = np.arange(20000)
+        df1 = pd.DataFrame({"id": rows, "code": [str(i) if i < 10000 else f"c{i}" for i in rows]})
+        file1, file2 = write_csv(tmp, "k1.csv", df1), write_csv(tmp, "k2.csv", df1.iloc[::-1])
+        result = diff_csv(file1, file2, "id", key_first=True, memory_limit_mb=1)
+        assert_same_result(result, diff_csv(file1, file2, "id"), "文本列中只含数字的块")
+
+        # 整数列在后面的块中出现小数，这些块的行只在数据源1中：合并后仍为浮点列
+        df1 = pd.DataFrame({"id": rows, "num": [i if i < 10000 else i + 0.5 for i in rows]})
+        df2 = df1.iloc[:10000].iloc[::-1]
+        file1, file2 = write_csv(tmp, "k1.csv", df1), write_csv(tmp, "k2.csv", df2)
+        result = diff_csv(file1, file2, "id", key_first=True, memory_limit_mb=1)
+        assert_same_result(result, diff_csv(file1, file2, "id"), "整数与小数混合的列")
+
+        df1, df2 = make_duplicates()
+        file1, file2 = write_csv(tmp, "k1.csv", df1), write_csv(tmp, "k2.csv", df2)
+        for mode in ("occurrence", "content"):
+            result = diff_csv(file1, file2, "id", key_first=True, duplicates=mode)
+            expected = diff_csv(file1, file2, "id", duplicates=mode)
+            assert_same_result(result, expected, f"重复关键值 {mode}")
+
+
+def test_merge_join():
+    """有序归并比较与一次性读取的结果一致；输入没有排序或各块的列类型不一致时改用流式比较"""
+    print("测试用例: 有序归并比较")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, key, df1, df2 in engine_cases(5000):
+            for order, frames in (
+                ("已排序", (df1.sort_values(key), df2.sort_values(key))),
+                ("未排序", (df1, df2)),
+            ):
+                file1 = write_csv(tmp, "m1.csv", frames[0])
+                file2 = write_csv(tmp, "m2.csv", frames[1])
+                events = []
+                result = diff_csv(file1, file2, key, events, sorted_input=True, memory_limit_mb=1)
+                fallback = any(e["kind"] == "streaming" for e in events)
+                # 混合类型的关键列按文本排序，按块解析为整数时不再有序
+                assert fallback == (order == "未排序" or label == "混合类型关键列"), events
+                assert_same_result(result, diff_csv(file1, file2, key), f"{label}（{order}）")
+
+        # 文本列的前几块只含数字：按块解析为整数与整列按文本比较的结果不同，改用流式比较
+        rows = np.arange(20000)
+        df1 = pd.DataFrame({"id": rows, "code": [str(i) if i < 10000 else f"c{i}" for i in rows]})
+        df2 = df1.copy()
+        df2.loc[[12000, 15000], "code"] = "changed"
+        file1, file2 = write_csv(tmp, "m1.csv", df1), write_csv(tmp, "m2.csv", df2)
+        events = []
+        result = diff_csv(file1, file2, "id", events, sorted_input=True, memory_limit_mb=1)
+        assert any("类型不同" in e["message"] for e in events if e["kind"] == "warning"), events
+        assert_same_result(result, diff_csv(file1, file2, "id"), "文本列中只含数字的块")
+
+        # 整数列在后面的块中出现小数：按数值比较，不需要改用流式比较
+        df1 = pd.DataFrame({"id": rows, "num": [i if i < 10000 else i + 0.5 for i in rows]})
+        df2 = df1.copy()
+        df2.loc[[12000, 15000], "num"] = -1
+        file1, file2 = write_csv(tmp, "m1.csv", df1), write_csv(tmp, "m2.csv", df2)
+        events = []
+        result = diff_csv(file1, file2, "id", events, sorted_input=True, memory_limit_mb=1)
+        assert not any(e["kind"] == "streaming" for e in events), events
+        # 报告中整数块的数值写法（5 与 5.0）可能不同，只比较数量
+        assert result.counts == diff_csv(file1, file2, "id").counts, result.counts
+        print("  - 整数与小数混合的列: 一致")
+
+        df1, df2 = make_duplicates()
+        df1, df2 = df1.sort_values("id", kind="stable"), df2.sort_values("id", kind="stable")
+        file1, file2 = write_csv(tmp, "m1.csv", df1), write_csv(tmp, "m2.csv", df2)
+        for mode in ("occurrence", "content"):
+            result = diff_csv(file1, file2, "id", sorted_input=True, duplicates=mode)
+            expected = diff_csv(file1, file2, "id", duplicates=mode)
+            assert_same_result(result, expected, f"重复关键值 {mode}")
+
+
+def test_block_checksums():
+    """分块校验比较（含引号内换行的值）与一次性读取的结果一致，再次比较时复用校验文件"""
+    print("测试用例: 分块校验比较")
+    rng = np.random.RandomState(1)
+    rows = 20000
+    df1 = pd.DataFrame(
+        {
+            "id": np.arange(rows) * 2,
+            "num": rng.randint(0, 9, rows),
+            "note": rng.choice(["a", "第一行\n第二行", 'say "hi"', "x,y"], rows),
+        }
+    )
+    df2 = df1.drop(index=[5, 9000])
+    df2.loc[[100, 15000], "num"] = -1
+    df2.loc[12000, "note"] = "改动\n多行"
+    added = pd.DataFrame({"id": [7, rows * 2 + 1], "num": [1, 2], "note": ["新\n行", "b"]})
+    df2 = pd.concat([df2, added]).sort_values("id")
+    with tempfile.TemporaryDirectory() as tmp:
+        file1, file2 = write_csv(tmp, "b1.csv", df1), write_csv(tmp, "b2.csv", df2)
+        expected = diff_csv(file1, file2, "id")
+        for run in ("新计算", "复用校验文件"):
+            events = []
+            result = diff_csv(file1, file2, "id", events, block_checksums=True)
+            (stats,) = [e for e in events if e["kind"] == "checksum"]
+            assert stats["reused1"] == (run == "复用校验文件"), stats
+            assert 0 < stats["different_leaves1"] < stats["leaves1"], stats
+            assert_same_result(result, expected, run)
+
+        # 数字写法的文本列：差异块只含数字时仍按整列的文本类型比较；
+        # 只有数据源2含文本时两边类型不同，改用有序归并比较
+        ids = np.arange(20000)
+        df1 = pd.DataFrame({"id": ids, "code": [str(i) for i in ids]})
+        df1.loc[19990, "code"] = "t"
+        df2 = df1.copy()
+        df2.loc[15000, "code"] = "changed"
+        for label, frame in (("两边都含文本", df1), ("只有数据源2含文本", df1.assign(code=ids))):
+            file1, file2 = write_csv(tmp, "b1.csv", frame), write_csv(tmp, "b2.csv", df2)
+            events = []
+            result = diff_csv(file1, file2, "id", events, block_checksums=True)
+            fallback = any(e["kind"] == "sorted_merge" for e in events)
+            assert fallback == (label == "只有数据源2含文本"), events
+            assert_same_result(result, diff_csv(file1, file2, "id"), label)
+
+        for label, key, df1, df2 in engine_cases(3000):
+            file1 = write_csv(tmp, "b1.csv", df1.sort_values(key))
+            file2 = write_csv(tmp, "b2.csv", df2.sort_values(key))
+            result = diff_csv(file1, file2, key, block_checksums=True)
+            assert_same_result(result, diff_csv(file1, file2, key), label)
+
+        df1, df2 = make_duplicates()
+        df1, df2 = df1.sort_values("id", kind="stable"), df2.sort_values("id", kind="stable")
+        file1, file2 = write_csv(tmp, "b1.csv", df1), write_csv(tmp, "b2.csv", df2)
+        for mode in ("occurrence", "content"):
+            result = diff_csv(file1, file2, "id", block_checksums=True, duplicates=mode)
+            expected = diff_csv(file1, file2, "id", duplicates=mode)
+            assert_same_result(result, expected, f"重复关键值 {mode}")
+
+
+def write_columnar(directory, name, frame, file_type):
+    """把数据写为 Parquet / Feather 文件或 SQLite 数据库中的 data 表"""
+    path = os.path.join(directory, f"{name}.{file_type}")
+    frame = frame.reset_index(drop=True)
+    if file_type == "parquet":
+        frame.to_parquet(path, index=False)
+    elif file_type == "feather":
+        frame.to_feather(path)
+    else:
+        connection = sqlite3.connect(path)
+        try:
+            frame.to_sql("data", connection, index=False)
+        finally:
+            connection.close()
+    return path
+
+
+def test_columnar_sources():
+    """Parquet、Feather 与 SQLite 数据源与同样内容的CSV文件比较结果一致"""
+    print("测试用例: 列式与数据库数据源")
+    file_types = ["parquet", "feather", "sqlite"]
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        # pyarrow 是可选依赖，没有安装时只测试 SQLite
+        print("  - 未安装 pyarrow，跳过 Parquet / Feather")
+        file_types = ["sqlite"]
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, key, df1, df2 in engine_cases(2000):
+            expected = diff_csv(write_csv(tmp, "c1.csv", df1), write_csv(tmp, "c2.csv", df2), key)
+            for file_type in file_types:
+                file1 = write_columnar(tmp, f"{label}1", df1, file_type)
+                file2 = write_columnar(tmp, f"{label}2", df2, file_type)
+                result = two_file_diff(
+                    file1, file2, key_column=key, file_type=file_type, verbosity=QUIET
+                )
+                assert_same_result(result, expected, f"{label}（{file_type}）")
+
+
+def test_parse_cache():
+    """解析缓存：首次未命中并写入，文件未修改时命中，修改时间变化后失效；使用缓存时列筛选仍然生效"""
+    print("测试用例: 解析结果缓存")
+    import file_diff_cache
+    from file_diff import read_source
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "cache")
+        df1, df2 = make_frames()
+        file1, file2 = write_csv(tmp, "p1.csv", df1), write_csv(tmp, "p2.csv", df2)
+        calls = []
+
+        def read_func(*args):
+            calls.append(args[0])
+            return read_source(*args)
+
+        for expected_calls in (1, 1):
+            data, _ = file_diff_cache.read_cached(
+                read_func, file1, "csv", cache_dir=cache_dir, log=DiffLog(QUIET)
+            )
+            assert len(calls) == expected_calls, calls
+        pd.testing.assert_frame_equal(data, pd.read_csv(file1))
+        print("  - 首次解析并写入缓存，再次读取命中")
+
+        stat = os.stat(file1)
+        os.utime(file1, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        file_diff_cache.read_cached(
+            read_func, file1, "csv", cache_dir=cache_dir, log=DiffLog(QUIET)
+        )
+        assert len(calls) == 2, "修改时间变化后缓存应失效"
+        # 同一文件的旧条目被替换
+        assert file_diff_cache.cache_size(cache_dir)[0] == 1
+        print("  - 修改时间变化后重新解析并替换旧条目")
+
+        default_dir = file_diff_cache.CACHE_DIR
+        file_diff_cache.CACHE_DIR = cache_dir
+        try:
+            expected = diff_csv(file1, file2, "id", columns=["num"])
+            for hits in (1, 2):
+                events = []
+                result = diff_csv(file1, file2, "id", events, columns=["num"], use_cache=True)
+                assert sum(e["kind"] == "cache" for e in events) == hits, events
+                assert result.meta["compared_columns"] == ["id", "num"], result.meta
+                assert_same_result(result, expected, f"使用缓存比较（命中 {hits} 个数据源）")
+        finally:
+            file_diff_cache.CACHE_DIR = default_dir
+
+
+def read_report(path, report_format, header_lines):
+    """读回一份差异报告（各格式读取为 DataFrame）"""
+    if report_format == "csv":
+        return pd.read_csv(path, skiprows=len(header_lines), encoding="utf-8-sig")
+    if report_format == "jsonl":
+        return pd.read_json(path, lines=True)
+    if report_format == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_excel(path, sheet_name="差异")
+
+
+def test_report_formats():
+    """各格式的差异报告写出后读回，行数、差异类型与关键列类型正确；取消时不留下报告与临时文件"""
+    print("测试用例: 差异报告格式")
+    from file_diff_report import MISMATCH_LABEL, TYPE_COLUMN, write_report
+
+    formats = ["csv", "jsonl", "xlsx"]
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("  - 未安装 pyarrow，跳过 Parquet")
+    else:
+        formats.append("parquet")
+    header_lines = ["# 差异报告测试", "# 第二行注释"]
+    df1 = pd.DataFrame({"id": [1, 2, 3, 4, 5, 6], "v": [1, 2, 3, 4, 5, 6]})
+    with tempfile.TemporaryDirectory() as tmp:
+        file1 = write_csv(tmp, "r1.csv", df1)
+        # 数据源2的关键列为整数时各类别的关键值类型一致；含 4.5 时数据源2为浮点数，与数据源1不同
+        for label, ids2 in (("整数关键列", [1, 2, 3, 7]), ("整数与浮点数关键列", [1, 2, 3, 4.5, 7])):
+            df2 = pd.DataFrame({"id": ids2, "v": [1, 9, 3, 4, 5][: len(ids2)]})
+            result = diff_csv(file1, write_csv(tmp, "r2.csv", df2), "id")
+            labels = (
+                ["仅在文件2中"] * len(result.not_in_file1_keys)
+                + ["仅在文件1中"] * len(result.not_in_file2_keys)
+                + [MISMATCH_LABEL] * len(result.cells())
+            )
+            for report_format in formats:
+                path = os.path.join(tmp, f"report.{report_format}")
+                rows = write_report(result, path, header_lines=header_lines)
+                report = read_report(path, report_format, header_lines)
+                assert rows == len(report) == len(labels), (report_format, rows, len(report))
+                assert sorted(report[TYPE_COLUMN]) == sorted(labels), report
+                if report_format == "parquet":
+                    key_type = pq.read_schema(path).field("id").type
+                    if label == "整数关键列":
+                        assert str(key_type) == "int64", key_type
+                        assert sorted(report["id"]) == [2, 4, 5, 6, 7], report
+                    else:
+                        # 类型不一致时保存为字符串，每个值保持各自的写法
+                        assert str(key_type) == "string", key_type
+                        assert sorted(report["id"]) == ["2", "4", "4.5", "5", "6", "7.0"], report
+                    metadata = pq.read_schema(path).metadata[b"file_diff.header"]
+                    assert metadata.decode("utf-8").splitlines() == header_lines
+            print(f"  - {label}: {', '.join(formats)} 读回一致")
+
+        cancel = CancelToken()
+        cancel.cancel()
+        path = os.path.join(tmp, "cancelled.csv")
+        try:
+            write_report(result, path, cancel=cancel)
+        except DiffCancelled:
+            pass
+        else:
+            raise AssertionError("取消后应抛出 DiffCancelled")
+        assert not os.path.exists(path)
+        leftovers = [name for name in os.listdir(tmp) if name.endswith(".tmp")]
+        assert not leftovers, leftovers
+        print("  - 取消写出时不留下报告与临时文件")
+
+
+def run_cli(*args):
+    """在子进程中运行命令行入口，返回 (退出码, 标准输出)"""
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "file_diff_cli.py")
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    completed = subprocess.run(
+        [sys.executable, cli, *args], capture_output=True, encoding="utf-8", env=env
+    )
+    return completed.returncode, completed.stdout
+
+
+def test_cli():
+    """命令行：没有差异、存在差异与出错时的退出码，--json 输出与报告格式的选择"""
+    print("测试用例: 命令行入口")
+    with tempfile.TemporaryDirectory() as tmp:
+        df1, df2 = make_frames()
+        file1, file2 = write_csv(tmp, "c1.csv", df1), write_csv(tmp, "c2.csv", df2)
+
+        code, output = run_cli("diff", file1, file1, "-k", "id", "--json")
+        data = json.loads(output)
+        assert code == 0 and data["status"] == "ok" and not data["has_differences"], output
+        assert data["report"] is None
+        print("  - 没有差异: 退出码 0")
+
+        expected = diff_csv(file1, file2, "id", columns=["num", "price"])
+        for name, options in (
+            ("report.jsonl", []),
+            ("report.out", ["--report-format", "xlsx"]),
+        ):
+            report = os.path.join(tmp, name)
+            code, output = run_cli(
+                "diff", file1, file2, "-k", "id", "--columns", "num,price", "--json",
+                "--report", report, *options,
+            )
+            data = json.loads(output)
+            assert code == 1 and data["has_differences"], output
+            assert data["counts"] == expected.counts, data["counts"]
+            assert data["compared_columns"] == ["id", "num", "price"], data
+            assert data["report"] == report and os.path.exists(report), data
+            if name.endswith(".jsonl"):
+                assert len(pd.read_json(report, lines=True)) > 0
+            else:
+                assert pd.ExcelFile(report).sheet_names == ["摘要", "差异"]
+        print("  - 存在差异: 退出码 1，报告格式按扩展名推断或由 --report-format 指定")
+
+        missing = os.path.join(tmp, "missing.csv")
+        code, output = run_cli("diff", missing, file2, "-k", "id", "--json")
+        data = json.loads(output)
+        assert code == 2 and data["status"] == "error", output
+        code, _ = run_cli("diff", file1, file2, "-k", "id", "--no-such-option")
+        assert code == 2
+        print("  - 文件不存在与参数错误: 退出码 2")
+
+
+def run_engine_tests():
+    test_composite_key_cells()
+    test_parse_cache()
+    test_report_formats()
+    test_cli()
+    test_streaming_partitions()
+    test_streaming_null_ints()
+    test_parallel_workers()
+    test_cancel_parallel()
+    test_cancel_streaming()
+    test_fingerprint()
+    test_snapshot()
+    test_duplicate_modes()
+    test_key_first()
+    test_merge_join()
+    test_block_checksums()
+    test_columnar_sources()
+
+
 def test_gui():
     """测试GUI界面"""
     print("\n启动GUI界面测试...")
@@ -116,6 +820,7 @@ def test_gui():
 if __name__ == "__main__":
     # 运行命令行测试
     test_file_diff()
+    run_engine_tests()
 
     # 检查是否在CI环境中运行，如果是则跳过GUI测试
     is_ci_environment = (